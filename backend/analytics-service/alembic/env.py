@@ -18,6 +18,9 @@ if config.config_file_name is not None:
 
 target_metadata = Base.metadata
 
+# Shares its database with url-service, so keep a separate revision history
+VERSION_TABLE = "alembic_version_analytics"
+
 def run_migrations_offline() -> None:
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
@@ -25,6 +28,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        version_table=VERSION_TABLE,
     )
 
     with context.begin_transaction():
@@ -39,7 +43,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, version_table=VERSION_TABLE
         )
 
         with context.begin_transaction():
@@ -0,0 +1,60 @@
+"""Initial analytics schema
+
+Creates the tables that used to come from create_all at startup, so a
+fresh database can be built by Alembic alone (DB_CREATE_ALL=false).
+Tables that already exist are left alone.
+
+Revision ID: 0001_initial_schema
+Revises: 
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0001_initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    
+    if "click_events" not in tables:
+        op.create_table(
+            "click_events",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("short_code", sa.String(50), nullable=False),
+            sa.Column("user_agent", sa.Text),
+            sa.Column("ip_address", sa.String(45)),
+            sa.Column("referer", sa.Text),
+            sa.Column("country", sa.String(2)),
+            sa.Column("city", sa.String(100)),
+            sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_click_events_id", "click_events", ["id"])
+        op.create_index("ix_click_events_short_code", "click_events", ["short_code"])
+        op.create_index("ix_click_events_ip_address", "click_events", ["ip_address"])
+        op.create_index("ix_click_events_timestamp", "click_events", ["timestamp"])
+    
+    if "analytics_reports" not in tables:
+        op.create_table(
+            "analytics_reports",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("short_code", sa.String(50), nullable=False),
+            sa.Column("report_type", sa.String(50), nullable=False),
+            sa.Column("report_date", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("total_clicks", sa.Integer),
+            sa.Column("unique_clicks", sa.Integer),
+            sa.Column("top_countries", sa.Text),
+            sa.Column("top_referers", sa.Text),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_analytics_reports_id", "analytics_reports", ["id"])
+        op.create_index("ix_analytics_reports_short_code", "analytics_reports", ["short_code"])
+        op.create_index("ix_analytics_reports_report_date", "analytics_reports", ["report_date"])
+
+def downgrade() -> None:
+    op.drop_table("analytics_reports")
+    op.drop_table("click_events")
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from typing import Dict
 import logging
 
 from app.api.deps import get_db
-from app.schemas.analytics_schema import ClickEventCreate, ClickEventResponse, AnalyticsStats
+from app.schemas.analytics_schema import ClickEventCreate, ClickEventBatch, ClickEventResponse, AnalyticsStats
 from app.services.analytics_service import AnalyticsService
+from app.services.replica_router import replica_router
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -13,6 +14,7 @@ router = APIRouter()
 @router.post("/events/", response_model=bool)
 async def record_click_event(
     click_data: ClickEventCreate,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """Record a click event for analytics"""
@@ -25,16 +27,38 @@ async def record_click_event(
             detail="Failed to record click event"
         )
     
+    # Lets this writer's next /stats read see the click
+    replica_router.remember_write(db, response)
     return success
 
+@router.post("/events/batch")
+async def record_click_events(
+    batch: ClickEventBatch,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    """Record many click events in one transaction (used by the gateway's event queue)"""
+    analytics_service = AnalyticsService(db)
+    recorded = await analytics_service.record_clicks(batch.events)
+    
+    if not recorded:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to record click events"
+        )
+    
+    replica_router.remember_write(db, response)
+    return {"recorded": recorded}
+
 @router.get("/stats/{short_code}", response_model=AnalyticsStats)
 async def get_url_analytics(
     short_code: str,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Get detailed analytics for a specific URL"""
     analytics_service = AnalyticsService(db)
-    analytics = await analytics_service.get_analytics(short_code)
+    analytics = await analytics_service.get_analytics(short_code, replica_router.min_lsn_for(request))
     
     if not analytics:
         raise HTTPException(
@@ -50,6 +74,11 @@ async def get_global_analytics(db: Session = Depends(get_db)):
     analytics_service = AnalyticsService(db)
     return analytics_service.get_global_analytics()
 
+@router.get("/db/replicas")
+async def get_replica_stats():
+    """Read replica lag and read routing counters"""
+    return replica_router.stats()
+
 @router.get("/health")
 async def health_check():
     """Analytics service health check"""
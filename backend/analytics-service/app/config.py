@@ -1,4 +1,5 @@
 import os
+from typing import List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,9 +8,42 @@ class Settings(BaseSettings):
     service_port: int = int(os.getenv("SERVICE_PORT", "8002"))
     environment: str = os.getenv("ENVIRONMENT", "development")
     
+    # Startup settings
+    # Create missing tables on startup; set false to leave the schema to Alembic (make init-db)
+    db_create_all: bool = os.getenv("DB_CREATE_ALL", "true").lower() == "true"
+    startup_schema_timeout: float = float(os.getenv("STARTUP_SCHEMA_TIMEOUT", "30"))  # seconds; startup fails after
+    db_pool_prewarm: int = int(os.getenv("DB_POOL_PREWARM", "5"))  # connections opened per engine at startup
+    redis_pool_prewarm: int = int(os.getenv("REDIS_POOL_PREWARM", "5"))  # connections opened per node at startup
+    startup_prewarm_timeout: float = float(os.getenv("STARTUP_PREWARM_TIMEOUT", "10"))
+    
+    # Read replica settings; comma-separated URLs, empty sends every read to the primary
+    database_replica_urls: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    replica_max_lag: float = float(os.getenv("REPLICA_MAX_LAG", "5"))  # seconds
+    replica_check_interval: float = float(os.getenv("REPLICA_CHECK_INTERVAL", "1"))  # seconds
+    replica_sticky_ttl: int = int(os.getenv("REPLICA_STICKY_TTL", "60"))  # seconds a writer's read-after cookie lives
+    
+    # Comma-separated node URLs for client-side sharding; defaults to redis_url alone
+    redis_nodes: str = os.getenv("REDIS_NODES", "")
+    redis_virtual_nodes: int = int(os.getenv("REDIS_VIRTUAL_NODES", "160"))
+    
+    # Redis connection pool settings (per node)
+    redis_max_connections: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "100"))
+    redis_socket_timeout: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+    redis_socket_connect_timeout: float = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "1.0"))
+    
     # Analytics settings
     cache_ttl: int = 300  # 5 minutes for analytics cache
     batch_size: int = 1000  # Batch size for processing
+    max_event_batch_size: int = int(os.getenv("MAX_EVENT_BATCH_SIZE", "1000"))  # events per POST /events/batch
+    
+    @property
+    def replica_urls(self) -> List[str]:
+        return [url.strip() for url in self.database_replica_urls.split(",") if url.strip()]
+    
+    @property
+    def redis_node_urls(self) -> List[str]:
+        nodes = [url.strip() for url in self.redis_nodes.split(",") if url.strip()]
+        return nodes or [self.redis_url]
     
     class Config:
         env_file = ".env"
@@ -6,6 +6,13 @@ from app.config import settings
 engine = create_engine(settings.database_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read replicas: read-only sessions are handed out by app.services.replica_router
+replica_engines = [create_engine(url, pool_pre_ping=True) for url in settings.replica_urls]
+ReplicaSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    for replica_engine in replica_engines
+]
+
 Base = declarative_base()
 
 def get_database():
@@ -1,10 +1,18 @@
+import time
+IMPORT_STARTED = time.monotonic()
+
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from app.api.routes.analytics_routes import router
-from app.database import engine
+from app.database import engine, replica_engines
 from app.models.analytics_model import Base
 from app.config import settings
+from app.services.redis_service import redis_service
+from app.services.replica_router import replica_router
+from app.utils.startup import StartupTimer, prewarm_engines
 
 # Configure logging
 logging.basicConfig(
@@ -14,14 +22,62 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Nothing above touches the database or Redis; connections are made in lifespan()
+startup_timer = StartupTimer()
+startup_timer.record("imports", time.monotonic() - IMPORT_STARTED)
+
+async def create_schema():
+    """Create missing tables (DB_CREATE_ALL=true), within startup_schema_timeout"""
+    try:
+        # The thread can't be cancelled, but startup stops waiting for it
+        await asyncio.wait_for(
+            asyncio.to_thread(Base.metadata.create_all, bind=engine),
+            timeout=settings.startup_schema_timeout
+        )
+    except asyncio.TimeoutError:
+        raise RuntimeError(f"Schema creation did not finish within {settings.startup_schema_timeout}s")
+
+async def prewarm_pools():
+    """Fill the database and Redis pools concurrently so first requests don't pay for connects"""
+    engines = [(db_engine, settings.db_pool_prewarm) for db_engine in [engine, *replica_engines]]
+    try:
+        db_connections, redis_connections = await asyncio.wait_for(
+            asyncio.gather(prewarm_engines(engines), redis_service.prewarm(settings.redis_pool_prewarm)),
+            timeout=settings.startup_prewarm_timeout
+        )
+        logger.info(f"Prewarmed {db_connections} database and {redis_connections} Redis connections")
+    except asyncio.TimeoutError:
+        logger.warning(
+            f"Pool prewarm did not finish within {settings.startup_prewarm_timeout}s; "
+            f"remaining connections will be opened on demand"
+        )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Analytics Service starting up...")
+    logger.info(f"Environment: {settings.environment}")
+    logger.info(f"Database URL: {settings.database_url}")
+    if settings.db_create_all:
+        with startup_timer.phase("schema"):
+            await create_schema()
+    with startup_timer.phase("pools"):
+        await prewarm_pools()
+    with startup_timer.phase("background_tasks"):
+        replica_router.start()
+    logger.info(f"Analytics Service started in {startup_timer.total:.2f}s ({startup_timer.summary()})")
+    
+    yield
+    
+    logger.info("Analytics Service shutting down...")
+    await replica_router.stop()
+    await redis_service.close()
 
 # Create FastAPI app
 app = FastAPI(
     title="Analytics Service",
     description="Analytics and tracking service for URL shortener",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -39,17 +95,7 @@ app.include_router(router, prefix="/analytics", tags=["analytics"])
 @app.get("/health")
 async def health_check():
     """Service health check"""
-    return {"status": "healthy", "service": "analytics-service"}
-
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Analytics Service starting up...")
-    logger.info(f"Environment: {settings.environment}")
-    logger.info(f"Database URL: {settings.database_url}")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Analytics Service shutting down...")
+    return {"status": "healthy", "service": "analytics-service", "startup": startup_timer.stats()}
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,5 +1,5 @@
 from .analytics_schema import (
-    ClickEventCreate, ClickEventResponse, 
+    ClickEventCreate, ClickEventBatch, ClickEventResponse, 
     AnalyticsStats, AnalyticsReport, 
     TopStats, TimeSeriesData
 )
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import List, Dict, Optional
+from app.config import settings
 
 class ClickEventCreate(BaseModel):
     short_code: str
@@ -9,6 +10,11 @@ class ClickEventCreate(BaseModel):
     referer: Optional[str] = None
     country: Optional[str] = None
     city: Optional[str] = None
+    # When the click happened; set by senders that queue events, else the insert time
+    timestamp: Optional[datetime] = None
+
+class ClickEventBatch(BaseModel):
+    events: List[ClickEventCreate] = Field(..., min_length=1, max_length=settings.max_event_batch_size)
 
 class ClickEventResponse(BaseModel):
     id: int
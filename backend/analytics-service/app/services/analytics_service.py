@@ -12,6 +12,7 @@ from app.schemas.analytics_schema import (
     TimeSeriesData, AnalyticsReport
 )
 from app.services.redis_service import redis_service
+from app.services.replica_router import replica_router
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +23,7 @@ class AnalyticsService:
     async def record_click(self, click_data: ClickEventCreate) -> bool:
         """Record a click event"""
         try:
-            click_event = ClickEvent(**click_data.dict())
+            click_event = ClickEvent(**click_data.dict(exclude_none=True))
             self.db.add(click_event)
             self.db.commit()
             
@@ -36,8 +37,25 @@ class AnalyticsService:
             self.db.rollback()
             return False
     
-    async def get_analytics(self, short_code: str) -> Optional[AnalyticsStats]:
-        """Get comprehensive analytics for a short code"""
+    async def record_clicks(self, events: List[ClickEventCreate]) -> int:
+        """Record a batch of click events in one transaction; returns how many were stored"""
+        try:
+            self.db.bulk_insert_mappings(ClickEvent, [event.dict(exclude_none=True) for event in events])
+            self.db.commit()
+        except Exception as e:
+            logger.error(f"Error recording {len(events)} clicks: {e}")
+            self.db.rollback()
+            return 0
+        
+        short_codes = list({event.short_code for event in events})
+        invalidated_at = {"timestamp": datetime.now().isoformat()}
+        await redis_service.set_many({f"analytics:invalidate:{code}": invalidated_at for code in short_codes})
+        
+        logger.info(f"Recorded {len(events)} clicks for {len(short_codes)} codes")
+        return len(events)
+    
+    async def get_analytics(self, short_code: str, min_lsn: int = 0) -> Optional[AnalyticsStats]:
+        """Get comprehensive analytics for a short code; min_lsn is the reader's read-your-writes position"""
         # Try cache first
         cache_key = f"analytics:stats:{short_code}"
         cached_data = await redis_service.get(cache_key)
@@ -51,47 +69,49 @@ class AnalyticsService:
             week_start = today_start - timedelta(days=7)
             month_start = today_start - timedelta(days=30)
             
-            # Base query
-            base_query = self.db.query(ClickEvent).filter(ClickEvent.short_code == short_code)
-            
-            # Total and unique clicks
-            total_clicks = base_query.count()
-            unique_clicks = base_query.with_entities(distinct(ClickEvent.ip_address)).count()
-            
-            # Time-based clicks
-            clicks_today = base_query.filter(ClickEvent.timestamp >= today_start).count()
-            clicks_this_week = base_query.filter(ClickEvent.timestamp >= week_start).count()
-            clicks_this_month = base_query.filter(ClickEvent.timestamp >= month_start).count()
-            
-            # Top countries
-            country_data = self.db.query(
-                ClickEvent.country, 
-                func.count(ClickEvent.id).label('count')
-            ).filter(
-                and_(ClickEvent.short_code == short_code, ClickEvent.country.isnot(None))
-            ).group_by(ClickEvent.country).order_by(func.count(ClickEvent.id).desc()).limit(5).all()
-            
-            top_countries = [TopStats(name=country or "Unknown", count=count) for country, count in country_data]
-            
-            # Top referers
-            referer_data = self.db.query(
-                ClickEvent.referer, 
-                func.count(ClickEvent.id).label('count')
-            ).filter(
-                and_(ClickEvent.short_code == short_code, ClickEvent.referer.isnot(None))
-            ).group_by(ClickEvent.referer).order_by(func.count(ClickEvent.id).desc()).limit(5).all()
-            
-            top_referers = [TopStats(name=referer or "Direct", count=count) for referer, count in referer_data]
-            
-            # Click timeline (last 30 days)
-            timeline_data = self.db.query(
-                func.date(ClickEvent.timestamp).label('date'),
-                func.count(ClickEvent.id).label('clicks')
-            ).filter(
-                and_(ClickEvent.short_code == short_code, ClickEvent.timestamp >= month_start)
-            ).group_by(func.date(ClickEvent.timestamp)).order_by(func.date(ClickEvent.timestamp)).all()
-            
-            click_timeline = [TimeSeriesData(date=str(date), clicks=clicks) for date, clicks in timeline_data]
+            # Read from a replica that has seen this reader's own writes
+            with replica_router.read_session(self.db, min_lsn) as db:
+                # Base query
+                base_query = db.query(ClickEvent).filter(ClickEvent.short_code == short_code)
+            
+                # Total and unique clicks
+                total_clicks = base_query.count()
+                unique_clicks = base_query.with_entities(distinct(ClickEvent.ip_address)).count()
+            
+                # Time-based clicks
+                clicks_today = base_query.filter(ClickEvent.timestamp >= today_start).count()
+                clicks_this_week = base_query.filter(ClickEvent.timestamp >= week_start).count()
+                clicks_this_month = base_query.filter(ClickEvent.timestamp >= month_start).count()
+            
+                # Top countries
+                country_data = db.query(
+                    ClickEvent.country, 
+                    func.count(ClickEvent.id).label('count')
+                ).filter(
+                    and_(ClickEvent.short_code == short_code, ClickEvent.country.isnot(None))
+                ).group_by(ClickEvent.country).order_by(func.count(ClickEvent.id).desc()).limit(5).all()
+            
+                top_countries = [TopStats(name=country or "Unknown", count=count) for country, count in country_data]
+            
+                # Top referers
+                referer_data = db.query(
+                    ClickEvent.referer, 
+                    func.count(ClickEvent.id).label('count')
+                ).filter(
+                    and_(ClickEvent.short_code == short_code, ClickEvent.referer.isnot(None))
+                ).group_by(ClickEvent.referer).order_by(func.count(ClickEvent.id).desc()).limit(5).all()
+            
+                top_referers = [TopStats(name=referer or "Direct", count=count) for referer, count in referer_data]
+            
+                # Click timeline (last 30 days)
+                timeline_data = db.query(
+                    func.date(ClickEvent.timestamp).label('date'),
+                    func.count(ClickEvent.id).label('clicks')
+                ).filter(
+                    and_(ClickEvent.short_code == short_code, ClickEvent.timestamp >= month_start)
+                ).group_by(func.date(ClickEvent.timestamp)).order_by(func.date(ClickEvent.timestamp)).all()
+            
+                click_timeline = [TimeSeriesData(date=str(date), clicks=clicks) for date, clicks in timeline_data]
             
             analytics = AnalyticsStats(
                 short_code=short_code,
@@ -121,16 +141,17 @@ class AnalyticsService:
             today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
             week_start = today_start - timedelta(days=7)
             
-            total_clicks = self.db.query(ClickEvent).count()
-            unique_ips = self.db.query(distinct(ClickEvent.ip_address)).count()
-            clicks_today = self.db.query(ClickEvent).filter(ClickEvent.timestamp >= today_start).count()
-            clicks_this_week = self.db.query(ClickEvent).filter(ClickEvent.timestamp >= week_start).count()
-            
-            # Top URLs by clicks
-            top_urls = self.db.query(
-                ClickEvent.short_code,
-                func.count(ClickEvent.id).label('clicks')
-            ).group_by(ClickEvent.short_code).order_by(func.count(ClickEvent.id).desc()).limit(10).all()
+            with replica_router.read_session(self.db) as db:
+                total_clicks = db.query(ClickEvent).count()
+                unique_ips = db.query(distinct(ClickEvent.ip_address)).count()
+                clicks_today = db.query(ClickEvent).filter(ClickEvent.timestamp >= today_start).count()
+                clicks_this_week = db.query(ClickEvent).filter(ClickEvent.timestamp >= week_start).count()
+            
+                # Top URLs by clicks
+                top_urls = db.query(
+                    ClickEvent.short_code,
+                    func.count(ClickEvent.id).label('clicks')
+                ).group_by(ClickEvent.short_code).order_by(func.count(ClickEvent.id).desc()).limit(10).all()
             
             return {
                 "total_clicks": total_clicks,
@@ -0,0 +1,69 @@
+import bisect
+import hashlib
+from collections import defaultdict
+from typing import Dict, List, Iterable
+
+class HashRing:
+    """Consistent hash ring with virtual nodes.
+    
+    Each node is placed on the ring at `replicas` points, and a key belongs to
+    the first point clockwise from its hash. Adding or removing one of N nodes
+    only moves about 1/N of the keys. Keys containing a {tag} are hashed on
+    the tag alone, as Redis Cluster does, so related keys can share a node.
+    
+    Every service ships an identical copy of this module and they share
+    Redis nodes; tests/test_hash_ring.py pins key placement in each of them.
+    """
+    
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 160):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self.nodes: List[str] = []
+        for node in nodes:
+            self.add_node(node)
+    
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+    
+    @staticmethod
+    def hash_slot_key(key: str) -> str:
+        """The part of a key that is hashed: the first non-empty {tag}, else the whole key"""
+        start = key.find("{")
+        if start != -1:
+            end = key.find("}", start + 1)
+            if end > start + 1:
+                return key[start + 1:end]
+        return key
+    
+    def add_node(self, node: str):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for i in range(self.replicas):
+            point = self._hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+    
+    def remove_node(self, node: str):
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+    
+    def get_node(self, key: str) -> str:
+        if not self._points:
+            raise LookupError("Hash ring has no nodes")
+        index = bisect.bisect(self._points, self._hash(self.hash_slot_key(key)))
+        return self._owners[index % len(self._owners)]
+    
+    def group(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        """Split keys by owning node, keeping their relative order"""
+        groups: Dict[str, List[str]] = defaultdict(list)
+        for key in keys:
+            groups[self.get_node(key)].append(key)
+        return dict(groups)
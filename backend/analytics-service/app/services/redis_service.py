@@ -1,30 +1,110 @@
-import redis
+import redis.asyncio as redis
+import asyncio
 import json
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from app.services.hash_ring import HashRing
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
 class RedisService:
+    """Redis client sharded across settings.redis_node_urls with a consistent hash ring"""
+    
     def __init__(self):
+        self.nodes: Dict[str, redis.Redis] = {}
+        self.ring = HashRing(replicas=settings.redis_virtual_nodes)
+        self.client = None
         try:
-            self.client = redis.from_url(settings.redis_url, decode_responses=True)
-            self.client.ping()
-            logger.info("Analytics Redis connection established successfully")
+            for url in settings.redis_node_urls:
+                self.add_node(url)
+            self.client = next(iter(self.nodes.values()), None)
         except Exception as e:
-            logger.error(f"Analytics Redis connection failed: {e}")
+            logger.error(f"Analytics Redis client setup failed: {e}")
+            self.nodes = {}
+            self.ring = HashRing(replicas=settings.redis_virtual_nodes)
             self.client = None
     
+    def add_node(self, url: str):
+        pool = redis.ConnectionPool.from_url(
+            url,
+            max_connections=settings.redis_max_connections,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_connect_timeout,
+            decode_responses=True,
+        )
+        self.nodes[url] = redis.Redis(connection_pool=pool)
+        self.ring.add_node(url)
+    
+    async def remove_node(self, url: str):
+        client = self.nodes.pop(url, None)
+        self.ring.remove_node(url)
+        if client is not None:
+            if client is self.client:
+                self.client = next(iter(self.nodes.values()), None)
+            await client.aclose(close_connection_pool=True)
+    
     def is_available(self) -> bool:
         return self.client is not None
     
+    def client_for(self, key: str) -> redis.Redis:
+        return self.nodes[self.ring.get_node(key)]
+    
+    def group_keys(self, keys: List[str]) -> Dict[redis.Redis, List[str]]:
+        return {self.nodes[node]: node_keys for node, node_keys in self.ring.group(keys).items()}
+    
+    async def ping(self) -> bool:
+        if not self.is_available():
+            return False
+            
+        try:
+            await asyncio.gather(*(client.ping() for client in self.nodes.values()))
+            logger.info(f"Analytics Redis connection established successfully ({len(self.nodes)} nodes)")
+            return True
+        except Exception as e:
+            logger.error(f"Analytics Redis connection failed: {e}")
+            return False
+    
+    async def prewarm(self, connections: int) -> int:
+        """Open `connections` pooled connections per node up front (at least one, as a ping)"""
+        if not self.is_available():
+            return 0
+        
+        opened = await asyncio.gather(*(
+            self._prewarm_node(client, max(1, min(connections, settings.redis_max_connections)))
+            for client in self.nodes.values()
+        ))
+        if all(opened):
+            logger.info(f"Analytics Redis pools prewarmed with {sum(opened)} connections ({len(self.nodes)} nodes)")
+        else:
+            logger.error(f"Analytics Redis prewarm could not reach {opened.count(0)} of {len(self.nodes)} nodes")
+        return sum(opened)
+    
+    async def _prewarm_node(self, client: redis.Redis, connections: int) -> int:
+        pool = client.connection_pool
+        # Check out every connection at once so the pool has to open them all
+        results = await asyncio.gather(
+            *(pool.get_connection("PING") for _ in range(connections)),
+            return_exceptions=True
+        )
+        opened = 0
+        for result in results:
+            if isinstance(result, Exception):
+                continue
+            await pool.release(result)
+            opened += 1
+        return opened
+    
+    async def close(self):
+        for client in self.nodes.values():
+            await client.aclose(close_connection_pool=True)
+    
     async def get(self, key: str) -> Optional[Dict[str, Any]]:
         if not self.is_available():
             return None
             
         try:
-            data = self.client.get(key)
+            data = await self.client_for(key).get(key)
             if data:
                 return json.loads(data)
             return None
@@ -38,10 +118,63 @@ class RedisService:
             
         try:
             ttl = ttl or settings.cache_ttl
-            self.client.setex(key, ttl, json.dumps(value, default=str))
+            await self.client_for(key).setex(key, ttl, json.dumps(value, default=str))
             return True
         except Exception as e:
             logger.error(f"Redis SET error for key {key}: {e}")
             return False
+    
+    async def mget(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        if not self.is_available() or not keys:
+            return [None] * len(keys)
+            
+        try:
+            groups = self.group_keys(keys)
+            results = await asyncio.gather(*(client.mget(node_keys) for client, node_keys in groups.items()))
+            values = {}
+            for node_keys, node_values in zip(groups.values(), results):
+                values.update(zip(node_keys, node_values))
+            return [json.loads(values[key]) if values[key] else None for key in keys]
+        except Exception as e:
+            logger.error(f"Redis MGET error for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+    
+    async def set_many(self, items: Dict[str, Dict[str, Any]], ttl: int = None) -> bool:
+        if not self.is_available() or not items:
+            return False
+            
+        try:
+            ttl = ttl or settings.cache_ttl
+            
+            async def run(client, keys):
+                async with client.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.setex(key, ttl, json.dumps(items[key], default=str))
+                    await pipe.execute()
+            
+            await asyncio.gather(*(run(client, keys) for client, keys in self.group_keys(list(items)).items()))
+            return True
+        except Exception as e:
+            logger.error(f"Redis SET_MANY error for {len(items)} keys: {e}")
+            return False
+    
+    async def incr_many(self, amounts: Dict[str, int]) -> Dict[str, int]:
+        if not self.is_available() or not amounts:
+            return {}
+            
+        try:
+            async def run(client, keys):
+                async with client.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.incrby(key, amounts[key])
+                    return dict(zip(keys, await pipe.execute()))
+            
+            results = {}
+            for node_results in await asyncio.gather(*(run(client, keys) for client, keys in self.group_keys(list(amounts)).items())):
+                results.update(node_results)
+            return results
+        except Exception as e:
+            logger.error(f"Redis INCR_MANY error for {len(amounts)} keys: {e}")
+            return {}
 
-redis_service = RedisService()
\ No newline at end of file
+redis_service = RedisService()
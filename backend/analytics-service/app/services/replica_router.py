@@ -0,0 +1,196 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Iterator
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.orm import Session, sessionmaker
+from app.database import engine, replica_engines, ReplicaSessionLocals
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Carries a writer's last commit position to its later reads
+READ_AFTER_COOKIE = "read_after_lsn"
+READ_AFTER_HEADER = "X-Read-After-LSN"
+
+REPLICA_STATUS_SQL = text("""
+    SELECT pg_last_wal_replay_lsn()::text,
+           CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+           END
+""")
+
+def parse_lsn(lsn: Optional[str]) -> int:
+    """'16/B374D848' -> a comparable integer WAL position"""
+    if not lsn:
+        return 0
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+class Replica:
+    def __init__(self, name: str, sessionmaker: sessionmaker):
+        self.name = name
+        self.sessionmaker = sessionmaker
+        self.healthy = False
+        self.replay_lsn = 0
+        self.lag_seconds: Optional[float] = None
+        self.lag_bytes: Optional[int] = None
+        self.checked_at: Optional[float] = None
+
+    def usable(self, min_lsn: int = 0) -> bool:
+        return (
+            self.healthy
+            and self.lag_seconds is not None
+            and self.lag_seconds <= settings.replica_max_lag
+            and self.replay_lsn >= min_lsn
+        )
+
+class ReplicaRouter:
+    """Routes read-only sessions to read replicas, falling back to the primary.
+
+    Read-your-writes is per writer, not per short code: each write request
+    hands the primary's WAL position back to its client (remember_write,
+    one query per request and nothing in Redis), and the client's reads
+    carry it back as a cookie or X-Read-After-LSN header. Those reads need
+    a replica that has replayed that far, or use the primary. Everyone
+    else reads from any replica within replica_max_lag, so a hot code's
+    stats aren't pinned to the primary by other people's clicks.
+    """
+
+    def __init__(self, replicas: List[Replica]):
+        self.replicas = replicas
+        self._next = itertools.cycle(replicas) if replicas else None
+        self._task = None
+        self.primary_lsn = 0
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.sticky_reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def remember_write(self, db: Session, response: Response):
+        """Give the writer a token so its next reads see what db just committed"""
+        if not self.enabled:
+            return
+        try:
+            # A plain integer, so the cookie value needs no quoting
+            token = str(parse_lsn(db.execute(text("SELECT pg_current_wal_lsn()::text")).scalar()))
+            response.set_cookie(READ_AFTER_COOKIE, token, max_age=settings.replica_sticky_ttl, httponly=True)
+            response.headers[READ_AFTER_HEADER] = token
+        except Exception as e:
+            logger.error(f"Failed to record write LSN: {e}")
+
+    def min_lsn_for(self, request: Request) -> int:
+        """WAL position a replica must have replayed to serve this client's reads"""
+        if not self.enabled:
+            return 0
+        token = request.headers.get(READ_AFTER_HEADER) or request.cookies.get(READ_AFTER_COOKIE)
+        try:
+            return int(token) if token else 0
+        except ValueError:
+            return 0
+
+    @contextmanager
+    def read_session(self, primary: Session, min_lsn: int = 0) -> Iterator[Session]:
+        """A replica session for a read-only query, or primary if no replica qualifies"""
+        replica = self._pick(min_lsn)
+        if replica is None:
+            self.primary_reads += 1
+            yield primary
+            return
+
+        self.replica_reads += 1
+        db = replica.sessionmaker()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _pick(self, min_lsn: int) -> Optional[Replica]:
+        if not self.enabled:
+            return None
+        for _ in range(len(self.replicas)):
+            replica = next(self._next)
+            if replica.usable(min_lsn):
+                return replica
+        if min_lsn and any(replica.usable() for replica in self.replicas):
+            self.sticky_reads += 1
+        return None
+
+    def start(self):
+        if self._task is None and self.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def check(self):
+        """Refresh replay LSN and lag for every replica (blocking)"""
+        try:
+            with engine.connect() as conn:
+                self.primary_lsn = parse_lsn(conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar())
+        except Exception as e:
+            logger.error(f"Primary WAL position check failed: {e}")
+        for replica in self.replicas:
+            self._check_replica(replica)
+
+    def _check_replica(self, replica: Replica):
+        try:
+            db = replica.sessionmaker()
+            try:
+                replay_lsn, lag = db.execute(REPLICA_STATUS_SQL).one()
+            finally:
+                db.close()
+            replica.replay_lsn = parse_lsn(replay_lsn)
+            replica.lag_seconds = float(lag) if lag is not None else None
+            replica.lag_bytes = max(self.primary_lsn - replica.replay_lsn, 0) if self.primary_lsn else None
+            replica.healthy = replay_lsn is not None  # NULL when the server isn't in recovery
+        except Exception as e:
+            if replica.healthy:
+                logger.warning(f"Read replica {replica.name} is unavailable: {e}")
+            replica.healthy = False
+        replica.checked_at = time.time()
+
+    async def _run(self):
+        while True:
+            try:
+                # Sync engines; keep the checks off the event loop
+                await asyncio.to_thread(self.check)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Replica lag check failed: {e}")
+            await asyncio.sleep(settings.replica_check_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lag_seconds": replica.lag_seconds,
+                    "lag_bytes": replica.lag_bytes,
+                    "checked_at": replica.checked_at,
+                }
+                for replica in self.replicas
+            ],
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+        }
+
+replica_router = ReplicaRouter([
+    Replica(replica_engine.url.render_as_string(hide_password=True), sessionmaker)
+    for replica_engine, sessionmaker in zip(replica_engines, ReplicaSessionLocals)
+])
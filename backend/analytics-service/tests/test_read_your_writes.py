@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.deps import get_db
+from app.api.routes.analytics_routes import router
+from app.services.analytics_service import AnalyticsService
+from app.services.replica_router import READ_AFTER_COOKIE, READ_AFTER_HEADER, Replica, parse_lsn, replica_router
+
+PRIMARY_LSN = "0/3000000"
+REPLICA_LSN = "0/2000000"
+CLICK = {"short_code": "abc", "ip_address": "203.0.113.7"}
+
+class FakeSession:
+    """Answers the WAL position query remember_write runs on the primary"""
+    
+    def execute(self, statement):
+        return SimpleNamespace(scalar=lambda: PRIMARY_LSN)
+
+@pytest.fixture
+def client(monkeypatch):
+    replica = Replica("replica", sessionmaker=None)
+    replica.healthy = True
+    replica.lag_seconds = 0.0
+    replica.replay_lsn = parse_lsn(REPLICA_LSN)
+    monkeypatch.setattr(replica_router, "replicas", [replica])
+    monkeypatch.setattr(replica_router, "_next", iter(lambda: replica, None))
+    
+    async def record_click(self, click_data):
+        return True
+    
+    reads = []
+    
+    async def get_analytics(self, short_code, min_lsn=0):
+        # Where the real query would run
+        reads.append(replica_router._pick(min_lsn))
+        return None
+    
+    monkeypatch.setattr(AnalyticsService, "record_click", record_click)
+    monkeypatch.setattr(AnalyticsService, "get_analytics", get_analytics)
+    
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = FakeSession
+    client = TestClient(app)
+    client.reads = reads
+    return client
+
+def test_write_returns_read_after_token(client):
+    response = client.post("/events/", json=CLICK)
+    assert response.status_code == 200
+    assert response.headers[READ_AFTER_HEADER] == str(parse_lsn(PRIMARY_LSN))
+    assert response.cookies[READ_AFTER_COOKIE] == str(parse_lsn(PRIMARY_LSN))
+
+def test_read_after_write_goes_to_primary(client):
+    client.post("/events/", json=CLICK)
+    client.get("/stats/abc")
+    # The replica hasn't replayed the write yet
+    assert client.reads == [None]
+
+def test_read_without_token_uses_replica(client):
+    client.get("/stats/abc")
+    assert client.reads == [replica_router.replicas[0]]
+
+def test_token_in_header_goes_to_primary(client):
+    client.get("/stats/abc", headers={READ_AFTER_HEADER: str(parse_lsn(PRIMARY_LSN))})
+    assert client.reads == [None]
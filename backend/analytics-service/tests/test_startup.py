@@ -0,0 +1,15 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from app.utils.startup import prewarm_engines
+
+def test_prewarm_warms_each_engine_once_up_to_its_pool_size(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'prewarm.db'}", poolclass=QueuePool, pool_size=2)
+    try:
+        # The same engine listed twice, as a primary that is also its own replica
+        opened = asyncio.run(prewarm_engines([(engine, 5), (engine, 3)]))
+        assert (opened, engine.pool.checkedin()) == (2, 2)
+    finally:
+        engine.dispose()
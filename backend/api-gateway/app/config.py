@@ -1,13 +1,86 @@
 import os
+from typing import List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
+    # Comma-separated to balance over several replicas of a service
     url_service_url: str = os.getenv("URL_SERVICE_URL", "http://localhost:8001")
     analytics_service_url: str = os.getenv("ANALYTICS_SERVICE_URL", "http://localhost:8002")
+    load_balancing: str = os.getenv("LOAD_BALANCING", "least_outstanding")  # least_outstanding or ewma
+    lb_ewma_alpha: float = float(os.getenv("LB_EWMA_ALPHA", "0.3"))  # weight of the newest latency sample
+    # Background endpoint health checks
+    health_check_interval: float = float(os.getenv("HEALTH_CHECK_INTERVAL", "5"))
+    unhealthy_threshold: int = int(os.getenv("UNHEALTHY_THRESHOLD", "2"))  # failed checks in a row before ejection
+    healthy_threshold: int = int(os.getenv("HEALTHY_THRESHOLD", "2"))  # passing checks in a row before re-admission
     redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    # Comma-separated node URLs for client-side sharding; defaults to redis_url alone
+    redis_nodes: str = os.getenv("REDIS_NODES", "")
+    redis_virtual_nodes: int = int(os.getenv("REDIS_VIRTUAL_NODES", "160"))
+    redis_max_connections: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "100"))
+    redis_socket_timeout: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+    redis_socket_connect_timeout: float = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "1.0"))
     api_key: str = os.getenv("API_KEY", "default-gateway-key")
     rate_limit_per_minute: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
+    # redis: one Redis call per request; hybrid: spend tokens leased from Redis in batches, synced in the background
+    rate_limit_mode: str = os.getenv("RATE_LIMIT_MODE", "redis")
+    rate_limit_lease_fraction: float = float(os.getenv("RATE_LIMIT_LEASE_FRACTION", "0.1"))  # share of the per-minute quota per lease
+    rate_limit_sync_interval: float = float(os.getenv("RATE_LIMIT_SYNC_INTERVAL", "0.25"))  # seconds between lease top-ups
+    rate_limit_idle_ttl: float = float(os.getenv("RATE_LIMIT_IDLE_TTL", "10"))  # seconds before an idle client's tokens are handed back
+    rate_limit_local_max_clients: int = int(os.getenv("RATE_LIMIT_LOCAL_MAX_CLIENTS", "100000"))
     environment: str = os.getenv("ENVIRONMENT", "development")
+    batch_request_timeout: float = float(os.getenv("BATCH_REQUEST_TIMEOUT", "120"))
+    # Edge redirects: answer cached codes from url-service's Redis cache without calling it.
+    # CACHE_LAYOUT and CACHE_HASH_BUCKETS must match url-service's settings.
+    edge_resolve_enabled: bool = os.getenv("EDGE_RESOLVE_ENABLED", "false").lower() == "true"
+    cache_layout: str = os.getenv("CACHE_LAYOUT", "keys")  # keys or hash
+    cache_hash_buckets: int = int(os.getenv("CACHE_HASH_BUCKETS", "262144"))
+    # Click events are queued in-process and posted to analytics-service in batches
+    analytics_queue_size: int = int(os.getenv("ANALYTICS_QUEUE_SIZE", "10000"))
+    analytics_batch_size: int = int(os.getenv("ANALYTICS_BATCH_SIZE", "200"))  # at most analytics' MAX_EVENT_BATCH_SIZE
+    analytics_flush_interval: float = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "0.5"))  # seconds to fill a batch
+    analytics_workers: int = int(os.getenv("ANALYTICS_WORKERS", "2"))
+    analytics_overflow_policy: str = os.getenv("ANALYTICS_OVERFLOW_POLICY", "drop")  # drop, sample or spill
+    analytics_sample_rate: float = float(os.getenv("ANALYTICS_SAMPLE_RATE", "0.1"))  # share kept while sampling
+    analytics_sample_threshold: float = float(os.getenv("ANALYTICS_SAMPLE_THRESHOLD", "0.8"))  # queue fill that starts sampling
+    analytics_spill_max: int = int(os.getenv("ANALYTICS_SPILL_MAX", "1000000"))  # events kept in the Redis spill list
+    analytics_retry_backoff: float = float(os.getenv("ANALYTICS_RETRY_BACKOFF", "1"))  # seconds a worker pauses after a failed post
+    analytics_drain_timeout: float = float(os.getenv("ANALYTICS_DRAIN_TIMEOUT", "5"))  # seconds spent flushing on shutdown
+    # Upstream calls: each request's total time budget in seconds, retries and hedges included
+    upstream_timeout: float = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+    redirect_timeout: float = float(os.getenv("REDIRECT_TIMEOUT", "2"))
+    analytics_timeout: float = float(os.getenv("ANALYTICS_TIMEOUT", "5"))
+    health_check_timeout: float = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+    upstream_connect_timeout: float = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "1"))
+    upstream_max_connections: int = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "200"))
+    # Per-service circuit breaker
+    circuit_failure_threshold: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # consecutive failures that open it
+    circuit_open_seconds: float = float(os.getenv("CIRCUIT_OPEN_SECONDS", "10"))  # before half-open probing
+    circuit_half_open_probes: int = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "1"))
+    # Retries of idempotent requests, limited per service by a retry budget
+    upstream_max_retries: int = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+    upstream_retry_backoff: float = float(os.getenv("UPSTREAM_RETRY_BACKOFF", "0.05"))  # seconds, doubled per retry
+    retry_budget_ratio: float = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))  # retries earned per request
+    retry_budget_min_per_second: float = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "5"))
+    retry_budget_cap: float = float(os.getenv("RETRY_BUDGET_CAP", "100"))
+    # Hedged GETs: a second attempt once the first is slower than this latency percentile
+    hedge_enabled: bool = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+    hedge_percentile: float = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+    hedge_min_delay: float = float(os.getenv("HEDGE_MIN_DELAY", "0.005"))
+    # Upstream bodies up to this many bytes are buffered; larger or unsized ones are streamed through
+    proxy_buffer_limit: int = int(os.getenv("PROXY_BUFFER_LIMIT", "65536"))
+    
+    @property
+    def redis_node_urls(self) -> List[str]:
+        nodes = [url.strip() for url in self.redis_nodes.split(",") if url.strip()]
+        return nodes or [self.redis_url]
+    
+    @property
+    def url_service_urls(self) -> List[str]:
+        return [url.strip() for url in self.url_service_url.split(",") if url.strip()]
+    
+    @property
+    def analytics_service_urls(self) -> List[str]:
+        return [url.strip() for url in self.analytics_service_url.split(",") if url.strip()]
     
     class Config:
         env_file = ".env"
@@ -1,8 +1,11 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-from app.routes.gateway_routes import router
+from app.routes.gateway_routes import router, click_events, rate_limiter, service_discovery
 from app.middleware.logging_middleware import LoggingMiddleware
+from app.middleware.rate_limiter import RateLimitHeadersMiddleware
+from app.services.redis_service import redis_service
 from app.config import settings
 
 # Configure logging
@@ -13,11 +16,30 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("API Gateway starting up...")
+    logger.info(f"Environment: {settings.environment}")
+    logger.info(f"URL Service URL: {settings.url_service_url}")
+    await redis_service.ping()
+    service_discovery.start()
+    click_events.start()
+    rate_limiter.start()
+
+    yield
+
+    logger.info("API Gateway shutting down...")
+    await click_events.stop()
+    await rate_limiter.stop()
+    await service_discovery.stop()
+    await redis_service.close()
+
 # Create FastAPI app
 app = FastAPI(
     title="URL Shortener API Gateway",
     description="API Gateway for URL Shortener Microservices",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add middleware
@@ -30,21 +52,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset", "Retry-After"],
 )
 
+# Rate limit headers for admitted requests; added last so it wraps every response
+app.add_middleware(RateLimitHeadersMiddleware)
+
 # Include routes
 app.include_router(router)
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("API Gateway starting up...")
-    logger.info(f"Environment: {settings.environment}")
-    logger.info(f"URL Service URL: {settings.url_service_url}")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("API Gateway shutting down...")
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
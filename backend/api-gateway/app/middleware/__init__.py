@@ -1,3 +1,3 @@
-from .rate_limiter import RateLimiter
+from .rate_limiter import RateLimiter, RateLimitHeadersMiddleware
 from .logging_middleware import LoggingMiddleware
 from .auth_middleware import AuthMiddleware
\ No newline at end of file
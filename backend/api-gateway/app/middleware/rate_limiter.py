@@ -1,54 +1,403 @@
-import redis
+import asyncio
+import math
 import time
+from dataclasses import dataclass
 from fastapi import HTTPException, Request
-from typing import Optional
+from typing import Any, Dict, Optional, List, Tuple
 import logging
+from app.services.redis_service import redis_service
+from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+RATE_LIMIT_KEY = "ratelimit:gcra:{}"
+HEADERS_STATE_KEY = "rate_limit_headers"
+
+RATE_LIMIT_MODES = ("redis", "hybrid")
+
+# GCRA: one key per client holding its theoretical arrival time (TAT) in
+# microseconds of Redis server time, so every gateway shares one clock.
+# A request is allowed when it arrives no earlier than TAT - tolerance;
+# each allowed request pushes TAT out by one emission interval.
+# Grants up to `requested` tokens (fewer when the quota runs short); a
+# negative count hands unspent tokens back.
+# Returns {granted, remaining, retry_after_us, reset_after_us}.
+GCRA_SCRIPT = """
+local emission = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000000 + tonumber(time[2])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local granted = requested
+if requested > 0 then
+    granted = math.max(math.min(requested, math.floor((now - (tat - tolerance)) / emission)), 0)
+end
+tat = tat + emission * granted
+if tat > now then
+    redis.call('SET', KEYS[1], string.format('%d', tat), 'PX', math.ceil((tat - now) / 1000))
+else
+    tat = now
+    redis.call('DEL', KEYS[1])
+end
+local remaining = math.floor((now - (tat - tolerance)) / emission)
+local retry_after = 0
+if remaining < 1 then
+    retry_after = tat - tolerance + emission - now
+end
+return {granted, remaining, retry_after, tat - now}
+"""
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds until a request would be allowed; 0 if allowed
+    reset_after: float  # seconds until the full quota is available again
+
+    def headers(self) -> List[Tuple[str, str]]:
+        headers = [
+            ("X-RateLimit-Limit", str(self.limit)),
+            ("X-RateLimit-Remaining", str(max(self.remaining, 0))),
+            ("X-RateLimit-Reset", str(math.ceil(self.reset_after))),
+        ]
+        if not self.allowed:
+            headers.append(("Retry-After", str(max(math.ceil(self.retry_after), 1))))
+        return headers
+
 class RateLimiter:
-    def __init__(self, redis_url: str, requests_per_minute: int = 60):
+    """Per-client GCRA limit of requests_per_minute, allowing bursts up to the full minute's quota.
+
+    One atomic script call per request on the node that owns the client's
+    key; memory is a single integer per active client. Fails open when
+    Redis is unreachable.
+    """
+
+    mode = "redis"
+
+    def __init__(self, requests_per_minute: int = 60, window_size: int = 60):
+        self.requests_per_minute = requests_per_minute
+        self.window_size = window_size
+        self.emission_interval = window_size * 1_000_000 // requests_per_minute  # microseconds per request
+        self.tolerance = self.emission_interval * requests_per_minute
+        self._script = None
+        self.checks = 0
+        self.denied = 0
+
+    @property
+    def script(self):
+        if self._script is None:
+            self._script = redis_service.register_script(GCRA_SCRIPT)
+        return self._script
+
+    def _result(self, granted: int, cost: int, remaining: int, retry_after: int, reset_after: int) -> RateLimitResult:
+        return RateLimitResult(
+            allowed=granted >= cost,
+            limit=self.requests_per_minute,
+            remaining=int(remaining),
+            retry_after=retry_after / 1_000_000,
+            reset_after=reset_after / 1_000_000,
+        )
+
+    async def acquire(self, client_id: str, cost: int = 1) -> Optional[RateLimitResult]:
+        """Take cost requests from client_id's quota; None when Redis can't be asked"""
+        if not redis_service.is_available():
+            return None
+
+        key = RATE_LIMIT_KEY.format(client_id)
         try:
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
-            self.requests_per_minute = requests_per_minute
-            self.window_size = 60  # 60 seconds
+            granted, remaining, retry_after, reset_after = await self.script(
+                keys=[key],
+                args=[self.emission_interval, self.tolerance, cost],
+                client=redis_service.client_for(key)
+            )
         except Exception as e:
-            logger.error(f"Failed to connect to Redis for rate limiting: {e}")
-            self.redis_client = None
-    
+            logger.error(f"Rate limiting error: {e}")
+            return None
+
+        return self._result(granted, cost, remaining, retry_after, reset_after)
+
+    async def acquire_many(self, costs: Dict[str, int]) -> Dict[str, Tuple[int, RateLimitResult]]:
+        """Take (or, with negative costs, hand back) tokens for many clients, one pipeline per node.
+
+        Returns the granted count and resulting quota per client; clients on
+        a node that failed are left out.
+        """
+        if not costs or not redis_service.is_available():
+            return {}
+
+        keys = {RATE_LIMIT_KEY.format(client_id): client_id for client_id in costs}
+        results: Dict[str, Tuple[int, RateLimitResult]] = {}
+
+        async def run(client, node_keys: List[str]):
+            try:
+                async with client.pipeline(transaction=False) as pipe:
+                    for key in node_keys:
+                        await self.script(
+                            keys=[key],
+                            args=[self.emission_interval, self.tolerance, costs[keys[key]]],
+                            client=pipe
+                        )
+                    replies = await pipe.execute()
+            except Exception as e:
+                logger.error(f"Rate limit sync error: {e}")
+                return
+            for key, (granted, remaining, retry_after, reset_after) in zip(node_keys, replies):
+                client_id = keys[key]
+                results[client_id] = (
+                    int(granted),
+                    self._result(granted, costs[client_id], remaining, retry_after, reset_after),
+                )
+
+        await asyncio.gather(*(run(client, node_keys) for client, node_keys in redis_service.group_keys(list(keys)).items()))
+        return results
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def deny(self, result: RateLimitResult):
+        self.denied += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded. Please try again later.",
+            headers=dict(result.headers())
+        )
+
     async def check_rate_limit(self, request: Request) -> bool:
         """Check if request is within rate limit"""
-        if not self.redis_client:
+        self.checks += 1
+        client_ip = request.client.host if request.client else "unknown"
+        result = await self.acquire(client_ip)
+        if result is None:
             return True  # Allow if Redis is not available
-        
-        client_ip = request.client.host
-        current_time = int(time.time())
-        window_start = current_time - self.window_size
-        
-        # Create a unique key for this IP
-        key = f"rate_limit:{client_ip}"
-        
+
+        if not result.allowed:
+            self.deny(result)
+
+        # Added to the response by RateLimitHeadersMiddleware
+        request.state.rate_limit_headers = result.headers()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "limit_per_minute": self.requests_per_minute,
+            "checks": self.checks,
+            "denied": self.denied,
+        }
+
+class LocalBucket:
+    """Tokens one gateway has leased from a client's global quota"""
+
+    __slots__ = ("tokens", "remaining", "reset_at", "blocked_until", "last_used", "lease")
+
+    def __init__(self, now: float):
+        self.tokens = 0  # leased from Redis and not yet spent here
+        self.remaining = 0  # global quota left when the last lease was taken
+        self.reset_at = now  # monotonic time the global quota is full again
+        self.blocked_until = 0.0  # global quota exhausted; deny locally until then
+        self.last_used = now
+        self.lease: Optional[asyncio.Future] = None
+
+class HybridRateLimiter(RateLimiter):
+    """The same global GCRA limit, with requests admitted from tokens leased in batches.
+
+    Each client's tokens are taken from Redis lease_size at a time and spent
+    in memory, so only about one request in lease_size waits on Redis. Every
+    sync_interval a background task tops up the leases of clients that are
+    running low and hands unspent tokens of idle clients back. Redis never
+    grants more than the global quota; the approximation is that tokens
+    parked on one instance can't be spent on another until handed back, and
+    that X-RateLimit-Remaining is this instance's view.
+    """
+
+    mode = "hybrid"
+
+    def __init__(self, requests_per_minute: int = 60, window_size: int = 60):
+        super().__init__(requests_per_minute, window_size)
+        self.lease_size = max(1, int(requests_per_minute * settings.rate_limit_lease_fraction))
+        self.low_water = max(1, self.lease_size // 2)
+        self.buckets: Dict[str, LocalBucket] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._last_sync = time.monotonic()
+
+        self.local_admits = 0
+        self.leases = 0
+        self.refills = 0
+        self.returned_tokens = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Hand every unspent token back so other instances can use them
+        await self._release(list(self.buckets))
+
+    async def check_rate_limit(self, request: Request) -> bool:
+        """Check if request is within rate limit, from the local lease when possible"""
+        self.checks += 1
+        client_ip = request.client.host if request.client else "unknown"
+        now = time.monotonic()
+        bucket = self.buckets.get(client_ip)
+        if bucket is None:
+            if len(self.buckets) >= settings.rate_limit_local_max_clients:
+                # Too many clients to track locally; check this one against Redis directly
+                self.checks -= 1
+                return await super().check_rate_limit(request)
+            bucket = self.buckets[client_ip] = LocalBucket(now)
+        bucket.last_used = now
+
+        if bucket.tokens < 1 and now >= bucket.blocked_until:
+            if not await self._lease(client_ip, bucket):
+                return True  # Allow if Redis is not available
+            now = time.monotonic()
+
+        if bucket.tokens < 1:
+            self.deny(RateLimitResult(
+                allowed=False,
+                limit=self.requests_per_minute,
+                remaining=0,
+                retry_after=max(bucket.blocked_until - now, self.emission_interval / 1_000_000),
+                reset_after=max(bucket.reset_at - now, 0),
+            ))
+
+        bucket.tokens -= 1
+        self.local_admits += 1
+        request.state.rate_limit_headers = RateLimitResult(
+            allowed=True,
+            limit=self.requests_per_minute,
+            remaining=bucket.tokens + bucket.remaining,
+            retry_after=0,
+            reset_after=max(bucket.reset_at - now, 0),
+        ).headers()
+        return True
+
+    async def _lease(self, client_id: str, bucket: LocalBucket) -> bool:
+        """Wait for a lease, joining one already in flight for this client; False if Redis failed"""
+        if bucket.lease is None:
+            bucket.lease = asyncio.ensure_future(self._fetch_lease(client_id, bucket))
+        lease = bucket.lease
         try:
-            # Remove old entries
-            self.redis_client.zremrangebyscore(key, 0, window_start)
-            
-            # Count current requests
-            current_requests = self.redis_client.zcard(key)
-            
-            if current_requests >= self.requests_per_minute:
-                raise HTTPException(
-                    status_code=429,
-                    detail="Rate limit exceeded. Please try again later."
-                )
-            
-            # Add current request
-            self.redis_client.zadd(key, {str(current_time): current_time})
-            self.redis_client.expire(key, self.window_size)
-            
-            return True
-            
-        except HTTPException:
-            raise
-        except Exception as e:
-            logger.error(f"Rate limiting error: {e}")
-            return True  # Allow if there's an error
\ No newline at end of file
+            return await asyncio.shield(lease)
+        finally:
+            if lease.done() and bucket.lease is lease:
+                bucket.lease = None
+
+    async def _fetch_lease(self, client_id: str, bucket: LocalBucket) -> bool:
+        self.leases += 1
+        leased = (await self.acquire_many({client_id: self.lease_size})).get(client_id)
+        if leased is None:
+            return False
+        self._apply(bucket, *leased)
+        return True
+
+    def _apply(self, bucket: LocalBucket, granted: int, result: RateLimitResult):
+        now = time.monotonic()
+        bucket.tokens += granted
+        bucket.remaining = max(result.remaining, 0)
+        bucket.reset_at = now + result.reset_after
+        bucket.blocked_until = now + result.retry_after if granted == 0 else 0.0
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.rate_limit_sync_interval)
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Rate limit sync error: {e}")
+
+    async def sync(self):
+        """Top up running-low leases of clients seen since the last sync; return idle clients' tokens"""
+        now = time.monotonic()
+        since, self._last_sync = self._last_sync, now
+        refill: Dict[str, int] = {}
+        idle: List[str] = []
+        for client_id, bucket in self.buckets.items():
+            if bucket.lease is not None:
+                continue
+            if now - bucket.last_used > settings.rate_limit_idle_ttl:
+                idle.append(client_id)
+            elif bucket.last_used >= since and bucket.tokens < self.low_water and now >= bucket.blocked_until:
+                refill[client_id] = self.lease_size
+
+        if refill:
+            for client_id, (granted, result) in (await self.acquire_many(refill)).items():
+                bucket = self.buckets.get(client_id)
+                if bucket is not None:
+                    self._apply(bucket, granted, result)
+                    self.refills += 1
+        await self._release(idle)
+
+    async def _release(self, client_ids: List[str]):
+        """Drop local state for clients, handing their unspent tokens back to Redis"""
+        unspent: Dict[str, int] = {}
+        for client_id in client_ids:
+            bucket = self.buckets.pop(client_id, None)
+            if bucket is not None and bucket.tokens >= 1:
+                unspent[client_id] = -int(bucket.tokens)
+        if unspent:
+            await self.acquire_many(unspent)
+            self.returned_tokens += -sum(unspent.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "lease_size": self.lease_size,
+            "clients": len(self.buckets),
+            "local_admits": self.local_admits,
+            "leases": self.leases,
+            "refills": self.refills,
+            "returned_tokens": self.returned_tokens,
+        }
+
+def create_rate_limiter(requests_per_minute: int) -> RateLimiter:
+    """Rate limiter for settings.rate_limit_mode"""
+    if settings.rate_limit_mode not in RATE_LIMIT_MODES:
+        raise ValueError(f"Unknown rate limit mode: {settings.rate_limit_mode}")
+    if settings.rate_limit_mode == "hybrid":
+        return HybridRateLimiter(requests_per_minute)
+    return RateLimiter(requests_per_minute)
+
+class RateLimitHeadersMiddleware:
+    """Copies the X-RateLimit-* headers of an admitted request onto its response.
+
+    Routes return their own Response objects (often streamed), so the headers
+    are added at the ASGI level rather than by each route.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = scope.get("state", {}).get(HEADERS_STATE_KEY)
+                if headers:
+                    message = {
+                        **message,
+                        "headers": [
+                            *message.get("headers", []),
+                            *((name.lower().encode(), value.encode()) for name, value in headers),
+                        ],
+                    }
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -1,11 +1,15 @@
 import json
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Dict, Optional
 from fastapi import APIRouter, Request, HTTPException, Depends
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 import httpx
 import logging
 from app.services.service_discovery import ServiceDiscovery
-from app.middleware.rate_limiter import RateLimiter
+from app.services.edge_resolver import edge_resolver
+from app.services.click_events import ClickEventQueue
+from app.middleware.rate_limiter import create_rate_limiter
 from app.middleware.auth_middleware import AuthMiddleware
 from app.config import settings
 
@@ -14,13 +18,94 @@ router = APIRouter()
 
 # Initialize services
 service_discovery = ServiceDiscovery()
-rate_limiter = RateLimiter(settings.redis_url, settings.rate_limit_per_minute)
+rate_limiter = create_rate_limiter(settings.rate_limit_per_minute)
 auth_middleware = AuthMiddleware(settings.api_key)
 
+async def post_click_events(events):
+    response = await service_discovery.forward_request(
+        "analytics-service",
+        "/analytics/events/batch",
+        method="POST",
+        timeout=settings.analytics_timeout,
+        json={"events": events}
+    )
+    response.raise_for_status()
+
+click_events = ClickEventQueue(post_click_events)
+
+# Connection-scoped headers (RFC 9110 7.6.1) plus ones the gateway's own server sets
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "proxy-connection",
+    "te", "trailer", "transfer-encoding", "upgrade", "date", "server",
+})
+# Request headers passed upstream; API keys, cookies and the rest stay at the gateway
+FORWARDED_REQUEST_HEADERS = (
+    "content-type", "accept", "accept-encoding", "accept-language", "user-agent", "x-read-after-lsn",
+)
+# Analytics' read-your-writes token; the one cookie upstream sees, sent on as X-Read-After-LSN
+READ_AFTER_COOKIE = "read_after_lsn"
+
+def forwarded_headers(request: Request) -> Dict[str, str]:
+    headers = {name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers}
+    if READ_AFTER_COOKIE in request.cookies:
+        headers.setdefault("x-read-after-lsn", request.cookies[READ_AFTER_COOKIE])
+    # Bodies are relayed undecoded, so upstream may only use an encoding the client accepts
+    headers.setdefault("accept-encoding", "identity")
+    return headers
+
+def passthrough_headers(response: httpx.Response) -> Dict[str, str]:
+    return {name: value for name, value in response.headers.items() if name not in HOP_BY_HOP_HEADERS}
+
+async def proxy(
+    service_name: str,
+    path: str,
+    request: Request,
+    body: Optional[bytes] = None,
+    timeout: Optional[float] = None
+) -> Response:
+    """Relay a request and its response byte for byte; small bodies are buffered, the rest streamed"""
+    kwargs = {"headers": forwarded_headers(request)}
+    if body is not None:
+        kwargs["content"] = body
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    upstream = await service_discovery.stream_request(service_name, path, method=request.method, **kwargs)
+    headers = passthrough_headers(upstream)
+    
+    length = upstream.headers.get("content-length")
+    if length is not None and int(length) <= settings.proxy_buffer_limit:
+        try:
+            content = b"".join([chunk async for chunk in upstream.aiter_raw()])
+        finally:
+            await upstream.aclose()
+        return Response(content=content, status_code=upstream.status_code, headers=headers)
+    
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        headers=headers,
+        background=BackgroundTask(upstream.aclose)
+    )
+
 @router.get("/health")
 async def gateway_health():
     """Gateway health check"""
-    return {"status": "healthy", "service": "api-gateway"}
+    return {
+        "status": "healthy",
+        "service": "api-gateway",
+        "edge_resolver": edge_resolver.stats(),
+        "click_events": click_events.stats(),
+    }
+
+@router.get("/admin/stats")
+async def admin_stats(authenticated: bool = Depends(auth_middleware.verify_api_key)):
+    """Upstream endpoint, rate limiter, edge resolver and click queue stats - requires authentication"""
+    return {
+        "upstreams": service_discovery.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "edge_resolver": edge_resolver.stats(),
+        "click_events": click_events.stats(),
+    }
 
 @router.get("/health/all")
 async def all_services_health():
@@ -28,7 +113,7 @@ async def all_services_health():
     services_health = {}
     
     for service_name in ["url-service", "analytics-service"]:
-        services_health[service_name] = await service_discovery.health_check(service_name)
+        services_health[service_name] = service_discovery.health_check(service_name)
     
     all_healthy = all(services_health.values())
     status_code = 200 if all_healthy else 503
@@ -49,24 +134,32 @@ async def create_short_url(request: Request):
     await rate_limiter.check_rate_limit(request)
     
     try:
-        body = await request.json()
-        response = await service_discovery.forward_request(
+        return await proxy("url-service", "/urls/", request, body=await request.body())
+    except httpx.RequestError as e:
+        logger.error(f"Failed to forward request: {e}")
+        raise HTTPException(status_code=503, detail="URL service unavailable")
+    except Exception as e:
+        logger.error(f"Error creating short URL: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/api/v1/shorten/batch")
+async def create_short_urls_bulk(request: Request):
+    """Create many short URLs in one request - forwarded to URL service"""
+    await rate_limiter.check_rate_limit(request)
+    
+    try:
+        return await proxy(
             "url-service",
-            "/urls/",
-            method="POST",
-            json=body,
-            headers={"Content-Type": "application/json"}
-        )
-        
-        return JSONResponse(
-            status_code=response.status_code,
-            content=response.json()
+            "/urls/batch",
+            request,
+            body=await request.body(),
+            timeout=settings.batch_request_timeout
         )
     except httpx.RequestError as e:
         logger.error(f"Failed to forward request: {e}")
         raise HTTPException(status_code=503, detail="URL service unavailable")
     except Exception as e:
-        logger.error(f"Error creating short URL: {e}")
+        logger.error(f"Error creating short URLs in bulk: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/api/v1/urls/{short_code}/stats")
@@ -75,16 +168,7 @@ async def get_url_stats(short_code: str, request: Request):
     await rate_limiter.check_rate_limit(request)
     
     try:
-        response = await service_discovery.forward_request(
-            "url-service",
-            f"/urls/{short_code}/stats",
-            method="GET"
-        )
-        
-        return JSONResponse(
-            status_code=response.status_code,
-            content=response.json()
-        )
+        return await proxy("url-service", f"/urls/{short_code}/stats", request)
     except httpx.RequestError as e:
         logger.error(f"Failed to forward request: {e}")
         raise HTTPException(status_code=503, detail="URL service unavailable")
@@ -102,16 +186,7 @@ async def deactivate_url(
     await rate_limiter.check_rate_limit(request)
     
     try:
-        response = await service_discovery.forward_request(
-            "url-service",
-            f"/urls/{short_code}",
-            method="DELETE"
-        )
-        
-        return JSONResponse(
-            status_code=response.status_code,
-            content=response.json()
-        )
+        return await proxy("url-service", f"/urls/{short_code}", request)
     except httpx.RequestError as e:
         logger.error(f"Failed to forward request: {e}")
         raise HTTPException(status_code=503, detail="URL service unavailable")
@@ -125,43 +200,34 @@ async def redirect_to_original(short_code: str, request: Request):
     await rate_limiter.check_rate_limit(request)
     
     try:
-        # Get original URL
-        response = await service_discovery.forward_request(
-            "url-service",
-            f"/redirect/{short_code}",
-            method="GET"
-        )
-        
-        if response.status_code == 307:
-            # Record analytics event
-            try:
-                analytics_data = {
-                    "short_code": short_code,
-                    "ip_address": request.client.host if request.client else "unknown",
-                    "user_agent": request.headers.get("user-agent"),
-                    "referer": request.headers.get("referer")
-                }
-                
-                # Send to analytics service (fire and forget)
-                await service_discovery.forward_request(
-                    "analytics-service",
-                    "/analytics/events/",
-                    method="POST",
-                    json=analytics_data
+        # Cached codes are answered here; everything else goes to url-service
+        redirect_url = await edge_resolver.resolve(short_code)
+        if redirect_url is None:
+            response = await service_discovery.forward_request(
+                "url-service",
+                f"/redirect/{short_code}",
+                method="GET",
+                timeout=settings.redirect_timeout,
+                headers={"accept-encoding": "identity"}
+            )
+            redirect_url = response.headers.get("location") if response.status_code == 307 else None
+            if not redirect_url:
+                return Response(
+                    content=response.content,
+                    status_code=response.status_code,
+                    headers=passthrough_headers(response)
                 )
-            except Exception as e:
-                # Don't fail redirect if analytics fails
-                logger.warning(f"Analytics tracking failed: {e}")
-            
-            # Extract redirect URL from response
-            redirect_url = response.headers.get("location")
-            if redirect_url:
-                return RedirectResponse(url=redirect_url, status_code=307)
         
-        return JSONResponse(
-            status_code=response.status_code,
-            content=response.json()
-        )
+        # Queue the analytics event; it is posted in a batch after the redirect has gone out
+        await click_events.emit({
+            "short_code": short_code,
+            "ip_address": request.client.host if request.client else "unknown",
+            "user_agent": request.headers.get("user-agent"),
+            "referer": request.headers.get("referer"),
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        })
+        
+        return RedirectResponse(url=redirect_url, status_code=307)
     except httpx.RequestError as e:
         logger.error(f"Failed to forward request: {e}")
         raise HTTPException(status_code=503, detail="URL service unavailable")
@@ -173,16 +239,7 @@ async def get_global_analytics(request: Request):
     await rate_limiter.check_rate_limit(request)
     
     try:
-        response = await service_discovery.forward_request(
-            "analytics-service",
-            "/analytics/global",
-            method="GET"
-        )
-        
-        return JSONResponse(
-            status_code=response.status_code,
-            content=response.json()
-        )
+        return await proxy("analytics-service", "/analytics/global", request, timeout=settings.analytics_timeout)
     except httpx.RequestError as e:
         logger.error(f"Failed to forward analytics request: {e}")
         raise HTTPException(status_code=503, detail="Analytics service unavailable")
@@ -204,16 +261,7 @@ async def get_url_analytics(short_code: str, request: Request):
     await rate_limiter.check_rate_limit(request)
     
     try:
-        response = await service_discovery.forward_request(
-            "analytics-service",
-            f"/analytics/stats/{short_code}",
-            method="GET"
-        )
-        
-        return JSONResponse(
-            status_code=response.status_code,
-            content=response.json()
-        )
+        return await proxy("analytics-service", f"/analytics/stats/{short_code}", request, timeout=settings.analytics_timeout)
     except httpx.RequestError as e:
         logger.error(f"Failed to forward analytics request: {e}")
         raise HTTPException(status_code=503, detail="Analytics service unavailable")
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional
+from app.services.redis_service import redis_service
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop", "sample", "spill")
+SPILL_KEY = "analytics:spill"
+
+class ClickEventQueue:
+    """Bounded in-process queue of click events, posted to analytics-service in batches.
+
+    Redirects only enqueue; background workers send up to batch_size events
+    per POST /analytics/events/batch, waiting at most flush_interval to fill
+    a batch. When the queue runs full the overflow policy decides:
+
+    - drop: new events are discarded
+    - sample: past sample_threshold of capacity only sample_rate of events
+      are kept, and a full queue drops
+    - spill: overflow, and batches analytics rejects, go to a capped Redis
+      list that workers drain once the queue is idle
+    """
+
+    def __init__(self, post_batch):
+        if settings.analytics_overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown analytics overflow policy: {settings.analytics_overflow_policy}")
+        self.post_batch = post_batch
+        self.policy = settings.analytics_overflow_policy
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.analytics_queue_size)
+        self.sample_depth = int(settings.analytics_queue_size * settings.analytics_sample_threshold)
+        self._workers: List[asyncio.Task] = []
+        # Workers holding events they haven't posted yet
+        self._busy = 0
+
+        self.enqueued = 0
+        self.posted = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.spilled = 0
+        self.unspilled = 0
+        self.failed_batches = 0
+        self.max_depth = 0
+        self.last_post_seconds: Optional[float] = None
+
+    async def emit(self, event: Dict[str, Any]) -> bool:
+        """Queue an event without waiting on analytics; False if the overflow policy discarded it"""
+        depth = self.queue.qsize()
+        if self.policy == "sample" and depth >= self.sample_depth and random.random() >= settings.analytics_sample_rate:
+            self.sampled_out += 1
+            return False
+
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            if self.policy == "spill" and await self._spill([event]):
+                return True
+            self.dropped += 1
+            return False
+
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, depth + 1)
+        return True
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._run()) for _ in range(settings.analytics_workers)]
+
+    async def stop(self):
+        """Let the workers empty the queue and post what they hold (up to analytics_drain_timeout), then stop them"""
+        deadline = time.monotonic() + settings.analytics_drain_timeout
+        while self._workers and (self._busy or not self.queue.empty()) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        
+        if not self.queue.empty():
+            logger.warning(f"Dropping {self.queue.qsize()} queued click events on shutdown")
+            self.dropped += self.queue.qsize()
+
+    def _take(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _next_batch(self, wait: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Up to batch_size events, filling for at most flush_interval after the first.
+
+        Waits for the first event indefinitely, or returns [] after `wait` seconds.
+        """
+        try:
+            batch = [await asyncio.wait_for(self.queue.get(), timeout=wait)]
+        except asyncio.TimeoutError:
+            return []
+        self._busy += 1
+        deadline = time.monotonic() + settings.analytics_flush_interval
+        while len(batch) < settings.analytics_batch_size:
+            batch.extend(self._take(settings.analytics_batch_size - len(batch)))
+            remaining = deadline - time.monotonic()
+            if len(batch) >= settings.analytics_batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            try:
+                batch = []
+                if self.policy == "spill" and self.queue.empty():
+                    batch = await self._unspill(settings.analytics_batch_size)
+                    if batch:
+                        self._busy += 1
+                if not batch:
+                    # With spilled events pending, come back to them whenever the queue is idle
+                    wait = settings.analytics_flush_interval if self.policy == "spill" else None
+                    batch = await self._next_batch(wait)
+                try:
+                    sent = await self._send(batch)
+                finally:
+                    if batch:
+                        self._busy -= 1
+                if not sent:
+                    # Analytics is failing; don't spin re-sending (or re-spilling) batches
+                    await asyncio.sleep(settings.analytics_retry_backoff)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Click event worker error: {e}")
+
+    async def _send(self, batch: List[Dict[str, Any]]) -> bool:
+        if not batch:
+            return True
+        started = time.monotonic()
+        try:
+            await self.post_batch(batch)
+            self.posted += len(batch)
+            return True
+        except Exception as e:
+            self.failed_batches += 1
+            logger.warning(f"Posting {len(batch)} click events to analytics failed: {e}")
+            if not (self.policy == "spill" and await self._spill(batch)):
+                self.dropped += len(batch)
+            return False
+        finally:
+            self.last_post_seconds = time.monotonic() - started
+
+    async def _spill(self, events: List[Dict[str, Any]]) -> bool:
+        if not redis_service.is_available():
+            return False
+        try:
+            async with redis_service.client_for(SPILL_KEY).pipeline(transaction=False) as pipe:
+                pipe.rpush(SPILL_KEY, *(json.dumps(event) for event in events))
+                # Keep the newest events once the list is at its cap
+                pipe.ltrim(SPILL_KEY, -settings.analytics_spill_max, -1)
+                await pipe.execute()
+            self.spilled += len(events)
+            return True
+        except Exception as e:
+            logger.error(f"Spilling {len(events)} click events to Redis failed: {e}")
+            return False
+
+    async def _unspill(self, limit: int) -> List[Dict[str, Any]]:
+        if not redis_service.is_available():
+            return []
+        try:
+            values = await redis_service.client_for(SPILL_KEY).lpop(SPILL_KEY, limit)
+        except Exception as e:
+            logger.error(f"Reading spilled click events failed: {e}")
+            return []
+        events = []
+        for value in values or []:
+            # One corrupt entry must not take the rest of the batch with it
+            try:
+                events.append(json.loads(value))
+            except ValueError as e:
+                logger.error(f"Dropping undecodable spilled click event: {e}")
+                self.dropped += 1
+        self.unspilled += len(events)
+        return events
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "depth": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "posted": self.posted,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "spilled": self.spilled,
+            "unspilled": self.unspilled,
+            "failed_batches": self.failed_batches,
+            "last_post_seconds": round(self.last_post_seconds, 4) if self.last_post_seconds is not None else None,
+        }
@@ -0,0 +1,90 @@
+import json
+import logging
+import time
+import zlib
+from typing import Optional
+from app.services.redis_service import redis_service
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Key formats shared with url-service (app/services/url_cache.py, app/services/click_counter.py)
+LEGACY_KEY_PREFIX = "url:"
+BUCKET_KEY_PREFIX = "urlh:"
+DELTA_KEY = "clicks:delta:{}"
+DIRTY_SET_KEY = "clicks:dirty"
+
+class EdgeResolver:
+    """Answers redirects for cached codes straight from url-service's Redis cache.
+
+    Reads the same entries url-service writes (either cache layout, same node
+    ring) and counts the click the way url-service's click counter does, so
+    its flush picks the click up. Anything not in Redis (unknown, expired or
+    never loaded codes) returns None and goes to url-service, which owns
+    loading, negative caching and early refresh.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.edge_resolve_enabled and redis_service.is_available()
+
+    async def resolve(self, short_code: str) -> Optional[str]:
+        """Original URL for a cached active code, with its click recorded; None to ask url-service"""
+        if not self.enabled:
+            return None
+
+        try:
+            original_url = await self._lookup(short_code)
+            if original_url is None:
+                self.misses += 1
+                return None
+            await self._record_click(short_code)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Edge resolve failed for {short_code}, falling back to url-service: {e}")
+            return None
+
+        self.hits += 1
+        return original_url
+
+    async def _lookup(self, short_code: str) -> Optional[str]:
+        if settings.cache_layout == "hash":
+            key = f"{BUCKET_KEY_PREFIX}{zlib.crc32(short_code.encode()) % settings.cache_hash_buckets}"
+            value = await redis_service.client_for(key).hget(key, short_code)
+            if not value:
+                return None
+            # "{expires_at}|{load_time_ms}[L]|{url}"; only active mappings are stored
+            expires_at, _, original_url = value.split("|", 2)
+            return original_url if int(expires_at) > time.time() else None
+
+        key = f"{LEGACY_KEY_PREFIX}{short_code}"
+        value = await redis_service.client_for(key).get(key)
+        if not value:
+            return None
+        entry = json.loads(value)
+        if not entry.get("is_active") or entry.get("expires_at", float("inf")) <= time.time():
+            return None
+        return entry["original_url"]
+
+    async def _record_click(self, short_code: str):
+        key = DELTA_KEY.format(short_code)
+        async with redis_service.client_for(key).pipeline(transaction=False) as pipe:
+            pipe.incrby(key, 1)
+            pipe.sadd(DIRTY_SET_KEY, short_code)
+            await pipe.execute()
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+# Create singleton instance
+edge_resolver = EdgeResolver()
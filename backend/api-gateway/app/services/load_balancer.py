@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import random
+from typing import Any, Collection, Dict, List, Optional
+import httpx
+from app.services.resilience import CircuitBreaker
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+LOAD_BALANCING_STRATEGIES = ("least_outstanding", "ewma")
+
+class Endpoint:
+    """One replica of a service, with the load and health the balancer picks by"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.breaker = CircuitBreaker(
+            settings.circuit_failure_threshold,
+            settings.circuit_open_seconds,
+            settings.circuit_half_open_probes
+        )
+        self.outstanding = 0
+        self.ewma: Optional[float] = None  # seconds to response headers
+        self.healthy = True
+        self.check_failures = 0
+        self.check_successes = 0
+
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self.last_check_error: Optional[str] = None
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and not self.breaker.is_open()
+
+    def score(self, strategy: str) -> float:
+        if strategy == "ewma":
+            # Untried endpoints score 0 so they get a first sample
+            return (self.ewma or 0.0) * (self.outstanding + 1)
+        return self.outstanding
+
+    def started(self):
+        self.outstanding += 1
+        self.requests += 1
+
+    def finished(self, seconds: Optional[float]):
+        """Record the end of a call; seconds is None when it failed"""
+        self.outstanding -= 1
+        if seconds is None:
+            self.failures += 1
+            return
+        alpha = settings.lb_ewma_alpha
+        self.ewma = seconds if self.ewma is None else alpha * seconds + (1 - alpha) * self.ewma
+
+    def record_check(self, ok: bool, error: Optional[str] = None):
+        """Eject after unhealthy_threshold failed checks in a row, re-admit after healthy_threshold passes"""
+        if ok:
+            self.check_failures = 0
+            self.check_successes += 1
+            self.last_check_error = None
+            if not self.healthy and self.check_successes >= settings.healthy_threshold:
+                self.healthy = True
+                logger.info(f"Re-admitting {self.url} after {self.check_successes} passing health checks")
+            return
+
+        self.check_successes = 0
+        self.check_failures += 1
+        self.last_check_error = error
+        if self.healthy and self.check_failures >= settings.unhealthy_threshold:
+            self.healthy = False
+            self.ejections += 1
+            logger.warning(f"Ejecting {self.url} after {self.check_failures} failed health checks: {error}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "ewma_ms": round(self.ewma * 1000, 2) if self.ewma is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "last_check_error": self.last_check_error,
+            "circuit": self.breaker.stats(),
+        }
+
+class LoadBalancer:
+    """Spreads a service's requests over its endpoints.
+
+    least_outstanding picks the endpoint with the fewest requests in flight;
+    ewma weighs that by each endpoint's latency average. Endpoints that the
+    health checker ejected or whose circuit is open are skipped; if that
+    leaves none, the healthy-but-tripped ones and then all of them are tried
+    rather than failing outright.
+    """
+
+    def __init__(self, urls: List[str], strategy: str):
+        if strategy not in LOAD_BALANCING_STRATEGIES:
+            raise ValueError(f"Unknown load balancing strategy: {strategy}")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.strategy = strategy
+
+    def pick(self, exclude: Collection[Endpoint] = ()) -> Optional[Endpoint]:
+        """The best endpoint whose circuit lets a call through, preferring ones not in exclude"""
+        candidates = [e for e in self.endpoints if e not in exclude] or self.endpoints
+        for pool in (
+            [e for e in candidates if e.available],
+            [e for e in candidates if not e.breaker.is_open()],
+        ):
+            if pool:
+                # Shuffle so ties don't all land on the first endpoint
+                random.shuffle(pool)
+                endpoint = min(pool, key=lambda e: e.score(self.strategy))
+                if endpoint.breaker.allow():
+                    return endpoint
+        return None
+
+    def healthy(self) -> bool:
+        return any(endpoint.healthy for endpoint in self.endpoints)
+
+    async def check(self, client: httpx.AsyncClient):
+        """Probe every endpoint's /health once"""
+        async def probe(endpoint: Endpoint):
+            try:
+                response = await client.get(f"{endpoint.url}/health", timeout=settings.health_check_timeout)
+                endpoint.record_check(response.status_code == 200, f"HTTP {response.status_code}")
+            except Exception as e:
+                endpoint.record_check(False, repr(e))
+
+        await asyncio.gather(*(probe(endpoint) for endpoint in self.endpoints))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "endpoints": [endpoint.stats() for endpoint in self.endpoints],
+        }
@@ -0,0 +1,68 @@
+import redis.asyncio as redis
+import asyncio
+import logging
+from typing import Dict, List
+from app.services.hash_ring import HashRing
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class RedisService:
+    """Async Redis client sharded across settings.redis_node_urls with a consistent hash ring.
+    
+    Built from the same node list as url-service, so a key resolves to the
+    same node here as it does there.
+    """
+    
+    def __init__(self):
+        self.nodes: Dict[str, redis.Redis] = {}
+        self.ring = HashRing(replicas=settings.redis_virtual_nodes)
+        try:
+            for url in settings.redis_node_urls:
+                # Bounded pool per node shared by every request; connections are opened lazily
+                pool = redis.ConnectionPool.from_url(
+                    url,
+                    max_connections=settings.redis_max_connections,
+                    socket_timeout=settings.redis_socket_timeout,
+                    socket_connect_timeout=settings.redis_socket_connect_timeout,
+                    decode_responses=True,
+                )
+                self.nodes[url] = redis.Redis(connection_pool=pool)
+                self.ring.add_node(url)
+        except Exception as e:
+            logger.error(f"Gateway Redis client setup failed: {e}")
+            self.nodes = {}
+            self.ring = HashRing(replicas=settings.redis_virtual_nodes)
+    
+    def is_available(self) -> bool:
+        return bool(self.nodes)
+    
+    def client_for(self, key: str) -> redis.Redis:
+        """Client for the node that owns key"""
+        return self.nodes[self.ring.get_node(key)]
+    
+    def group_keys(self, keys: List[str]) -> Dict[redis.Redis, List[str]]:
+        """Split keys by owning node client"""
+        return {self.nodes[node]: node_keys for node, node_keys in self.ring.group(keys).items()}
+    
+    def register_script(self, script: str):
+        """Lua script object; run it on a key's node with client=client_for(key)"""
+        return next(iter(self.nodes.values())).register_script(script)
+    
+    async def ping(self) -> bool:
+        if not self.is_available():
+            return False
+        try:
+            await asyncio.gather(*(client.ping() for client in self.nodes.values()))
+            logger.info(f"Gateway Redis connection established ({len(self.nodes)} nodes)")
+            return True
+        except Exception as e:
+            logger.error(f"Gateway Redis connection failed: {e}")
+            return False
+    
+    async def close(self):
+        for client in self.nodes.values():
+            await client.aclose(close_connection_pool=True)
+
+# Create singleton instance
+redis_service = RedisService()
@@ -0,0 +1,150 @@
+import math
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+import httpx
+
+class CircuitOpenError(httpx.RequestError):
+    """Raised instead of calling a service when every endpoint's circuit is open"""
+
+class CircuitBreaker:
+    """Stops calling an endpoint after consecutive failures, then probes it before closing again.
+
+    closed: every call goes through; failure_threshold consecutive failures
+    (transport errors or 5xx) open the circuit.
+    open: calls fail fast with CircuitOpenError for open_seconds.
+    half_open: up to half_open_probes calls go through; a success closes the
+    circuit, a failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int, open_seconds: float, half_open_probes: int = 1):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+
+        self.times_opened = 0
+        self.rejected = 0
+
+    def is_open(self) -> bool:
+        """Whether allow() would refuse a call right now, without taking a probe slot"""
+        if self.state == "open":
+            return time.monotonic() - self.opened_at < self.open_seconds
+        return self.state == "half_open" and self.probes >= self.half_open_probes
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = "half_open"
+            self.probes = 0
+        if self.state == "half_open":
+            if self.probes >= self.half_open_probes:
+                self.rejected += 1
+                return False
+            self.probes += 1
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        if self.state == "half_open":
+            self.state = "closed"
+            self.probes = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            self._open()
+
+    def release(self):
+        """A call was abandoned without an outcome; free its half-open probe slot"""
+        if self.state == "half_open" and self.probes > 0:
+            self.probes -= 1
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.probes = 0
+        self.times_opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+class RetryBudget:
+    """Caps retries at a share of recent requests, so retries can't multiply load on a struggling service.
+
+    Each request deposits ratio tokens and each retry or hedge withdraws one;
+    min_per_second tokens accrue regardless so low-traffic services can
+    still retry. The balance never exceeds cap.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, cap: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.cap = cap
+        self.balance = cap
+        self.updated = time.monotonic()
+
+        self.withdrawn = 0
+        self.denied = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.balance = min(self.balance + (now - self.updated) * self.min_per_second, self.cap)
+        self.updated = now
+
+    def deposit(self):
+        self._refill()
+        self.balance = min(self.balance + self.ratio, self.cap)
+
+    def withdraw(self) -> bool:
+        self._refill()
+        if self.balance < 1:
+            self.denied += 1
+            return False
+        self.balance -= 1
+        self.withdrawn += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "balance": round(self.balance, 2),
+            "withdrawn": self.withdrawn,
+            "denied": self.denied,
+        }
+
+class LatencyTracker:
+    """Recent response times of a service, for picking the hedge delay"""
+
+    def __init__(self, size: int = 512, min_samples: int = 20, refresh_every: int = 32):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+        self.refresh_every = refresh_every
+        self._since_refresh = 0
+        self._percentiles: Dict[float, float] = {}
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self._since_refresh += 1
+        if self._since_refresh >= self.refresh_every:
+            self._percentiles = {}
+            self._since_refresh = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-quantile of recent samples, recomputed every refresh_every samples; None until min_samples"""
+        if len(self.samples) < self.min_samples:
+            return None
+        if q not in self._percentiles:
+            ordered = sorted(self.samples)
+            self._percentiles[q] = ordered[min(math.ceil(q * len(ordered)), len(ordered)) - 1]
+        return self._percentiles[q]
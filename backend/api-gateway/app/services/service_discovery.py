@@ -1,51 +1,264 @@
+import asyncio
 import httpx
 import logging
-from typing import Dict, Any, Optional
+import random
+import time
+from typing import Dict, Any, List, Optional
+from app.services.load_balancer import Endpoint, LoadBalancer
+from app.services.resilience import CircuitOpenError, RetryBudget, LatencyTracker
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Upstream answers that say "try again" rather than "this request is wrong"
+RETRY_STATUSES = frozenset({502, 503, 504})
+
 class ServiceDiscovery:
+    """Calls to the backing services, balanced over their endpoints and bounded by a time budget.
+
+    Each attempt goes to the endpoint the service's LoadBalancer picks, past
+    that endpoint's circuit breaker; a background task health-checks every
+    endpoint and ejects or re-admits it. Each request gets `timeout` seconds
+    (settings.upstream_timeout by default) for all of its attempts.
+    Idempotent requests that fail with a transport error or a 502/503/504
+    are retried on another endpoint while the service's retry budget allows;
+    with hedging on, a GET still waiting after the service's p95 latency
+    gets a second attempt and the first answer wins.
+    """
+
     def __init__(self):
         self.services = {
-            "url-service": settings.url_service_url,
-            "analytics-service": settings.analytics_service_url
+            "url-service": LoadBalancer(settings.url_service_urls, settings.load_balancing),
+            "analytics-service": LoadBalancer(settings.analytics_service_urls, settings.load_balancing)
         }
-        self.client = httpx.AsyncClient(timeout=30.0)
-    
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.upstream_timeout, connect=settings.upstream_connect_timeout),
+            limits=httpx.Limits(max_connections=settings.upstream_max_connections)
+        )
+        self.retry_budgets = {
+            name: RetryBudget(settings.retry_budget_ratio, settings.retry_budget_min_per_second, settings.retry_budget_cap)
+            for name in self.services
+        }
+        self.latency = {name: LatencyTracker() for name in self.services}
+        self.counters = {name: {"requests": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0} for name in self.services}
+        self._health_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._run_health_checks())
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        await self.client.aclose()
+
+    async def _run_health_checks(self):
+        while True:
+            try:
+                await asyncio.gather(*(balancer.check(self.client) for balancer in self.services.values()))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Endpoint health checks failed: {e}")
+            await asyncio.sleep(settings.health_check_interval)
+
     async def forward_request(
-        self, 
-        service_name: str, 
-        path: str, 
+        self,
+        service_name: str,
+        path: str,
         method: str = "GET",
+        timeout: Optional[float] = None,
         **kwargs
     ) -> httpx.Response:
         """Forward request to appropriate microservice"""
-        service_url = self.services.get(service_name)
-        if not service_url:
+        return await self._request(service_name, path, method, timeout, False, **kwargs)
+
+    async def stream_request(
+        self,
+        service_name: str,
+        path: str,
+        method: str = "GET",
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """Forward a request and return once headers arrive; the caller reads the body and must aclose() it"""
+        return await self._request(service_name, path, method, timeout, True, **kwargs)
+
+    async def _request(
+        self,
+        service_name: str,
+        path: str,
+        method: str,
+        timeout: Optional[float],
+        stream: bool,
+        **kwargs
+    ) -> httpx.Response:
+        if service_name not in self.services:
             raise ValueError(f"Service {service_name} not found")
-        
-        url = f"{service_url}{path}"
-        
+
+        budget = self.retry_budgets[service_name]
+        budget.deposit()
+        self.counters[service_name]["requests"] += 1
+        deadline = time.monotonic() + (timeout or settings.upstream_timeout)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        hedge = idempotent and settings.hedge_enabled
+        retries = 0
+        tried: List[Endpoint] = []
+
+        while True:
+            try:
+                if hedge:
+                    response = await self._hedged(service_name, method, path, deadline, stream, tried, **kwargs)
+                else:
+                    response = await self._attempt(service_name, method, path, deadline, stream, tried, **kwargs)
+            except CircuitOpenError:
+                raise
+            except httpx.RequestError as e:
+                if not (idempotent and self._may_retry(service_name, retries, deadline)):
+                    logger.error(f"Request error to {service_name}: {e}")
+                    raise
+                logger.warning(f"Retrying {method} {path} on {service_name} after: {e!r}")
+            except Exception as e:
+                logger.error(f"Unexpected error forwarding to {service_name}: {e}")
+                raise
+            else:
+                if not (
+                    idempotent
+                    and response.status_code in RETRY_STATUSES
+                    and self._may_retry(service_name, retries, deadline)
+                ):
+                    return response
+                logger.warning(f"Retrying {method} {path} on {service_name} after HTTP {response.status_code}")
+                await response.aclose()
+
+            retries += 1
+            self.counters[service_name]["retries"] += 1
+            # Full jitter, and never sleep past the budget
+            backoff = random.uniform(0, settings.upstream_retry_backoff * 2 ** (retries - 1))
+            await asyncio.sleep(min(backoff, max(deadline - time.monotonic(), 0)))
+
+    def _may_retry(self, service_name: str, retries: int, deadline: float) -> bool:
+        return (
+            retries < settings.upstream_max_retries
+            and time.monotonic() < deadline
+            and self.retry_budgets[service_name].withdraw()
+        )
+
+    async def _attempt(
+        self,
+        service_name: str,
+        method: str,
+        path: str,
+        deadline: float,
+        stream: bool,
+        tried: List[Endpoint],
+        **kwargs
+    ) -> httpx.Response:
+        """One call to the best endpoint not yet tried, through its circuit breaker and cut off at the deadline"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.counters[service_name]["timeouts"] += 1
+            raise httpx.TimeoutException(f"Timeout budget for {service_name} exhausted")
+
+        endpoint = self.services[service_name].pick(exclude=tried)
+        if endpoint is None:
+            raise CircuitOpenError(f"Circuit open for every {service_name} endpoint")
+        tried.append(endpoint)
+        breaker = endpoint.breaker
+
+        # httpx's timeouts apply per network operation; wait_for bounds the whole exchange
+        kwargs["timeout"] = httpx.Timeout(remaining, connect=min(settings.upstream_connect_timeout, remaining))
+        request = self.client.build_request(method, f"{endpoint.url}{path}", **kwargs)
+        started = time.monotonic()
+        # Streamed responses count as outstanding until their headers arrive
+        endpoint.started()
         try:
-            response = await self.client.request(method, url, **kwargs)
-            return response
-        except httpx.RequestError as e:
-            logger.error(f"Request error to {service_name}: {e}")
+            response = await asyncio.wait_for(self.client.send(request, stream=stream), timeout=remaining)
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            endpoint.finished(None)
+            self.counters[service_name]["timeouts"] += 1
+            raise httpx.TimeoutException(f"{endpoint.url} did not answer within {remaining:.3f}s", request=request)
+        except httpx.RequestError:
+            breaker.record_failure()
+            endpoint.finished(None)
             raise
-        except Exception as e:
-            logger.error(f"Unexpected error forwarding to {service_name}: {e}")
+        except BaseException:
+            breaker.release()
+            endpoint.outstanding -= 1
             raise
-    
-    async def health_check(self, service_name: str) -> bool:
-        """Check if service is healthy"""
+
+        elapsed = time.monotonic() - started
+        if response.status_code >= 500:
+            breaker.record_failure()
+            endpoint.finished(None)
+        else:
+            breaker.record_success()
+            endpoint.finished(elapsed)
+            self.latency[service_name].record(elapsed)
+        return response
+
+    async def _hedged(
+        self,
+        service_name: str,
+        method: str,
+        path: str,
+        deadline: float,
+        stream: bool,
+        tried: List[Endpoint],
+        **kwargs
+    ) -> httpx.Response:
+        """Send a second attempt if the first is slower than the service's usual tail; first answer wins"""
+        delay = self.latency[service_name].percentile(settings.hedge_percentile)
+        primary = asyncio.ensure_future(self._attempt(service_name, method, path, deadline, stream, tried, **kwargs))
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=max(delay, settings.hedge_min_delay))
+        if done or time.monotonic() >= deadline or not self.retry_budgets[service_name].withdraw():
+            return await primary
+
+        self.counters[service_name]["hedges"] += 1
+        hedge = asyncio.ensure_future(self._attempt(service_name, method, path, deadline, stream, tried, **kwargs))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
         try:
-            response = await self.forward_request(
-                service_name, 
-                "/health", 
-                method="GET"
-            )
-            return response.status_code == 200
-        except Exception as e:
-            logger.error(f"Health check failed for {service_name}: {e}")
-            return False
\ No newline at end of file
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.counters[service_name]["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            await self._discard(pending)
+
+    @staticmethod
+    async def _discard(tasks):
+        """Cancel losing attempts, closing any response that arrived anyway"""
+        for task in tasks:
+            task.cancel()
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, httpx.Response):
+                await result.aclose()
+
+    def health_check(self, service_name: str) -> bool:
+        """Whether the background checks last found any of the service's endpoints healthy"""
+        return self.services[service_name].healthy()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {}
+        for name in self.services:
+            p95 = self.latency[name].percentile(0.95)
+            stats[name] = {
+                **self.counters[name],
+                "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+                "retry_budget": self.retry_budgets[name].stats(),
+                **self.services[name].stats(),
+            }
+        return stats
@@ -0,0 +1,21 @@
+import asyncio
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+
+from app.services.redis_service import redis_service
+
+@pytest.fixture
+def run(monkeypatch):
+    """Run a test body in one event loop, with every Redis node backed by one fake server"""
+    server = fakeredis.FakeServer()
+    
+    def run(body):
+        async def main():
+            nodes = {url: fakeredis.aioredis.FakeRedis(server=server, decode_responses=True) for url in redis_service.nodes}
+            monkeypatch.setattr(redis_service, "nodes", nodes)
+            return await body(next(iter(nodes.values())))
+        return asyncio.run(main())
+    
+    return run
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.config import settings
+from app.services.click_events import SPILL_KEY, ClickEventQueue
+
+@pytest.fixture
+def configure(monkeypatch):
+    """Queue settings for one test; workers batch quickly and back off briefly"""
+    def configure(**overrides):
+        values = dict(
+            analytics_queue_size=4,
+            analytics_batch_size=3,
+            analytics_flush_interval=0.05,
+            analytics_workers=1,
+            analytics_retry_backoff=0.05,
+            analytics_drain_timeout=2,
+        )
+        values.update(overrides)
+        for name, value in values.items():
+            monkeypatch.setattr(settings, name, value)
+    return configure
+
+def _events(count, start=0):
+    return [{"short_code": f"code{i}"} for i in range(start, start + count)]
+
+async def _never_posted(batch):
+    raise AssertionError("no batch should be posted")
+
+def test_drop_discards_new_events_when_full(configure):
+    configure(analytics_overflow_policy="drop")
+    queue = ClickEventQueue(_never_posted)
+
+    async def body():
+        return [await queue.emit(event) for event in _events(6)]
+
+    assert asyncio.run(body()) == [True] * 4 + [False] * 2
+    assert (queue.enqueued, queue.dropped) == (4, 2)
+
+def test_sample_thins_events_past_the_threshold(configure):
+    # A sample rate of 0 keeps nothing once sampling starts, so the outcome is fixed
+    configure(analytics_overflow_policy="sample", analytics_sample_threshold=0.5, analytics_sample_rate=0)
+    queue = ClickEventQueue(_never_posted)
+
+    async def body():
+        return [await queue.emit(event) for event in _events(5)]
+
+    assert asyncio.run(body()) == [True, True, False, False, False]
+    assert (queue.enqueued, queue.sampled_out, queue.dropped) == (2, 3, 0)
+
+def test_spill_overflow_round_trips_through_redis(run, configure):
+    configure(analytics_overflow_policy="spill", analytics_queue_size=1)
+    queue = ClickEventQueue(_never_posted)
+
+    async def body(redis):
+        assert all([await queue.emit(event) for event in _events(3)])
+        assert await redis.llen(SPILL_KEY) == 2
+        assert await queue._unspill(10) == _events(2, start=1)
+        assert await redis.llen(SPILL_KEY) == 0
+    run(body)
+    assert (queue.enqueued, queue.spilled, queue.unspilled, queue.dropped) == (1, 2, 2, 0)
+
+def test_unspill_skips_undecodable_entries(run, configure):
+    configure(analytics_overflow_policy="spill")
+    queue = ClickEventQueue(_never_posted)
+
+    async def body(redis):
+        first, second = _events(2)
+        await redis.rpush(SPILL_KEY, json.dumps(first), "{not json", json.dumps(second))
+        return await queue._unspill(10)
+
+    assert run(body) == _events(2)
+    assert (queue.unspilled, queue.dropped) == (2, 1)
+
+def test_rejected_batch_is_spilled_and_posted_later(run, configure):
+    configure(analytics_overflow_policy="spill")
+    posted = []
+
+    async def post_batch(batch):
+        if not posted:
+            posted.append(None)
+            raise RuntimeError("analytics unavailable")
+        posted.extend(batch)
+
+    queue = ClickEventQueue(post_batch)
+
+    async def body(redis):
+        for event in _events(2):
+            await queue.emit(event)
+        queue.start()
+        for _ in range(100):
+            if len(posted) > 2:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+    run(body)
+    assert posted[1:] == _events(2)
+    assert (queue.failed_batches, queue.spilled, queue.unspilled, queue.posted) == (1, 2, 2, 2)
+
+def test_stop_posts_queued_and_in_flight_events(configure):
+    configure(analytics_overflow_policy="drop", analytics_queue_size=20)
+    posted = []
+
+    async def post_batch(batch):
+        await asyncio.sleep(0.05)
+        posted.extend(batch)
+
+    queue = ClickEventQueue(post_batch)
+
+    async def body():
+        queue.start()
+        for event in _events(7):
+            await queue.emit(event)
+        started = time.monotonic()
+        await queue.stop()
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(body())
+    # Everything, including the last batch still being posted, arrives well before the timeout
+    assert posted == _events(7)
+    assert (queue.posted, queue.dropped) == (7, 0)
+    assert elapsed < settings.analytics_drain_timeout
+
+def test_stop_gives_up_at_the_drain_timeout(configure):
+    configure(analytics_overflow_policy="drop", analytics_drain_timeout=0.2)
+
+    async def post_batch(batch):
+        await asyncio.Event().wait()
+
+    queue = ClickEventQueue(post_batch)
+
+    async def body():
+        queue.start()
+        for event in _events(4):
+            await queue.emit(event)
+        started = time.monotonic()
+        await queue.stop()
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(body())
+    assert 0.2 <= elapsed < 1
+    # One batch was stuck posting; the event left in the queue is counted as dropped
+    assert (queue.posted, queue.dropped) == (0, 1)
@@ -0,0 +1,33 @@
+import httpx
+from starlette.requests import Request
+
+from app.routes.gateway_routes import forwarded_headers, passthrough_headers
+
+def _request(headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+def test_read_after_cookie_is_sent_upstream_as_header():
+    headers = forwarded_headers(_request({"Cookie": "session=secret; read_after_lsn=50331648"}))
+    assert headers["x-read-after-lsn"] == "50331648"
+    assert "cookie" not in headers
+
+def test_read_after_header_is_forwarded():
+    headers = forwarded_headers(_request({"X-Read-After-LSN": "42", "X-API-Key": "secret"}))
+    assert headers["x-read-after-lsn"] == "42"
+    assert "x-api-key" not in headers
+
+def test_write_token_is_relayed_to_the_client():
+    upstream = httpx.Response(200, headers={
+        "Set-Cookie": "read_after_lsn=42; HttpOnly; Max-Age=60; Path=/",
+        "X-Read-After-LSN": "42",
+        "Connection": "keep-alive",
+    })
+    headers = passthrough_headers(upstream)
+    assert headers["set-cookie"].startswith("read_after_lsn=42")
+    assert headers["x-read-after-lsn"] == "42"
+    assert "connection" not in headers
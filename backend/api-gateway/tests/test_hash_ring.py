@@ -0,0 +1,37 @@
+from app.services.hash_ring import HashRing
+
+NODES = ["redis://redis-0:6379", "redis://redis-1:6379", "redis://redis-2:6379"]
+
+# Every service keeps its own copy of hash_ring.py and they share Redis nodes,
+# so the copies must place keys identically; this table is the same in each
+# service's tests and changes only together with all three copies
+PINNED = {
+    "url:abc123": "redis://redis-0:6379",
+    "url:xyz789": "redis://redis-1:6379",
+    "clicks:delta:abc123": "redis://redis-2:6379",
+    "clicks:dirty": "redis://redis-0:6379",
+    "clicks:flush-lock": "redis://redis-0:6379",
+    "rate_limit:10.0.0.1": "redis://redis-0:6379",
+    "analytics:spill": "redis://redis-2:6379",
+    "short_code:counter": "redis://redis-1:6379",
+    "{user42}:a": "redis://redis-1:6379",
+    "stats:{abc123}:daily": "redis://redis-1:6379",
+}
+
+def test_known_keys_map_to_known_nodes():
+    ring = HashRing(NODES, replicas=160)
+    assert {key: ring.get_node(key) for key in PINNED} == PINNED
+
+def test_tagged_keys_share_a_node():
+    ring = HashRing(NODES)
+    assert ring.get_node("stats:{abc123}:daily") == ring.get_node("abc123")
+    # An empty tag doesn't count; the whole key is hashed
+    assert ring.hash_slot_key("{}:a") == "{}:a"
+
+def test_removing_a_node_only_moves_its_keys():
+    ring = HashRing(NODES)
+    before = {key: ring.get_node(key) for key in (f"url:{i}" for i in range(2000))}
+    ring.remove_node(NODES[1])
+    after = {key: ring.get_node(key) for key in before}
+    moved = {key for key in before if before[key] != after[key]}
+    assert moved == {key for key, node in before.items() if node == NODES[1]}
@@ -0,0 +1,114 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.services.load_balancer import LoadBalancer
+
+URLS = ["http://a", "http://b", "http://c"]
+
+@pytest.fixture(autouse=True)
+def thresholds(monkeypatch):
+    monkeypatch.setattr(settings, "unhealthy_threshold", 2)
+    monkeypatch.setattr(settings, "healthy_threshold", 2)
+    monkeypatch.setattr(settings, "circuit_failure_threshold", 1)
+
+def test_least_outstanding_picks_the_idlest_endpoint():
+    balancer = LoadBalancer(URLS, "least_outstanding")
+    a, b, c = balancer.endpoints
+    a.outstanding, b.outstanding, c.outstanding = 3, 1, 2
+
+    assert balancer.pick() is b
+    # Endpoints already tried for this request are passed over while others remain
+    assert balancer.pick(exclude=[b]) is c
+    assert balancer.pick(exclude=balancer.endpoints) is b
+
+def test_ewma_weighs_load_by_latency():
+    balancer = LoadBalancer(URLS, "ewma")
+    a, b, c = balancer.endpoints
+    a.ewma, b.ewma, c.ewma = 0.010, 0.100, 0.050
+    a.outstanding, b.outstanding, c.outstanding = 9, 0, 0
+
+    # a: 0.010 * 10, b: 0.100 * 1, c: 0.050 * 1
+    assert balancer.pick() is c
+    # An endpoint with no samples yet scores 0 so it gets one
+    c.ewma = None
+    c.outstanding = 5
+    assert balancer.pick() is c
+
+def test_ewma_follows_recorded_latencies(monkeypatch):
+    monkeypatch.setattr(settings, "lb_ewma_alpha", 0.5)
+    balancer = LoadBalancer(URLS[:2], "ewma")
+    a, b = balancer.endpoints
+    for endpoint, seconds in ((a, 0.2), (b, 0.05)):
+        endpoint.started()
+        endpoint.finished(seconds)
+    assert balancer.pick() is b
+
+    b.started()
+    b.finished(0.75)
+    assert b.ewma == pytest.approx(0.4)
+    assert balancer.pick() is a
+
+def test_unavailable_endpoints_are_skipped_until_none_are_left():
+    balancer = LoadBalancer(URLS, "least_outstanding")
+    a, b, c = balancer.endpoints
+    a.healthy = False
+    b.breaker.record_failure()
+
+    assert {balancer.pick() for _ in range(10)} == {c}
+    # With every endpoint ejected, one whose circuit is closed is still tried
+    c.healthy = False
+    assert balancer.pick() in (a, c)
+    # With every circuit open, nothing is called
+    a.breaker.record_failure()
+    c.breaker.record_failure()
+    assert balancer.pick() is None
+
+def test_health_checks_eject_and_readmit_endpoints():
+    down = {"b"}
+
+    async def handler(request):
+        assert request.url.path == "/health"
+        if request.url.host in down:
+            return httpx.Response(503)
+        return httpx.Response(200)
+
+    balancer = LoadBalancer(URLS, "least_outstanding")
+    a, b, c = balancer.endpoints
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def check():
+        await balancer.check(client)
+        return [endpoint.url for endpoint in balancer.endpoints if endpoint.healthy]
+
+    async def body():
+        # One failed check is not enough to eject
+        assert await check() == URLS
+        assert await check() == ["http://a", "http://c"]
+        assert b.ejections == 1 and b.last_check_error == "HTTP 503"
+        assert b not in {balancer.pick() for _ in range(10)}
+
+        down.clear()
+        # Re-admitted only after healthy_threshold passing checks
+        assert await check() == ["http://a", "http://c"]
+        assert await check() == URLS
+        assert b.last_check_error is None
+
+    asyncio.run(body())
+
+def test_unreachable_endpoint_is_ejected():
+    async def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    balancer = LoadBalancer(URLS[:1], "least_outstanding")
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def body():
+        for _ in range(settings.unhealthy_threshold):
+            await balancer.check(client)
+
+    asyncio.run(body())
+    assert not balancer.healthy()
+    assert "ConnectError" in balancer.endpoints[0].last_check_error
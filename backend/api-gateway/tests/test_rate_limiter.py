@@ -0,0 +1,117 @@
+import asyncio
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+
+from app.middleware.rate_limiter import GCRA_SCRIPT, RATE_LIMIT_KEY, HybridRateLimiter, RateLimiter
+from app.services.redis_service import redis_service
+
+LIMIT = 5
+EMISSION_US = 60 * 1_000_000 // LIMIT
+
+async def _gcra(client, requested, key="k"):
+    """One script call with a limit of LIMIT per minute and a full minute's burst"""
+    return await client.eval(GCRA_SCRIPT, 1, key, EMISSION_US, EMISSION_US * LIMIT, requested)
+
+def test_burst_up_to_the_limit_then_deny(run):
+    async def body(redis):
+        for expected_remaining in range(LIMIT - 1, -1, -1):
+            granted, remaining, _, _ = await _gcra(redis, 1)
+            assert (granted, remaining) == (1, expected_remaining)
+        granted, remaining, retry_after, reset_after = await _gcra(redis, 1)
+        assert (granted, remaining) == (0, 0)
+        # The next token frees up one emission interval after the burst
+        assert 0 < retry_after <= EMISSION_US
+        assert EMISSION_US * (LIMIT - 1) < reset_after <= EMISSION_US * LIMIT
+    run(body)
+
+def test_key_expires_when_quota_is_full_again(run):
+    async def body(redis):
+        await _gcra(redis, 2)
+        ttl_ms = await redis.pttl("k")
+        assert EMISSION_US * 2 // 1000 - 1000 < ttl_ms <= EMISSION_US * 2 // 1000
+    run(body)
+
+def test_acquire_allows_then_denies(run):
+    async def body(redis):
+        limiter = RateLimiter(requests_per_minute=LIMIT)
+        results = [await limiter.acquire("client") for _ in range(LIMIT + 1)]
+        assert [r.allowed for r in results] == [True] * LIMIT + [False]
+        assert results[0].remaining == LIMIT - 1
+        denied = dict(results[-1].headers())
+        assert denied["X-RateLimit-Remaining"] == "0"
+        assert int(denied["Retry-After"]) >= 1
+    run(body)
+
+def test_acquire_fails_open_without_redis(monkeypatch):
+    monkeypatch.setattr(redis_service, "nodes", {})
+    assert asyncio.run(RateLimiter(requests_per_minute=LIMIT).acquire("client")) is None
+
+def test_partial_grant_when_quota_runs_short(run):
+    async def body(redis):
+        assert (await _gcra(redis, 3))[:2] == [3, LIMIT - 3]
+        assert (await _gcra(redis, 3))[:2] == [LIMIT - 3, 0]
+        assert (await _gcra(redis, 3))[0] == 0
+    run(body)
+
+def test_negative_request_hands_tokens_back(run):
+    async def body(redis):
+        await _gcra(redis, LIMIT)
+        granted, remaining, retry_after, _ = await _gcra(redis, -2)
+        assert (granted, remaining, retry_after) == (-2, 2, 0)
+        # Handing back everything clears the key
+        await _gcra(redis, -(LIMIT - 2))
+        assert await redis.exists("k") == 0
+    run(body)
+
+def test_acquire_many_per_client(run):
+    async def body(redis):
+        limiter = RateLimiter(requests_per_minute=LIMIT)
+        results = await limiter.acquire_many({"a": 2, "b": LIMIT + 1})
+        assert results["a"][0] == 2 and results["a"][1].allowed
+        assert results["b"][0] == LIMIT and not results["b"][1].allowed
+        assert await redis.exists(RATE_LIMIT_KEY.format("a")) == 1
+    run(body)
+
+def _request(client_ip="203.0.113.7"):
+    return SimpleNamespace(client=SimpleNamespace(host=client_ip), state=SimpleNamespace())
+
+async def _admitted(limiter, count):
+    admitted = 0
+    for _ in range(count):
+        try:
+            await limiter.check_rate_limit(_request())
+            admitted += 1
+        except HTTPException as e:
+            assert e.status_code == 429
+    return admitted
+
+def test_hybrid_instances_share_the_global_quota(run, monkeypatch):
+    monkeypatch.setattr("app.middleware.rate_limiter.settings.rate_limit_lease_fraction", 0.2)
+    
+    async def body(redis):
+        first, second = HybridRateLimiter(requests_per_minute=10), HybridRateLimiter(requests_per_minute=10)
+        admitted = await _admitted(first, 6) + await _admitted(second, 6) + await _admitted(first, 6)
+        assert admitted == 10
+        # Leases, not requests, went to Redis
+        assert first.leases + second.leases < admitted
+    run(body)
+
+def test_hybrid_leases_once_for_concurrent_requests(run):
+    async def body(redis):
+        limiter = HybridRateLimiter(requests_per_minute=100)
+        await asyncio.gather(*(limiter.check_rate_limit(_request()) for _ in range(limiter.lease_size)))
+        assert limiter.leases == 1
+    run(body)
+
+def test_hybrid_stop_hands_unspent_tokens_back(run):
+    async def body(redis):
+        limiter = HybridRateLimiter(requests_per_minute=100)
+        await limiter.check_rate_limit(_request())
+        await limiter.stop()
+        assert limiter.returned_tokens == limiter.lease_size - 1
+        # Only the one spent token is still counted against the client
+        key = RATE_LIMIT_KEY.format("203.0.113.7")
+        _, remaining, _, _ = await redis.eval(GCRA_SCRIPT, 1, key, limiter.emission_interval, limiter.tolerance, 0)
+        assert remaining == 99
+    run(body)
@@ -0,0 +1,185 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.services import resilience
+from app.services.resilience import CircuitBreaker, CircuitOpenError, RetryBudget
+from app.services.service_discovery import ServiceDiscovery
+
+class Clock:
+    """Stands in for time.monotonic so breaker and budget timing is exact"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+@pytest.fixture
+def discovery(monkeypatch):
+    """A ServiceDiscovery over fake url-service endpoints; pass the endpoints and an async transport handler"""
+    def discovery(urls, handler, **overrides):
+        values = dict(
+            url_service_url=",".join(urls),
+            load_balancing="least_outstanding",
+            upstream_max_retries=2,
+            upstream_retry_backoff=0,
+            circuit_failure_threshold=5,
+            hedge_enabled=False,
+        )
+        values.update(overrides)
+        for name, value in values.items():
+            monkeypatch.setattr(settings, name, value)
+        service = ServiceDiscovery()
+        service.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return service
+    return discovery
+
+def test_breaker_opens_probes_and_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, open_seconds=10, half_open_probes=1)
+
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow() and breaker.rejected == 1
+
+    clock.now += 10
+    # One probe goes through; a second caller is refused until it resolves
+    assert breaker.allow() and breaker.state == "half_open"
+    assert breaker.is_open() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.times_opened == 2
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+def test_abandoned_probe_frees_its_slot(clock):
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=10, half_open_probes=1)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow() and not breaker.allow()
+
+    breaker.release()
+    assert breaker.state == "half_open" and breaker.allow()
+
+def test_retry_budget_is_earned_by_requests(clock):
+    budget = RetryBudget(ratio=0.5, min_per_second=0, cap=2)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw() and budget.denied == 1
+
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+    assert budget.withdrawn == 3
+
+def test_retries_stop_when_the_budget_runs_out(discovery):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.host)
+        return httpx.Response(503)
+
+    service = discovery(["http://a", "http://b", "http://c"], handler)
+    budget = service.retry_budgets["url-service"]
+    budget.min_per_second = 0
+    # The request's own deposit adds 0.2, so exactly one retry is affordable
+    budget.balance = 0.8
+
+    response = asyncio.run(service.forward_request("url-service", "/x"))
+    assert response.status_code == 503
+    # The retry went to an endpoint not tried yet
+    assert len(calls) == 2 and len(set(calls)) == 2
+    assert budget.denied == 1
+    assert service.counters["url-service"]["retries"] == 1
+
+def test_failures_open_the_circuit_and_fail_fast(discovery):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.host)
+        raise httpx.ConnectError("refused", request=request)
+
+    service = discovery(["http://a"], handler, circuit_failure_threshold=2, upstream_max_retries=0)
+
+    async def body():
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                await service.forward_request("url-service", "/x")
+        with pytest.raises(CircuitOpenError):
+            await service.forward_request("url-service", "/x")
+
+    asyncio.run(body())
+    assert len(calls) == 2
+    endpoint = service.services["url-service"].endpoints[0]
+    assert endpoint.breaker.state == "open" and endpoint.outstanding == 0
+
+def test_losing_hedge_is_cancelled_without_counting_against_its_endpoint(discovery):
+    cancelled = []
+
+    async def handler(request):
+        if request.url.host == "a":
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(request.url.host)
+                raise
+        return httpx.Response(200)
+
+    service = discovery(["http://a", "http://b"], handler, hedge_enabled=True, hedge_min_delay=0.01)
+    latency = service.latency["url-service"]
+    for _ in range(latency.min_samples):
+        latency.record(0.01)
+    # Make the first pick the slow endpoint: it has the fewest requests in flight
+    balancer = service.services["url-service"]
+    primary, other = balancer.endpoints
+    other.outstanding = 1
+
+    response = asyncio.run(service.forward_request("url-service", "/x"))
+    other.outstanding = 0
+
+    assert response.status_code == 200
+    assert cancelled == ["a"]
+    assert service.counters["url-service"]["hedges"] == 1
+    assert service.counters["url-service"]["hedge_wins"] == 1
+    # The cancelled attempt is neither a failure nor a latency sample, and holds no slot
+    assert (primary.outstanding, primary.failures, primary.ewma) == (0, 0, None)
+    assert primary.breaker.failures == 0 and primary.breaker.state == "closed"
+    assert (other.requests, other.failures) == (1, 0)
+    assert len(latency.samples) == latency.min_samples + 1
+
+def test_losing_hedge_frees_a_half_open_probe(discovery, clock):
+    async def handler(request):
+        if request.url.host == "a":
+            await asyncio.sleep(5)
+        return httpx.Response(200)
+
+    service = discovery(["http://a", "http://b"], handler, hedge_enabled=True, hedge_min_delay=0.01)
+    latency = service.latency["url-service"]
+    for _ in range(latency.min_samples):
+        latency.record(0.01)
+    primary, other = service.services["url-service"].endpoints
+    # a's circuit is due for a probe and b is busier, so a takes the probe as the primary
+    primary.breaker._open()
+    clock.now += settings.circuit_open_seconds
+    other.outstanding = 1
+
+    response = asyncio.run(service.forward_request("url-service", "/x"))
+    other.outstanding = 0
+
+    assert response.status_code == 200
+    # The probe was abandoned, not failed: a is still half open and can be probed again
+    assert primary.breaker.state == "half_open" and primary.breaker.probes == 0
+    assert primary.breaker.times_opened == 1
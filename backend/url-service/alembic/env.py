@@ -16,8 +16,12 @@ from app.config import settings
 # access to the values within the .ini file in use.
 config = context.config
 
-# Set the database URL from environment
-config.set_main_option("sqlalchemy.url", settings.database_url)
+# Set the database URL from environment; URL partitions are migrated one at a
+# time with: alembic -x database_url=postgresql://... upgrade head
+config.set_main_option(
+    "sqlalchemy.url",
+    context.get_x_argument(as_dictionary=True).get("database_url", settings.database_url)
+)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
@@ -0,0 +1,43 @@
+"""Initial urls schema
+
+Creates the tables and sequence that used to come from create_all at
+startup, so a fresh database can be built by Alembic alone
+(DB_CREATE_ALL=false). Databases created the old way already have
+them and pass straight through.
+
+Revision ID: 0000_initial_schema
+Revises: 
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0000_initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE IF NOT EXISTS short_code_block_seq START WITH 1")
+    
+    if "urls" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "urls",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("original_url", sa.String, nullable=False),
+        sa.Column("short_code", sa.String(50), nullable=False),
+        sa.Column("click_count", sa.Integer, nullable=False),
+        sa.Column("is_active", sa.Boolean, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_urls_id", "urls", ["id"])
+    op.create_index("ix_urls_original_url", "urls", ["original_url"])
+    op.create_index("ix_urls_short_code", "urls", ["short_code"], unique=True)
+
+def downgrade() -> None:
+    op.drop_table("urls")
+    op.execute("DROP SEQUENCE IF EXISTS short_code_block_seq")
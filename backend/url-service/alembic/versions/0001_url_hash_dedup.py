@@ -0,0 +1,107 @@
+"""Hash-indexed canonical URL dedup
+
+Replaces the btree index on urls.original_url with a fixed-width
+url_hash column and a partial unique index over active rows.
+
+Revision ID: 0001_url_hash_dedup
+Revises: 0000_initial_schema
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0001_url_hash_dedup'
+down_revision = '0000_initial_schema'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 5000
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Frozen copy of app.utils.helpers.url_hash as of this revision (no expiry
+# yet), so later changes to the application's hashing can't alter what
+# this migration writes
+def url_hash(url: str) -> bytes:
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    
+    netloc = host
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+    if parts.username is not None:
+        userinfo = parts.username
+        if parts.password is not None:
+            userinfo = f"{userinfo}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+    
+    canonical = urlunsplit((scheme, netloc, parts.path or "/", parts.query, parts.fragment))
+    return hashlib.sha256(canonical.encode()).digest()
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {c["name"] for c in inspector.get_columns("urls")}
+    indexes = {i["name"] for i in inspector.get_indexes("urls")}
+    
+    if "url_hash" not in columns:
+        op.add_column("urls", sa.Column("url_hash", sa.LargeBinary(length=32), nullable=True))
+    
+    # Hashing needs URL parsing, so the backfill runs in Python, in batches
+    urls = sa.table(
+        "urls",
+        sa.column("id", sa.Integer),
+        sa.column("original_url", sa.String),
+        sa.column("url_hash", sa.LargeBinary),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(urls.c.id, urls.c.original_url)
+            .where(urls.c.id > last_id, urls.c.url_hash.is_(None))
+            .order_by(urls.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        bind.execute(
+            urls.update().where(urls.c.id == sa.bindparam("row_id")).values(url_hash=sa.bindparam("digest")),
+            [{"row_id": row.id, "digest": url_hash(row.original_url)} for row in rows],
+        )
+        last_id = rows[-1].id
+    
+    # Only the oldest active row per canonical URL keeps its hash
+    op.execute(
+        """
+        UPDATE urls SET url_hash = NULL
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY url_hash ORDER BY id) AS position
+            FROM urls
+            WHERE is_active AND url_hash IS NOT NULL
+        ) ranked
+        WHERE urls.id = ranked.id AND ranked.position > 1
+        """
+    )
+    
+    if "uq_urls_active_url_hash" not in indexes:
+        op.create_index(
+            "uq_urls_active_url_hash",
+            "urls",
+            ["url_hash"],
+            unique=True,
+            postgresql_where=sa.text("is_active"),
+        )
+    if "ix_urls_original_url" in indexes:
+        op.drop_index("ix_urls_original_url", table_name="urls")
+
+def downgrade() -> None:
+    op.create_index("ix_urls_original_url", "urls", ["original_url"])
+    op.drop_index("uq_urls_active_url_hash", table_name="urls")
+    op.drop_column("urls", "url_hash")
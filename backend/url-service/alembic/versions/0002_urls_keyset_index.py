@@ -0,0 +1,23 @@
+"""Composite index for keyset-paginated URL listing
+
+Revision ID: 0002_urls_keyset_index
+Revises: 0001_url_hash_dedup
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002_urls_keyset_index'
+down_revision = '0001_url_hash_dedup'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    indexes = {i["name"] for i in sa.inspect(op.get_bind()).get_indexes("urls")}
+    if "ix_urls_created_at_id" not in indexes:
+        op.create_index("ix_urls_created_at_id", "urls", ["created_at", "id"])
+
+def downgrade() -> None:
+    op.drop_index("ix_urls_created_at_id", table_name="urls")
@@ -0,0 +1,37 @@
+"""Expiring links
+
+Adds urls.expires_at and a partial index over active expiring rows for
+the link reaper.
+
+Revision ID: 0003_url_expiry
+Revises: 0002_urls_keyset_index
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003_url_expiry'
+down_revision = '0002_urls_keyset_index'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {c["name"] for c in inspector.get_columns("urls")}
+    indexes = {i["name"] for i in inspector.get_indexes("urls")}
+    
+    if "expires_at" not in columns:
+        op.add_column("urls", sa.Column("expires_at", sa.DateTime(timezone=True), nullable=True))
+    if "ix_urls_active_expires_at" not in indexes:
+        op.create_index(
+            "ix_urls_active_expires_at",
+            "urls",
+            ["expires_at"],
+            postgresql_where=sa.text("is_active AND expires_at IS NOT NULL"),
+        )
+
+def downgrade() -> None:
+    op.drop_index("ix_urls_active_expires_at", table_name="urls")
+    op.drop_column("urls", "expires_at")
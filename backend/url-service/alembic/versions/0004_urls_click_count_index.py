@@ -0,0 +1,28 @@
+"""Partial index for the cache warmer's top-clicked query
+
+Revision ID: 0004_urls_click_count_index
+Revises: 0003_url_expiry
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004_urls_click_count_index'
+down_revision = '0003_url_expiry'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    indexes = {i["name"] for i in sa.inspect(op.get_bind()).get_indexes("urls")}
+    if "ix_urls_active_click_count" not in indexes:
+        op.create_index(
+            "ix_urls_active_click_count",
+            "urls",
+            [sa.text("click_count DESC")],
+            postgresql_where=sa.text("is_active"),
+        )
+
+def downgrade() -> None:
+    op.drop_index("ix_urls_active_click_count", table_name="urls")
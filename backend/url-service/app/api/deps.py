@@ -1,11 +1,8 @@
-from typing import Generator
-from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from typing import AsyncGenerator
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal
 
-def get_db() -> Generator:
-    """Dependency to get database session"""
-    try:
-        db = SessionLocal()
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get async database session"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,76 @@
+import json
+import logging
+from functools import lru_cache
+from typing import List, Tuple
+from urllib.parse import quote
+from app.services.url_service import URLService
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+REDIRECT_PREFIX = "/redirect/"
+
+# Same bytes the /redirect route sends through RedirectResponse and HTTPException
+LOCATION_SAFE = ":/%#?=@[]!$&'()*+,;"
+REDIRECT_START = {"type": "http.response.start", "status": 307}
+REDIRECT_BODY = {"type": "http.response.body", "body": b""}
+NOT_FOUND_BODY = json.dumps({"detail": "Short URL not found or inactive"}, separators=(",", ":")).encode()
+NOT_FOUND_START = {
+    "type": "http.response.start",
+    "status": 404,
+    "headers": [
+        (b"content-length", str(len(NOT_FOUND_BODY)).encode()),
+        (b"content-type", b"application/json"),
+    ],
+}
+NOT_FOUND_RESPONSE = {"type": "http.response.body", "body": NOT_FOUND_BODY}
+
+@lru_cache(maxsize=settings.local_cache_max_entries)
+def redirect_headers(original_url: str) -> List[Tuple[bytes, bytes]]:
+    """Encoded 307 headers for a destination, built once per URL"""
+    return [
+        (b"content-length", b"0"),
+        (b"location", quote(original_url, safe=LOCATION_SAFE).encode("latin-1")),
+    ]
+
+class FastRedirectMiddleware:
+    """Serves GET /redirect/{short_code} without FastAPI routing or dependency injection.
+
+    Cache hits never open a database session; a miss opens one only inside
+    the load itself, coalesced per code. Requests carrying an Origin header
+    (so CORS headers apply) and anything else fall through to the app,
+    which still has the regular route.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not scope["path"].startswith(REDIRECT_PREFIX)
+            or not settings.fast_redirect_enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        short_code = scope["path"][len(REDIRECT_PREFIX):]
+        if not short_code or "/" in short_code or any(name == b"origin" for name, _ in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            original_url = await URLService(None).get_original_url(short_code)
+        except Exception as e:
+            logger.error(f"Fast redirect failed for {short_code}, using the regular route: {e}")
+            await self.app(scope, receive, send)
+            return
+
+        if original_url is None:
+            await send(NOT_FOUND_START)
+            await send(NOT_FOUND_RESPONSE)
+            return
+
+        await send({**REDIRECT_START, "headers": redirect_headers(original_url)})
+        await send(REDIRECT_BODY)
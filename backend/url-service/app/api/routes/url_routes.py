@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import RedirectResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 import logging
 
 from app.api.deps import get_db
-from app.schemas.url_schema import URLCreate, URLResponse, URLStats, ErrorResponse
-from app.services.url_service import URLService
-from app.models.url_model import URL
+from app.database import AsyncSessionLocal
+from app.schemas.url_schema import (
+    URLCreate, URLResponse, URLStats, URLPage, ErrorResponse,
+    URLBatchCreate, URLBatchResponse
+)
+from app.services.url_service import URLService, url_loads
+from app.services.local_cache import local_url_cache, negative_url_cache, cache_invalidation
+from app.services.bloom_filter import short_code_filter
+from app.services.replica_router import replica_router
+from app.services.link_reaper import link_reaper
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -16,7 +23,7 @@ router = APIRouter()
 @router.post("/urls/", response_model=URLResponse, status_code=status.HTTP_201_CREATED)
 async def create_short_url(
     url_data: URLCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new short URL"""
     try:
@@ -31,7 +38,8 @@ async def create_short_url(
             short_url=f"{settings.base_url}/{db_url.short_code}",
             click_count=db_url.click_count,
             is_active=db_url.is_active,
-            created_at=db_url.created_at
+            created_at=db_url.created_at,
+            expires_at=db_url.expires_at
         )
     except ValueError as e:
         raise HTTPException(
@@ -45,37 +53,52 @@ async def create_short_url(
             detail="Internal server error"
         )
 
+@router.post("/urls/batch", response_model=URLBatchResponse)
+async def create_short_urls_bulk(
+    batch: URLBatchCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Create many short URLs in one request"""
+    try:
+        url_service = URLService(db)
+        return await url_service.create_short_urls_bulk(batch.urls)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error creating short URLs in bulk: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
 @router.get("/urls/{short_code}/stats", response_model=URLStats)
 async def get_url_stats(
     short_code: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get URL statistics"""
     url_service = URLService(db)
-    db_url = url_service.get_url_stats(short_code)
+    url_stats = await url_service.get_url_stats(short_code)
     
-    if not db_url:
+    if not url_stats:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="URL not found"
         )
     
-    return URLStats(
-        short_code=db_url.short_code,
-        original_url=db_url.original_url,
-        click_count=db_url.click_count,
-        created_at=db_url.created_at,
-        is_active=db_url.is_active
-    )
+    return url_stats
 
 @router.delete("/urls/{short_code}")
 async def deactivate_url(
     short_code: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Deactivate a URL"""
     url_service = URLService(db)
-    success = url_service.deactivate_url(short_code)
+    success = await url_service.deactivate_url(short_code)
     
     if not success:
         raise HTTPException(
@@ -88,7 +111,7 @@ async def deactivate_url(
 @router.get("/redirect/{short_code}")
 async def redirect_to_original(
     short_code: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Redirect to original URL"""
     url_service = URLService(db)
@@ -102,21 +125,53 @@ async def redirect_to_original(
     
     return RedirectResponse(url=original_url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
 
-@router.get("/urls/", response_model=List[URLStats])
+@router.get("/urls/", response_model=URLPage)
 async def list_urls(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    limit: int = Query(100, ge=1, le=settings.max_page_size),
+    cursor: Optional[str] = None,
+    # Offset paging from before cursors; kept for old clients
+    skip: int = Query(0, ge=0, deprecated=True),
+    db: AsyncSession = Depends(get_db)
 ):
-    """List all URLs (for admin purposes)"""
-    urls = db.query(URL).offset(skip).limit(limit).all()
-    return [
-        URLStats(
-            short_code=url.short_code,
-            original_url=url.original_url,
-            click_count=url.click_count,
-            created_at=url.created_at,
-            is_active=url.is_active
+    """List URLs newest first (for admin purposes); pass next_cursor to get the next page"""
+    try:
+        url_service = URLService(db)
+        return await url_service.list_urls(limit, cursor, skip)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-        for url in urls
-    ]
+
+@router.get("/urls/export")
+async def export_urls(format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    """Stream all URLs as NDJSON or CSV (for admin purposes)"""
+    async def generate():
+        # Own session: it must stay open for the whole response body
+        async with AsyncSessionLocal() as db:
+            async for chunk in URLService(db).export_urls(format):
+                yield chunk
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=urls.{format}"}
+    )
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """In-process cache counters"""
+    return {
+        "hot_links": local_url_cache.stats(),
+        "negative": negative_url_cache.stats(),
+        "short_code_filter": short_code_filter.stats(),
+        "invalidation": cache_invalidation.stats(),
+        "single_flight": url_loads.stats(),
+        "link_reaper": link_reaper.stats(),
+    }
+
+@router.get("/db/replicas")
+async def get_replica_stats():
+    """Read replica lag and read routing counters"""
+    return replica_router.stats()
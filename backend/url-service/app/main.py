@@ -1,10 +1,27 @@
-from fastapi import FastAPI
+import time
+IMPORT_STARTED = time.monotonic()
+
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from app.api.routes.url_routes import router
-from app.database import engine
+from app.api.fast_redirect import FastRedirectMiddleware
+from app.database import async_engine, partition_engines, replica_engines
 from app.models.url_model import Base
 from app.config import settings
+from app.services.redis_service import redis_service
+from app.services.local_cache import cache_invalidation
+from app.services.click_counter import click_counter
+from app.services.bloom_filter import short_code_filter
+from app.services.cache_warmer import cache_warmer
+from app.services.url_cache import url_cache
+from app.services.replica_router import replica_router
+from app.services.url_partitions import url_partitions
+from app.services.link_reaper import link_reaper
+from app.utils.startup import StartupTimer, prewarm_engines
 
 # Configure logging
 logging.basicConfig(
@@ -14,14 +31,81 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Nothing above touches the database or Redis; connections are made in lifespan()
+startup_timer = StartupTimer()
+startup_timer.record("imports", time.monotonic() - IMPORT_STARTED)
+
+async def create_schema():
+    """Create missing tables on every URL partition (DB_CREATE_ALL=true), within startup_schema_timeout"""
+    async def create_all(partition_engine):
+        async with partition_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(create_all(e) for e in {id(e): e for e in partition_engines}.values())),
+            timeout=settings.startup_schema_timeout
+        )
+    except asyncio.TimeoutError:
+        raise RuntimeError(f"Schema creation did not finish within {settings.startup_schema_timeout}s")
+
+async def prewarm_pools():
+    """Fill the database and Redis pools concurrently so first requests don't pay for connects"""
+    engines = [(engine, min(settings.db_pool_prewarm, settings.db_pool_size)) for engine in partition_engines]
+    engines += [(engine, min(settings.db_pool_prewarm, settings.db_replica_pool_size)) for engine in replica_engines]
+    try:
+        db_connections, redis_connections = await asyncio.wait_for(
+            asyncio.gather(prewarm_engines(engines), redis_service.prewarm(settings.redis_pool_prewarm)),
+            timeout=settings.startup_prewarm_timeout
+        )
+        logger.info(f"Prewarmed {db_connections} database and {redis_connections} Redis connections")
+    except asyncio.TimeoutError:
+        logger.warning(
+            f"Pool prewarm did not finish within {settings.startup_prewarm_timeout}s; "
+            f"remaining connections will be opened on demand"
+        )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("URL Service starting up...")
+    logger.info(f"Environment: {settings.environment}")
+    logger.info(f"Database URL: {settings.database_url}")
+    if settings.db_create_all:
+        with startup_timer.phase("schema"):
+            await create_schema()
+    with startup_timer.phase("pools"):
+        await prewarm_pools()
+    with startup_timer.phase("background_tasks"):
+        await url_cache.check_server_config()
+        replica_router.start()
+        cache_invalidation.start()
+        click_counter.start()
+        short_code_filter.request_rebuild()
+        cache_warmer.start()
+        link_reaper.start()
+    logger.info(f"URL Service started in {startup_timer.total:.2f}s ({startup_timer.summary()})")
+    
+    yield
+    
+    logger.info("URL Service shutting down...")
+    await link_reaper.stop()
+    await cache_warmer.stop()
+    await short_code_filter.stop()
+    await click_counter.stop()
+    await cache_invalidation.stop()
+    await replica_router.stop()
+    await redis_service.close()
+    await url_partitions.dispose()
+    await async_engine.dispose()
+    for replica_engine in replica_engines:
+        await replica_engine.dispose()
 
 # Create FastAPI app
 app = FastAPI(
     title="URL Shortener Service",
     description="Microservice for URL shortening functionality",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -33,6 +117,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it runs first: cached redirects skip CORS, routing and get_db
+app.add_middleware(FastRedirectMiddleware)
+
 # Include routes
 app.include_router(router)
 
@@ -41,15 +128,25 @@ async def health_check():
     """Service health check"""
     return {"status": "healthy", "service": "url-service"}
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("URL Service starting up...")
-    logger.info(f"Environment: {settings.environment}")
-    logger.info(f"Database URL: {settings.database_url}")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("URL Service shutting down...")
+@app.get("/ready")
+async def readiness_check():
+    """Ready to take traffic once cache warm-up has finished"""
+    if not cache_warmer.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "status": "warming_up",
+                "service": "url-service",
+                "warmup": cache_warmer.stats(),
+                "startup": startup_timer.stats(),
+            }
+        )
+    return {
+        "status": "ready",
+        "service": "url-service",
+        "warmup": cache_warmer.stats(),
+        "startup": startup_timer.stats(),
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,17 +1,35 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Sequence, LargeBinary, Index, text
 from sqlalchemy.sql import func
 from app.database import Base
 
+# Each value is one block of short code IDs leased by a worker
+short_code_block_seq = Sequence("short_code_block_seq", start=1, metadata=Base.metadata)
+
 class URL(Base):
     __tablename__ = "urls"
     
     id = Column(Integer, primary_key=True, index=True)
-    original_url = Column(String, nullable=False, index=True)
+    original_url = Column(String, nullable=False)
+    # SHA-256 of the canonical URL; NULL only for legacy rows that lost a dedup tie
+    url_hash = Column(LargeBinary(32), nullable=True)
     short_code = Column(String(50), unique=True, nullable=False, index=True)
     click_count = Column(Integer, default=0, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
+    # NULL for links that never expire; expired rows are deactivated by the link reaper
+    expires_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
+    __table_args__ = (
+        # At most one active row per canonical URL; also the dedup lookup index
+        Index("uq_urls_active_url_hash", "url_hash", unique=True, postgresql_where=text("is_active")),
+        # Keyset pagination order for admin listing
+        Index("ix_urls_created_at_id", "created_at", "id"),
+        # Only active expiring links, in the order the reaper takes them
+        Index("ix_urls_active_expires_at", "expires_at", postgresql_where=text("is_active AND expires_at IS NOT NULL")),
+        # Hottest active links first, for the startup cache warmer
+        Index("ix_urls_active_click_count", text("click_count DESC"), postgresql_where=text("is_active")),
+    )
+    
     def __repr__(self):
         return f"<URL(short_code='{self.short_code}', original_url='{self.original_url}')>"
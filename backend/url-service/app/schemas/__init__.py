@@ -1 +1,4 @@
-from .url_schema import URLCreate, URLResponse, URLStats, ErrorResponse
\ No newline at end of file
+from .url_schema import (
+    URLCreate, URLResponse, URLStats, URLPage, ErrorResponse,
+    URLBatchCreate, URLBatchItemResult, URLBatchResponse
+)
\ No newline at end of file
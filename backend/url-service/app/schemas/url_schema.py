@@ -1,10 +1,21 @@
 from pydantic import BaseModel, HttpUrl, validator
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any
 
 class URLCreate(BaseModel):
     original_url: HttpUrl
     custom_code: Optional[str] = None
+    expires_at: Optional[datetime] = None
+    
+    @validator('expires_at')
+    def validate_expires_at(cls, v):
+        if v is not None:
+            # Naive timestamps are taken as UTC
+            if v.tzinfo is None:
+                v = v.replace(tzinfo=timezone.utc)
+            if v <= datetime.now(timezone.utc):
+                raise ValueError('Expiry must be in the future')
+        return v
     
     @validator('custom_code')
     def validate_custom_code(cls, v):
@@ -23,6 +34,7 @@ class URLResponse(BaseModel):
     click_count: int
     is_active: bool
     created_at: datetime
+    expires_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
@@ -33,10 +45,33 @@ class URLStats(BaseModel):
     click_count: int
     created_at: datetime
     is_active: bool
+    expires_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
+class URLPage(BaseModel):
+    items: List[URLStats]
+    next_cursor: Optional[str] = None  # None on the last page
+
+class URLBatchCreate(BaseModel):
+    # Items are validated one by one so a bad entry doesn't reject the whole batch
+    urls: List[Dict[str, Any]]
+
+class URLBatchItemResult(BaseModel):
+    index: int
+    original_url: Optional[str] = None
+    short_code: Optional[str] = None
+    short_url: Optional[str] = None
+    status: str  # created, existing or error
+    error: Optional[str] = None
+
+class URLBatchResponse(BaseModel):
+    created: int
+    existing: int
+    failed: int
+    results: List[URLBatchItemResult]
+
 class ErrorResponse(BaseModel):
     error: str
     message: str
\ No newline at end of file
@@ -1,2 +1,9 @@
 from .redis_service import RedisService, redis_service
-from .url_service import URLService
\ No newline at end of file
+from .url_cache import KeyValueURLCache, HashBucketURLCache, url_cache
+from .local_cache import LocalCache, local_url_cache, negative_url_cache, cache_invalidation
+from .bloom_filter import BloomFilter, short_code_filter
+from .click_counter import ClickCounter, click_counter
+from .code_allocator import CodeAllocator, PostgresCodeAllocator, RedisCodeAllocator, code_allocator
+from .url_service import URLService
+from .cache_warmer import CacheWarmer, cache_warmer
+from .link_reaper import LinkReaper, link_reaper
\ No newline at end of file
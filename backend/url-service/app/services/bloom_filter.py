@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import logging
+import math
+from typing import Optional
+from sqlalchemy import select
+from app.services.url_partitions import url_partitions
+from app.models.url_model import URL
+from app.services.local_cache import cache_invalidation
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives, tunable false positives)"""
+    
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+    
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+    
+    def _positions(self, item: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+class ShortCodeFilter:
+    """Bloom filter of every active short code, used to keep unknown codes off the database.
+    
+    Built from the database at startup and extended on every create via the
+    cache invalidation channel, so it is consulted before the Redis cache.
+    Until a build has finished, and whenever that channel is down (creates on
+    other instances would be missed), the filter admits everything. A publish
+    that fails moves the invalidation generation instead; every instance then
+    rebuilds and admits everything until that rebuild is done, and a build
+    that sees the generation move while it is reading starts over, since a
+    code committed behind its scan would otherwise be left out.
+    """
+    
+    def __init__(self):
+        # Allocated by the first build rather than at import; it is tens of MB at default capacity
+        self.bloom: Optional[BloomFilter] = None
+        self.ready = False
+        self.rejections = 0
+        self._build_task: Optional[asyncio.Task] = None
+    
+    def might_exist(self, short_code: str) -> bool:
+        if not self.ready or not cache_invalidation.connected or short_code in self.bloom:
+            return True
+        self.rejections += 1
+        return False
+    
+    def add(self, short_code: str):
+        # Before the first build nothing is filtered, and that build reads the code from the database
+        if self.bloom is not None:
+            self.bloom.add(short_code)
+    
+    def request_rebuild(self):
+        """Rebuild in the background; used when adds may have been missed"""
+        self.ready = False
+        if self._build_task is None or self._build_task.done():
+            self._build_task = asyncio.create_task(self.build())
+    
+    async def build(self):
+        """Add every active short code from the database"""
+        self.ready = False
+        if self.bloom is None:
+            self.bloom = BloomFilter(settings.bloom_capacity, settings.bloom_error_rate)
+        while True:
+            generation = cache_invalidation.generation
+            loaded = 0
+            try:
+                for index in range(url_partitions.count):
+                    async with url_partitions.session(index) as db:
+                        result = await db.stream_scalars(
+                            select(URL.short_code)
+                            .where(URL.is_active == True)
+                            .execution_options(yield_per=settings.export_chunk_size)
+                        )
+                        async for short_code in result:
+                            self.bloom.add(short_code)
+                            loaded += 1
+            except Exception as e:
+                logger.error(f"Short code filter build failed, filter disabled: {e}")
+                return
+            if generation is None or cache_invalidation.generation == generation:
+                break
+            logger.info("Invalidation generation moved during the short code filter build; reading again")
+        
+        if loaded > settings.bloom_capacity:
+            logger.warning(
+                f"Short code filter holds {loaded} codes, above its capacity of "
+                f"{settings.bloom_capacity}; raise BLOOM_CAPACITY"
+            )
+        self.ready = True
+        logger.info(f"Short code filter built with {loaded} codes")
+    
+    async def stop(self):
+        if self._build_task is not None:
+            self._build_task.cancel()
+            try:
+                await self._build_task
+            except asyncio.CancelledError:
+                pass
+    
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "codes": self.bloom.count if self.bloom else 0,
+            "size_bits": self.bloom.size if self.bloom else 0,
+            "hash_count": self.bloom.hash_count if self.bloom else 0,
+            "rejections": self.rejections,
+        }
+
+# Create singleton instance
+short_code_filter = ShortCodeFilter()
+cache_invalidation.add_handler(short_code_filter.add, reset=short_code_filter.request_rebuild)
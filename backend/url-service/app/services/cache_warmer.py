@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack
+from typing import Optional
+from sqlalchemy import select, or_, func
+from app.services.url_partitions import url_partitions
+from app.models.url_model import URL
+from app.services.url_cache import url_cache, build_cache_entry, cache_locally
+from app.services.local_cache import local_url_cache
+from app.utils.helpers import merge_sorted
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class CacheWarmer:
+    """Preloads the most-clicked links into Redis and the local cache at startup"""
+    
+    def __init__(self):
+        self.ready = False
+        self.warmed = 0
+        self.duration: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if not settings.warmup_enabled:
+            self.ready = True
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def warm(self):
+        """Load the top-N active codes by click count in pipelined batches"""
+        local_budget = local_url_cache.max_entries
+        async with AsyncExitStack() as stack:
+            # Each partition's top N, merged so the hottest codes overall come first
+            streams = []
+            for index in range(url_partitions.count):
+                db = await stack.enter_async_context(url_partitions.session(index))
+                streams.append(await db.stream(
+                    select(URL.short_code, URL.original_url, URL.click_count, URL.expires_at)
+                    .where(
+                        URL.is_active == True,
+                        or_(URL.expires_at.is_(None), URL.expires_at > func.now())
+                    )
+                    .order_by(URL.click_count.desc())
+                    .limit(settings.warmup_top_n)
+                    .execution_options(yield_per=settings.warmup_batch_size)
+                ))
+            
+            rows = []
+            async for _, row in merge_sorted(streams, key=lambda row: row.click_count, reverse=True):
+                rows.append(row)
+                if len(rows) >= settings.warmup_batch_size:
+                    await self._warm_batch(rows, local_budget)
+                    rows = []
+                if self.warmed + len(rows) >= settings.warmup_top_n:
+                    break
+            if rows:
+                await self._warm_batch(rows, local_budget)
+    
+    async def _warm_batch(self, rows, local_budget: int):
+        entries = {
+            row.short_code: build_cache_entry(row.original_url, row.click_count, True, link_expires_at=row.expires_at)
+            for row in rows
+        }
+        await url_cache.set_many(entries)
+        # Hottest rows come first; only those fit in the local cache
+        for row in rows[:max(local_budget - self.warmed, 0)]:
+            cache_locally(row.short_code, entries[row.short_code])
+        self.warmed += len(rows)
+    
+    async def _run(self):
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self.warm(), timeout=settings.warmup_timeout)
+            logger.info(f"Cache warm-up finished in {time.monotonic() - started:.2f}s")
+        except asyncio.TimeoutError:
+            logger.warning(f"Cache warm-up stopped after its {settings.warmup_timeout}s budget")
+        except Exception as e:
+            logger.error(f"Cache warm-up failed: {e}")
+        finally:
+            # A partial or failed warm-up must not keep the instance out of rotation
+            self.duration = time.monotonic() - started
+            self.ready = True
+    
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "warmed": self.warmed,
+            "duration_seconds": round(self.duration, 3) if self.duration is not None else None,
+        }
+
+# Create singleton instance
+cache_warmer = CacheWarmer()
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import uuid
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import update, values, column, String, Integer
+from app.models.url_model import URL
+from app.services.redis_service import redis_service
+from app.services.url_partitions import url_partitions
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DELTA_KEY = "clicks:delta:{}"
+# Each Redis node keeps its own dirty set, listing the codes whose deltas it owns
+DIRTY_SET_KEY = "clicks:dirty"
+FLUSH_LOCK_KEY = "clicks:flush-lock"
+
+# Subtract what was flushed, and drop the key once nothing is left so idle codes don't linger
+SETTLE_SCRIPT = """
+local remaining = redis.call('DECRBY', KEYS[1], ARGV[1])
+if remaining <= 0 then
+    redis.call('DEL', KEYS[1])
+end
+return remaining
+"""
+
+# Extend or release the flush lock only while this instance still holds it
+RENEW_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class ClickCounter:
+    """Write-behind click counter: clicks accumulate in Redis and are flushed to Postgres in batches"""
+    
+    def __init__(self):
+        self._local: Counter = Counter()  # used only while Redis is unreachable
+        self._settle = None
+        self._renew_lock = None
+        self._release_lock = None
+        self._task = None
+        self._instance_id = uuid.uuid4().hex
+    
+    async def record(self, short_code: str, amount: int = 1):
+        """Count a click without touching the database"""
+        if redis_service.is_available():
+            try:
+                key = DELTA_KEY.format(short_code)
+                async with redis_service.client_for(key).pipeline(transaction=False) as pipe:
+                    pipe.incrby(key, amount)
+                    pipe.sadd(DIRTY_SET_KEY, short_code)
+                    await pipe.execute()
+                return
+            except Exception as e:
+                logger.error(f"Redis click count error for {short_code}: {e}")
+        self._local[short_code] += amount
+    
+    async def pending(self, short_code: str) -> int:
+        """Clicks recorded but not yet flushed to the database"""
+        return (await self.pending_many([short_code]))[short_code]
+    
+    async def pending_many(self, short_codes: List[str]) -> Dict[str, int]:
+        """Unflushed clicks for several codes in one round trip"""
+        deltas = {code: self._local.get(code, 0) for code in short_codes}
+        if not short_codes or not redis_service.is_available():
+            return deltas
+        
+        try:
+            counts = await redis_service.mget_raw([DELTA_KEY.format(c) for c in short_codes])
+            for code, count in zip(short_codes, counts):
+                if count:
+                    deltas[code] += int(count)
+        except Exception as e:
+            logger.error(f"Redis pending click lookup error: {e}")
+        return deltas
+    
+    async def flush(self) -> int:
+        """Apply accumulated clicks to urls.click_count; returns the number of codes updated.
+        
+        Clicks are applied at least once: a crash between a partition's
+        commit and settling its deltas in Redis applies them again next time.
+        """
+        flushed = await self._flush_local()
+        if not redis_service.is_available():
+            return flushed
+        
+        lock = redis_service.client_for(FLUSH_LOCK_KEY)
+        if self._renew_lock is None:
+            self._renew_lock = lock.register_script(RENEW_LOCK_SCRIPT)
+            self._release_lock = lock.register_script(RELEASE_LOCK_SCRIPT)
+        # Only one instance flushes at a time; the lock is renewed before every batch
+        if not await lock.set(FLUSH_LOCK_KEY, self._instance_id, nx=True, ex=settings.click_flush_lock_ttl):
+            return flushed
+        
+        try:
+            for client in list(redis_service.nodes.values()):
+                flushed += await self._flush_node(client, lock)
+        finally:
+            await self._release_lock(keys=[FLUSH_LOCK_KEY], args=[self._instance_id], client=lock)
+        
+        return flushed
+    
+    async def _still_holding(self, lock) -> bool:
+        """Renew the flush lock; False if it expired and another instance may be flushing"""
+        args = [self._instance_id, settings.click_flush_lock_ttl]
+        if await self._renew_lock(keys=[FLUSH_LOCK_KEY], args=args, client=lock):
+            return True
+        logger.warning("Lost the click flush lock; stopping this flush")
+        return False
+    
+    async def _flush_node(self, client, lock) -> int:
+        """Drain one node's dirty set; its deltas live on the same node"""
+        flushed = 0
+        while await self._still_holding(lock):
+            codes = await client.spop(DIRTY_SET_KEY, settings.click_flush_batch_size)
+            if not codes:
+                break
+            
+            counts = await client.mget([DELTA_KEY.format(c) for c in codes])
+            deltas = {code: int(count) for code, count in zip(codes, counts) if count and int(count) > 0}
+            if deltas:
+                # Settle each partition's deltas as soon as it commits, so a later
+                # partition failing can't get them applied a second time
+                async def settle(committed: Dict[str, int]):
+                    await self._settle_deltas(client, committed)
+                
+                failed = await self._apply(deltas, settle)
+                if failed:
+                    # Those counts are still in Redis; mark the codes dirty again for the next flush
+                    await client.sadd(DIRTY_SET_KEY, *failed)
+                flushed += len(deltas) - len(failed)
+            
+            if len(codes) < settings.click_flush_batch_size:
+                break
+        return flushed
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Don't leave clicks behind on shutdown
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Final click count flush failed: {e}")
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.click_flush_interval)
+            try:
+                flushed = await self.flush()
+                if flushed:
+                    logger.info(f"Flushed click counts for {flushed} URLs")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Click count flush failed: {e}")
+    
+    async def _flush_local(self) -> int:
+        if not self._local:
+            return 0
+        deltas, self._local = dict(self._local), Counter()
+        failed = await self._apply(deltas)
+        # Only partitions that didn't commit keep their clicks for the next flush
+        self._local.update(failed)
+        return len(deltas) - len(failed)
+    
+    async def _apply(
+        self,
+        deltas: Dict[str, int],
+        on_commit: Optional[Callable[[Dict[str, int]], Awaitable[None]]] = None
+    ) -> Dict[str, int]:
+        """One multi-row UPDATE ... FROM (VALUES ...) per URL partition, each in its own transaction.
+        
+        on_commit is awaited with a partition's deltas right after that
+        partition commits. Returns the deltas of partitions that failed.
+        """
+        failed: Dict[str, int] = {}
+        for index, short_codes in url_partitions.group(deltas).items():
+            partition_deltas = {code: deltas[code] for code in short_codes}
+            batch = values(
+                column("short_code", String),
+                column("delta", Integer),
+                name="click_deltas",
+            ).data(list(partition_deltas.items()))
+            
+            try:
+                async with url_partitions.session(index) as db:
+                    await db.execute(
+                        update(URL)
+                        .where(URL.short_code == batch.c.short_code)
+                        .values(click_count=URL.click_count + batch.c.delta)
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Applying click counts to partition {index} failed: {e}")
+                failed.update(partition_deltas)
+                continue
+            
+            if on_commit is not None:
+                await on_commit(partition_deltas)
+        return failed
+    
+    async def _settle_deltas(self, client, deltas: Dict[str, int]):
+        if self._settle is None:
+            self._settle = redis_service.client.register_script(SETTLE_SCRIPT)
+        async with client.pipeline(transaction=False) as pipe:
+            for code, delta in deltas.items():
+                await self._settle(keys=[DELTA_KEY.format(code)], args=[delta], client=pipe)
+            await pipe.execute()
+
+# Create singleton instance
+click_counter = ClickCounter()
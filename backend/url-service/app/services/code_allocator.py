@@ -0,0 +1,163 @@
+import asyncio
+import logging
+from typing import Optional, List
+from sqlalchemy import select, func, text
+from app.database import async_engine
+from app.models.url_model import short_code_block_seq
+from app.services.redis_service import redis_service
+from app.utils.helpers import encode_short_code
+from app.config import settings, DEFAULT_SHORT_CODE_SECRET
+
+logger = logging.getLogger(__name__)
+
+REDIS_COUNTER_KEY = "short_code:next_id"
+# End of the ID range reserved in Postgres; the counter never passes it
+REDIS_RESERVED_KEY = "short_code:reserved_until"
+# Serializes reservations so each one starts past the last
+RESERVE_LOCK_ID = 0x73636F64
+
+# Lease a block inside the reservation, or return -1 when the counter is
+# missing (evicted, flushed, new node) or the reservation is used up
+LEASE_SCRIPT = """
+local next_id = tonumber(redis.call('GET', KEYS[1]))
+local reserved = tonumber(redis.call('GET', KEYS[2]))
+if not next_id or not reserved or next_id + tonumber(ARGV[1]) > reserved then
+    return -1
+end
+return redis.call('INCRBY', KEYS[1], ARGV[1])
+"""
+
+# Move the counter onto a fresh reservation; a reservation older than the
+# current one is ignored
+RESERVE_SCRIPT = """
+local reserved = tonumber(redis.call('GET', KEYS[2]) or '0')
+if tonumber(ARGV[2]) <= reserved and redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+local next_id = tonumber(redis.call('GET', KEYS[1]) or '0')
+if next_id < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+redis.call('SET', KEYS[2], ARGV[2])
+return 1
+"""
+
+class CodeAllocator:
+    """Hands out collision-free short codes from ID blocks leased per worker.
+    
+    Subclasses only decide where blocks come from. Each ID is encoded through
+    a keyed base62 permutation, so codes are unique without probing the
+    database and still look random.
+    """
+    
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self._next_id: Optional[int] = None
+        self._block_end = 0
+        self._lock = asyncio.Lock()
+    
+    async def next_id(self) -> int:
+        return (await self.next_ids(1))[0]
+    
+    async def next_ids(self, count: int) -> List[int]:
+        """Allocate several IDs at once, leasing as many blocks as needed"""
+        allocated = []
+        async with self._lock:
+            while len(allocated) < count:
+                if self._next_id is None or self._next_id >= self._block_end:
+                    self._next_id, self._block_end = await self._lease_block()
+                    logger.info(f"Leased short code ID block [{self._next_id}, {self._block_end})")
+                take = min(count - len(allocated), self._block_end - self._next_id)
+                allocated.extend(range(self._next_id, self._next_id + take))
+                self._next_id += take
+        return allocated
+    
+    async def next_code(self) -> str:
+        return self._encode(await self.next_id())
+    
+    async def next_codes(self, count: int) -> List[str]:
+        return [self._encode(i) for i in await self.next_ids(count)]
+    
+    @staticmethod
+    def _encode(number: int) -> str:
+        return encode_short_code(
+            number,
+            settings.default_short_code_length,
+            settings.short_code_secret,
+        )
+    
+    async def _lease_block(self) -> tuple:
+        """Return a [start, end) ID range no other worker will receive"""
+        raise NotImplementedError
+
+class PostgresCodeAllocator(CodeAllocator):
+    """Leases blocks from a Postgres sequence (one nextval per block)"""
+    
+    async def _lease_block(self) -> tuple:
+        async with async_engine.connect() as conn:
+            block = await conn.scalar(select(short_code_block_seq.next_value()))
+        start = block * self.block_size
+        return start, start + self.block_size
+
+class RedisCodeAllocator(CodeAllocator):
+    """Leases blocks with INCRBY on a Redis counter, inside ranges reserved in Postgres.
+    
+    The counter is an ordinary key: allkeys-lru can evict it and a flush or
+    failover can lose it. So Redis only hands out IDs below
+    short_code:reserved_until, and every reservation of code_reserve_blocks
+    blocks is first recorded by advancing short_code_block_seq. When either
+    key is missing the counter is re-seeded from a new reservation, which
+    starts past everything Redis could have handed out. Both keys live on
+    redis_service.client, not on the hash ring, so adding a node doesn't
+    move them. Don't run this next to PostgresCodeAllocator workers.
+    """
+    
+    def __init__(self, block_size: int):
+        super().__init__(block_size)
+        self._lease = None
+        self._reserve = None
+    
+    async def _lease_block(self) -> tuple:
+        if not redis_service.is_available():
+            raise RuntimeError("Redis is not available for short code allocation")
+        client = redis_service.client
+        if self._lease is None:
+            self._lease = client.register_script(LEASE_SCRIPT)
+            self._reserve = client.register_script(RESERVE_SCRIPT)
+        keys = [REDIS_COUNTER_KEY, REDIS_RESERVED_KEY]
+        
+        for _ in range(settings.max_code_allocation_attempts):
+            end = await self._lease(keys=keys, args=[self.block_size], client=client)
+            if end >= 0:
+                return end - self.block_size, end
+            start, reserved_until = await self._reserve_range()
+            await self._reserve(keys=keys, args=[start, reserved_until], client=client)
+            logger.info(f"Reserved short code IDs [{start}, {reserved_until}) for the Redis counter")
+        raise RuntimeError("Could not lease a short code block from Redis")
+    
+    async def _reserve_range(self) -> tuple:
+        """Record the next code_reserve_blocks blocks as used in Postgres"""
+        async with async_engine.begin() as conn:
+            await conn.execute(select(func.pg_advisory_xact_lock(RESERVE_LOCK_ID)))
+            last_block = await conn.scalar(text("SELECT last_value FROM short_code_block_seq"))
+            start_block = last_block + 1
+            end_block = start_block + settings.code_reserve_blocks
+            # Sequences aren't transactional; this sticks even if the lease fails later
+            await conn.execute(select(func.setval("short_code_block_seq", end_block - 1)))
+        return start_block * self.block_size, end_block * self.block_size
+
+def create_code_allocator(backend: str) -> CodeAllocator:
+    allocators = {
+        "postgres": PostgresCodeAllocator,
+        "redis": RedisCodeAllocator,
+    }
+    if backend not in allocators:
+        raise ValueError(f"Unknown short code allocator: {backend}")
+    # Codes from the public placeholder key can be decoded back to IDs, and
+    # replacing the key later collides with codes already issued
+    if settings.short_code_secret == DEFAULT_SHORT_CODE_SECRET and settings.environment != "development":
+        raise ValueError(f"SHORT_CODE_SECRET must be set in the {settings.environment} environment")
+    return allocators[backend](settings.code_block_size)
+
+# Create singleton instance
+code_allocator = create_code_allocator(settings.code_allocator)
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional
+from sqlalchemy import select, update, func
+from app.models.url_model import URL
+from app.services.url_cache import url_cache
+from app.services.local_cache import cache_invalidation
+from app.services.url_partitions import url_partitions
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class LinkReaper:
+    """Deactivates expired links in small batches and purges them from the caches.
+
+    Each batch locks at most reaper_batch_size rows with FOR UPDATE SKIP LOCKED
+    and commits right away, so it never waits on or blocks rows that requests
+    are updating, and several instances can reap side by side. Redirects stop
+    serving a link at its expiry anyway; the reaper only tidies up after it.
+    """
+
+    def __init__(self):
+        self.reaped = 0
+        self.last_run: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and settings.reaper_enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def reap(self) -> int:
+        """Deactivate every link expired so far; returns how many"""
+        started = time.monotonic()
+        reaped = 0
+        for index in range(url_partitions.count):
+            while True:
+                short_codes = await self._reap_batch(index)
+                if short_codes:
+                    await self._purge(short_codes)
+                    reaped += len(short_codes)
+                if len(short_codes) < settings.reaper_batch_size:
+                    break
+
+        self.reaped += reaped
+        self.last_run = time.time()
+        self.last_duration = time.monotonic() - started
+        return reaped
+
+    async def _reap_batch(self, index: int) -> List[str]:
+        expired = (
+            select(URL.id)
+            .where(URL.is_active == True, URL.expires_at <= func.now())
+            .order_by(URL.expires_at)
+            .limit(settings.reaper_batch_size)
+            .with_for_update(skip_locked=True)
+            .cte("expired")
+        )
+        async with url_partitions.session(index) as db:
+            result = await db.execute(
+                update(URL)
+                .where(URL.id == expired.c.id)
+                .values(is_active=False, updated_at=func.now())
+                .returning(URL.short_code)
+                .execution_options(synchronize_session=False)
+            )
+            short_codes = list(result.scalars())
+            await db.commit()
+        return short_codes
+
+    async def _purge(self, short_codes: List[str]):
+        """Drop reaped codes from Redis and from every instance's local cache, pipelined"""
+        await url_cache.delete_many(short_codes)
+        await cache_invalidation.publish_many(short_codes)
+
+    async def _run(self):
+        while True:
+            try:
+                reaped = await self.reap()
+                if reaped:
+                    logger.info(f"Deactivated {reaped} expired links in {self.last_duration:.2f}s")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Expired link reaping failed: {e}")
+            await asyncio.sleep(settings.reaper_interval)
+
+    def stats(self):
+        return {
+            "reaped": self.reaped,
+            "last_run": self.last_run,
+            "last_duration_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+        }
+
+# Create singleton instance
+link_reaper = LinkReaper()
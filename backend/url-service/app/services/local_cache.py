@@ -0,0 +1,273 @@
+import asyncio
+import time
+import logging
+from collections import OrderedDict, defaultdict
+from typing import Optional, Dict, Any, List, Callable
+from app.services.redis_service import redis_service
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class LocalCache:
+    """Bounded in-process cache with per-entry TTL and LFU eviction"""
+    
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> [value, expires_at, frequency]
+        self._entries: Dict[str, List[Any]] = {}
+        # frequency -> keys in least-recently-used order
+        self._buckets: Dict[int, OrderedDict] = defaultdict(OrderedDict)
+        self._min_frequency = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get value if present and not expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        if entry[1] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self._touch(key, entry)
+        self.hits += 1
+        return entry[0]
+    
+    def set(self, key: str, value: Any, ttl: int = None):
+        """Insert or replace a value, evicting the least frequently used entry if full"""
+        if self.max_entries <= 0:
+            return
+        
+        expires_at = time.monotonic() + (ttl or self.ttl)
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[0] = value
+            entry[1] = expires_at
+            self._touch(key, entry)
+            return
+        
+        if len(self._entries) >= self.max_entries:
+            self._evict()
+        
+        self._entries[key] = [value, expires_at, 1]
+        self._buckets[1][key] = None
+        self._min_frequency = 1
+    
+    def invalidate(self, key: str) -> bool:
+        """Drop a key; returns True if it was cached"""
+        if key not in self._entries:
+            return False
+        self._remove(key)
+        self.invalidations += 1
+        return True
+    
+    def clear(self):
+        """Drop every entry"""
+        self._entries.clear()
+        self._buckets.clear()
+        self._min_frequency = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _touch(self, key: str, entry: List[Any]):
+        frequency = entry[2]
+        bucket = self._buckets[frequency]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[frequency]
+            if self._min_frequency == frequency:
+                self._min_frequency = frequency + 1
+        entry[2] = frequency + 1
+        self._buckets[frequency + 1][key] = None
+    
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        bucket = self._buckets[entry[2]]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[entry[2]]
+    
+    def _evict(self):
+        if not self._buckets:
+            return
+        if self._min_frequency not in self._buckets:
+            self._min_frequency = min(self._buckets)
+        bucket = self._buckets[self._min_frequency]
+        key, _ = bucket.popitem(last=False)
+        if not bucket:
+            del self._buckets[self._min_frequency]
+        del self._entries[key]
+        self.evictions += 1
+
+class CacheInvalidationListener:
+    """Keeps per-instance short code state coherent across instances via Redis pub/sub.
+    
+    Every create or deactivation publishes the short code. Each registered
+    handler is called with the code on every instance, and each reset
+    handler runs once the subscription is re-established after a loss,
+    since messages may have been missed while disconnected.
+    
+    A publish that fails means the other instances missed a change, so the
+    publisher bumps a generation counter in Redis instead; every instance
+    polls it and runs its reset handlers when it moves.
+    """
+    
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.generation_key = f"{channel}:generation"
+        self._handlers: List[Callable[[str], Any]] = []
+        self._reset_handlers: List[Callable[[], Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._poll_task: Optional[asyncio.Task] = None
+        self._generation: Optional[int] = None
+        self._bump_pending = False
+        self.connected = False
+        self.publish_failures = 0
+    
+    def add_handler(self, handler: Callable[[str], Any], reset: Optional[Callable[[], Any]] = None):
+        self._handlers.append(handler)
+        if reset is not None:
+            self._reset_handlers.append(reset)
+    
+    async def publish(self, short_code: str) -> bool:
+        """Apply a change locally and announce it to every other instance; False if the announcement failed"""
+        self._dispatch(short_code)
+        if await redis_service.publish(self.channel, short_code) is None:
+            await self._bump_generation()
+            return False
+        return True
+    
+    async def publish_many(self, short_codes: List[str]) -> bool:
+        """Batch form of publish, sent in one pipeline"""
+        if not short_codes:
+            return True
+        for short_code in short_codes:
+            self._dispatch(short_code)
+        if not await redis_service.publish_many(self.channel, short_codes):
+            await self._bump_generation()
+            return False
+        return True
+    
+    def start(self):
+        if self._task is None and redis_service.is_available():
+            self._task = asyncio.create_task(self._listen())
+            self._poll_task = asyncio.create_task(self._poll_generation())
+    
+    async def stop(self):
+        for task in (self._task, self._poll_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._poll_task = None
+        self.connected = False
+    
+    async def _bump_generation(self):
+        """Make every instance reset; retried by the poller if Redis is down right now"""
+        self.publish_failures += 1
+        try:
+            self._generation = await redis_service.client.incr(self.generation_key)
+            self._bump_pending = False
+        except Exception as e:
+            logger.error(f"Could not bump {self.generation_key} after a failed publish: {e}")
+            self._bump_pending = True
+    
+    async def _poll_generation(self):
+        while True:
+            await asyncio.sleep(settings.cache_generation_poll_interval)
+            try:
+                if self._bump_pending:
+                    self._generation = await redis_service.client.incr(self.generation_key)
+                    self._bump_pending = False
+                    continue
+                generation = int(await redis_service.client.get(self.generation_key) or 0)
+                if self._generation is not None and generation != self._generation:
+                    logger.warning("Another instance failed to publish a change; resetting local short code state")
+                    self._reset()
+                self._generation = generation
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache generation poll error: {e}")
+    
+    @property
+    def generation(self) -> Optional[int]:
+        """Last generation seen; it moves whenever some instance missed announcing a change"""
+        return self._generation
+    
+    def _reset(self):
+        for reset in self._reset_handlers:
+            reset()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "generation": self._generation,
+            "publish_failures": self.publish_failures,
+        }
+    
+    def _dispatch(self, short_code: str):
+        for handler in self._handlers:
+            handler(short_code)
+    
+    async def _listen(self):
+        lost = False
+        while True:
+            pubsub = redis_service.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                self.connected = True
+                logger.info(f"Listening for cache invalidations on {self.channel}")
+                if lost:
+                    self._reset()
+                    lost = False
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {e}")
+                self.connected = False
+                lost = True
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+# Create singleton instances
+local_url_cache = LocalCache(settings.local_cache_max_entries, settings.local_cache_ttl)
+# Short codes known not to exist (or to be inactive); kept briefly
+negative_url_cache = LocalCache(settings.negative_cache_max_entries, settings.negative_cache_ttl)
+
+cache_invalidation = CacheInvalidationListener(settings.cache_invalidation_channel)
+cache_invalidation.add_handler(local_url_cache.invalidate, reset=local_url_cache.clear)
+cache_invalidation.add_handler(negative_url_cache.invalidate, reset=negative_url_cache.clear)
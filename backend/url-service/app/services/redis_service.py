@@ -1,33 +1,124 @@
-import redis
+import redis.asyncio as redis
+import asyncio
 import json
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from app.services.hash_ring import HashRing
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
 class RedisService:
+    """Redis client sharded across settings.redis_node_urls with a consistent hash ring.
+    
+    Keyed commands go to the node that owns the key (client_for); multi-key
+    helpers split their pipelines per node and run them concurrently. `client`
+    is the first node and is meant for pub/sub and other unkeyed commands.
+    """
+    
     def __init__(self):
+        self.nodes: Dict[str, redis.Redis] = {}
+        self.ring = HashRing(replicas=settings.redis_virtual_nodes)
+        self.client = None
         try:
-            self.client = redis.from_url(settings.redis_url, decode_responses=True)
-            # Test connection
-            self.client.ping()
-            logger.info("Redis connection established successfully")
+            for url in settings.redis_node_urls:
+                self.add_node(url)
+            self.client = next(iter(self.nodes.values()), None)
         except Exception as e:
-            logger.error(f"Redis connection failed: {e}")
+            logger.error(f"Redis client setup failed: {e}")
+            self.nodes = {}
+            self.ring = HashRing(replicas=settings.redis_virtual_nodes)
             self.client = None
     
+    def add_node(self, url: str):
+        """Add a node; about 1/N of the keys move to it"""
+        # Bounded pool per node shared by every request; connections are opened lazily
+        pool = redis.ConnectionPool.from_url(
+            url,
+            max_connections=settings.redis_max_connections,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_connect_timeout,
+            decode_responses=True,
+        )
+        self.nodes[url] = redis.Redis(connection_pool=pool)
+        self.ring.add_node(url)
+    
+    async def remove_node(self, url: str):
+        """Remove a node; only the keys it owned move elsewhere"""
+        client = self.nodes.pop(url, None)
+        self.ring.remove_node(url)
+        if client is not None:
+            if client is self.client:
+                self.client = next(iter(self.nodes.values()), None)
+            await client.aclose(close_connection_pool=True)
+    
     def is_available(self) -> bool:
         """Check if Redis is available"""
         return self.client is not None
     
+    def client_for(self, key: str) -> redis.Redis:
+        """Client for the node that owns key"""
+        return self.nodes[self.ring.get_node(key)]
+    
+    def group_keys(self, keys: List[str]) -> Dict[redis.Redis, List[str]]:
+        """Split keys by owning node client"""
+        return {self.nodes[node]: node_keys for node, node_keys in self.ring.group(keys).items()}
+    
+    async def ping(self) -> bool:
+        """Test the connection to every node"""
+        if not self.is_available():
+            return False
+            
+        try:
+            await asyncio.gather(*(client.ping() for client in self.nodes.values()))
+            logger.info(f"Redis connection established successfully ({len(self.nodes)} nodes)")
+            return True
+        except Exception as e:
+            logger.error(f"Redis connection failed: {e}")
+            return False
+    
+    async def prewarm(self, connections: int) -> int:
+        """Open `connections` pooled connections per node up front (at least one, as a ping)"""
+        if not self.is_available():
+            return 0
+        
+        opened = await asyncio.gather(*(
+            self._prewarm_node(client, max(1, min(connections, settings.redis_max_connections)))
+            for client in self.nodes.values()
+        ))
+        if all(opened):
+            logger.info(f"Redis pools prewarmed with {sum(opened)} connections ({len(self.nodes)} nodes)")
+        else:
+            logger.error(f"Redis prewarm could not reach {opened.count(0)} of {len(self.nodes)} nodes")
+        return sum(opened)
+    
+    async def _prewarm_node(self, client: redis.Redis, connections: int) -> int:
+        pool = client.connection_pool
+        # Check out every connection at once so the pool has to open them all
+        results = await asyncio.gather(
+            *(pool.get_connection("PING") for _ in range(connections)),
+            return_exceptions=True
+        )
+        opened = 0
+        for result in results:
+            if isinstance(result, Exception):
+                continue
+            await pool.release(result)
+            opened += 1
+        return opened
+    
+    async def close(self):
+        """Release pooled connections"""
+        for client in self.nodes.values():
+            await client.aclose(close_connection_pool=True)
+    
     async def get(self, key: str) -> Optional[Dict[str, Any]]:
         """Get value from Redis cache"""
         if not self.is_available():
             return None
             
         try:
-            data = self.client.get(key)
+            data = await self.client_for(key).get(key)
             if data:
                 return json.loads(data)
             return None
@@ -42,7 +133,7 @@ class RedisService:
             
         try:
             ttl = ttl or settings.cache_ttl
-            self.client.setex(key, ttl, json.dumps(value, default=str))
+            await self.client_for(key).setex(key, ttl, json.dumps(value, default=str))
             return True
         except Exception as e:
             logger.error(f"Redis SET error for key {key}: {e}")
@@ -54,22 +145,127 @@ class RedisService:
             return False
             
         try:
-            self.client.delete(key)
+            await self.client_for(key).delete(key)
             return True
         except Exception as e:
             logger.error(f"Redis DELETE error for key {key}: {e}")
             return False
     
+    async def delete_many(self, keys: List[str]) -> bool:
+        """Delete several keys, one DEL per node"""
+        if not self.is_available() or not keys:
+            return False
+            
+        try:
+            await asyncio.gather(*(client.delete(*node_keys) for client, node_keys in self.group_keys(keys).items()))
+            return True
+        except Exception as e:
+            logger.error(f"Redis DELETE_MANY error for {len(keys)} keys: {e}")
+            return False
+    
     async def increment(self, key: str, amount: int = 1) -> int:
         """Increment counter in Redis"""
         if not self.is_available():
             return 0
             
         try:
-            return self.client.incr(key, amount)
+            return await self.client_for(key).incr(key, amount)
         except Exception as e:
             logger.error(f"Redis INCREMENT error for key {key}: {e}")
             return 0
+    
+    async def publish(self, channel: str, message: str) -> Optional[int]:
+        """Publish a message on a pub/sub channel; returns the receiver count, or None if it wasn't sent"""
+        if not self.is_available():
+            return None
+            
+        try:
+            return await self.client.publish(channel, message)
+        except Exception as e:
+            logger.error(f"Redis PUBLISH error for channel {channel}: {e}")
+            return None
+    
+    async def publish_many(self, channel: str, messages: List[str]) -> bool:
+        """Publish several messages on a channel in one pipelined round trip"""
+        if not self.is_available() or not messages:
+            return False
+            
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for message in messages:
+                    pipe.publish(channel, message)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Redis PUBLISH_MANY error for channel {channel}: {e}")
+            return False
+    
+    async def mget(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Get several values, one round trip per node"""
+        if not self.is_available() or not keys:
+            return [None] * len(keys)
+            
+        try:
+            values = await self.mget_raw(keys)
+            return [json.loads(v) if v else None for v in values]
+        except Exception as e:
+            logger.error(f"Redis MGET error for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+    
+    async def mget_raw(self, keys: List[str]) -> List[Optional[str]]:
+        """Undecoded MGET split per node; results follow the order of keys"""
+        groups = self.group_keys(keys)
+        results = await asyncio.gather(*(client.mget(node_keys) for client, node_keys in groups.items()))
+        values = {}
+        for node_keys, node_values in zip(groups.values(), results):
+            values.update(zip(node_keys, node_values))
+        return [values[key] for key in keys]
+    
+    async def set_many(
+        self,
+        items: Dict[str, Dict[str, Any]],
+        ttl: int = None,
+        ttls: Optional[Dict[str, int]] = None
+    ) -> bool:
+        """Set several values with TTL, one pipeline per node; ttls overrides ttl per key"""
+        if not self.is_available() or not items:
+            return False
+            
+        try:
+            ttl = ttl or settings.cache_ttl
+            
+            async def run(client, keys):
+                async with client.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        key_ttl = ttls.get(key, ttl) if ttls else ttl
+                        pipe.setex(key, key_ttl, json.dumps(items[key], default=str))
+                    await pipe.execute()
+            
+            await asyncio.gather(*(run(client, keys) for client, keys in self.group_keys(list(items)).items()))
+            return True
+        except Exception as e:
+            logger.error(f"Redis SET_MANY error for {len(items)} keys: {e}")
+            return False
+    
+    async def incr_many(self, amounts: Dict[str, int]) -> Dict[str, int]:
+        """Increment several counters, one pipeline per node"""
+        if not self.is_available() or not amounts:
+            return {}
+            
+        try:
+            async def run(client, keys):
+                async with client.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.incrby(key, amounts[key])
+                    return dict(zip(keys, await pipe.execute()))
+            
+            results = {}
+            for node_results in await asyncio.gather(*(run(client, keys) for client, keys in self.group_keys(list(amounts)).items())):
+                results.update(node_results)
+            return results
+        except Exception as e:
+            logger.error(f"Redis INCR_MANY error for {len(amounts)} keys: {e}")
+            return {}
 
 # Create singleton instance
 redis_service = RedisService()
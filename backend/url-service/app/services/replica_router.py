@@ -0,0 +1,185 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Any, AsyncIterator
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.database import async_engine, replica_engines, ReplicaSessionLocals
+from app.services.redis_service import redis_service
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+WRITE_LSN_KEY = "db:lsn:{}"
+
+REPLICA_STATUS_SQL = text("""
+    SELECT pg_last_wal_replay_lsn()::text,
+           CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+           END
+""")
+
+def parse_lsn(lsn: Optional[str]) -> int:
+    """'16/B374D848' -> a comparable integer WAL position"""
+    if not lsn:
+        return 0
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+class Replica:
+    def __init__(self, name: str, sessionmaker: async_sessionmaker):
+        self.name = name
+        self.sessionmaker = sessionmaker
+        self.healthy = False
+        self.replay_lsn = 0
+        self.lag_seconds: Optional[float] = None
+        self.lag_bytes: Optional[int] = None
+        self.checked_at: Optional[float] = None
+
+    def usable(self, min_lsn: int = 0) -> bool:
+        return (
+            self.healthy
+            and self.lag_seconds is not None
+            and self.lag_seconds <= settings.replica_max_lag
+            and self.replay_lsn >= min_lsn
+        )
+
+class ReplicaRouter:
+    """Routes read-only sessions to read replicas, falling back to the primary.
+
+    A background check records each replica's replay LSN and lag. Writes
+    remember the primary's WAL position per short code in Redis for a short
+    while; reads of that code only go to a replica that has replayed at
+    least that far, so a client always sees its own writes.
+    """
+
+    def __init__(self, replicas: List[Replica]):
+        self.replicas = replicas
+        self._next = itertools.cycle(replicas) if replicas else None
+        self._task = None
+        self.primary_lsn = 0
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.sticky_reads = 0  # sent to the primary because replicas hadn't caught up with a write
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    async def record_write(self, keys: List[str]):
+        """Remember the primary's WAL position for keys just committed to it"""
+        if not self.enabled or not keys:
+            return
+        try:
+            # Any later read of the current position covers writes already committed
+            async with async_engine.connect() as conn:
+                lsn = parse_lsn(await conn.scalar(text("SELECT pg_current_wal_lsn()::text")))
+            await redis_service.set_many(
+                {WRITE_LSN_KEY.format(key): {"lsn": lsn} for key in keys},
+                ttl=settings.replica_sticky_ttl
+            )
+        except Exception as e:
+            logger.error(f"Failed to record write LSN for {len(keys)} keys: {e}")
+
+    @asynccontextmanager
+    async def read_session(self, primary: AsyncSession, key: Optional[str] = None) -> AsyncIterator[AsyncSession]:
+        """A replica session for a read-only query, or primary if no replica qualifies"""
+        # Replicas mirror the primary database only, not other URL partitions
+        replica = await self._pick(key) if primary.bind is async_engine else None
+        if replica is None:
+            self.primary_reads += 1
+            yield primary
+            return
+
+        self.replica_reads += 1
+        async with replica.sessionmaker() as db:
+            yield db
+
+    async def _pick(self, key: Optional[str]) -> Optional[Replica]:
+        if not self.enabled:
+            return None
+
+        min_lsn = 0
+        if key is not None:
+            written = await redis_service.get(WRITE_LSN_KEY.format(key))
+            if written:
+                min_lsn = written["lsn"]
+
+        for _ in range(len(self.replicas)):
+            replica = next(self._next)
+            if replica.usable(min_lsn):
+                return replica
+        if min_lsn and any(replica.usable() for replica in self.replicas):
+            self.sticky_reads += 1
+        return None
+
+    def start(self):
+        if self._task is None and self.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def check(self):
+        """Refresh replay LSN and lag for every replica"""
+        try:
+            async with async_engine.connect() as conn:
+                self.primary_lsn = parse_lsn(await conn.scalar(text("SELECT pg_current_wal_lsn()::text")))
+        except Exception as e:
+            logger.error(f"Primary WAL position check failed: {e}")
+        await asyncio.gather(*(self._check_replica(replica) for replica in self.replicas))
+
+    async def _check_replica(self, replica: Replica):
+        try:
+            async with replica.sessionmaker() as db:
+                replay_lsn, lag = (await db.execute(REPLICA_STATUS_SQL)).one()
+            replica.replay_lsn = parse_lsn(replay_lsn)
+            replica.lag_seconds = float(lag) if lag is not None else None
+            replica.lag_bytes = max(self.primary_lsn - replica.replay_lsn, 0) if self.primary_lsn else None
+            replica.healthy = replay_lsn is not None  # NULL when the server isn't in recovery
+        except Exception as e:
+            if replica.healthy:
+                logger.warning(f"Read replica {replica.name} is unavailable: {e}")
+            replica.healthy = False
+        replica.checked_at = time.time()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Replica lag check failed: {e}")
+            await asyncio.sleep(settings.replica_check_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lag_seconds": replica.lag_seconds,
+                    "lag_bytes": replica.lag_bytes,
+                    "checked_at": replica.checked_at,
+                }
+                for replica in self.replicas
+            ],
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+        }
+
+# Create singleton instance
+replica_router = ReplicaRouter([
+    Replica(replica_engine.url.render_as_string(hide_password=True), sessionmaker)
+    for replica_engine, sessionmaker in zip(replica_engines, ReplicaSessionLocals)
+])
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import logging
+import math
+import time
+import zlib
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+from app.services.redis_service import redis_service
+from app.services.local_cache import local_url_cache
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+LEGACY_KEY_PREFIX = "url:"
+BUCKET_KEY_PREFIX = "urlh:"
+# Suffix on a bucket value's load time when the entry expires with its link
+LINK_EXPIRY_MARK = "L"
+
+def build_cache_entry(
+    original_url: str,
+    click_count: int,
+    is_active: bool,
+    load_time: float = 0.0,
+    link_expires_at: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Cached view of a short code mapping; an expiring link's entry never outlives the link"""
+    expires_at = time.time() + settings.cache_ttl
+    entry = {
+        "original_url": original_url,
+        "click_count": click_count,
+        "is_active": is_active,
+        # Used as the Redis TTL and for probabilistic early refresh
+        "expires_at": expires_at,
+        "load_time": load_time
+    }
+    if link_expires_at is not None and link_expires_at.timestamp() <= expires_at:
+        # The link itself ends here; reloading early would only fetch the same expiry
+        entry["expires_at"] = link_expires_at.timestamp()
+        entry["link_expiry"] = True
+    return entry
+
+def entry_ttl(entry: Dict[str, Any]) -> int:
+    """Seconds an entry may stay cached; 0 once it has expired"""
+    return max(math.ceil(entry["expires_at"] - time.time()), 0)
+
+def cache_locally(short_code: str, entry: Dict[str, Any]):
+    """Keep an active mapping in the in-process cache, never past its entry's expiry"""
+    remaining = entry["expires_at"] - time.time()
+    if entry.get("is_active") and remaining > 0:
+        local_url_cache.set(short_code, entry["original_url"], ttl=min(settings.local_cache_ttl, remaining))
+
+class KeyValueURLCache:
+    """One url:{code} key per mapping holding a JSON entry (the original layout)"""
+    
+    async def get(self, short_code: str) -> Optional[Dict[str, Any]]:
+        return await redis_service.get(f"{LEGACY_KEY_PREFIX}{short_code}")
+    
+    async def set(self, short_code: str, entry: Dict[str, Any]) -> bool:
+        return await self.set_many({short_code: entry})
+    
+    async def set_many(self, entries: Dict[str, Dict[str, Any]]) -> bool:
+        ttls = {f"{LEGACY_KEY_PREFIX}{short_code}": entry_ttl(entry) for short_code, entry in entries.items()}
+        return await redis_service.set_many(
+            {
+                f"{LEGACY_KEY_PREFIX}{short_code}": entry
+                for short_code, entry in entries.items()
+                if ttls[f"{LEGACY_KEY_PREFIX}{short_code}"] > 0
+            },
+            ttls=ttls
+        )
+    
+    async def delete(self, short_code: str) -> bool:
+        return await redis_service.delete(f"{LEGACY_KEY_PREFIX}{short_code}")
+    
+    async def delete_many(self, short_codes: List[str]) -> bool:
+        return await redis_service.delete_many([f"{LEGACY_KEY_PREFIX}{short_code}" for short_code in short_codes])
+    
+    async def check_server_config(self):
+        pass
+
+class HashBucketURLCache:
+    """Mappings packed into small Redis hashes so Redis can keep them listpack-encoded.
+    
+    A code lives in field {code} of urlh:{crc32(code) % buckets}. Pick the
+    bucket count so buckets stay under the server's hash-max-listpack-entries
+    (128 by default). Values are plain strings "{expires_at}|{load_time_ms}|{url}",
+    with "L" after load_time_ms when expires_at is the link's own expiry;
+    only active mappings are stored. A bucket holding any value longer than
+    hash-max-listpack-value (64 bytes by default, shorter than most URLs)
+    is converted to a full hashtable, so the server needs that raised to
+    CACHE_HASH_MAX_VALUE (512 in docker-compose); check_server_config warns
+    at startup when it isn't.
+    
+    Redis cannot expire single hash fields, so expiry is checked on read and
+    expired fields are deleted when found. The bucket key's TTL is set only
+    when the bucket is created, never renewed, so even a busy bucket is
+    dropped, with any fields nobody read again, within cache_ttl.
+    
+    With dual_read enabled, a miss falls back to the legacy url:{code} key
+    and moves the entry over, so the layouts can be switched without a cold
+    cache.
+    """
+    
+    def __init__(self, buckets: int, dual_read: bool = False):
+        self.buckets = buckets
+        self.dual_read = dual_read
+    
+    def bucket_key(self, short_code: str) -> str:
+        return f"{BUCKET_KEY_PREFIX}{zlib.crc32(short_code.encode()) % self.buckets}"
+    
+    @staticmethod
+    def encode(entry: Dict[str, Any]) -> str:
+        load_time = f"{int(entry.get('load_time', 0.0) * 1000)}{LINK_EXPIRY_MARK if entry.get('link_expiry') else ''}"
+        return f"{int(entry['expires_at'])}|{load_time}|{entry['original_url']}"
+    
+    @staticmethod
+    def decode(value: str) -> Optional[Dict[str, Any]]:
+        expires_at, load_time_ms, original_url = value.split("|", 2)
+        if int(expires_at) <= time.time():
+            return None
+        entry = {
+            "original_url": original_url,
+            "is_active": True,
+            "expires_at": int(expires_at),
+            "load_time": int(load_time_ms.rstrip(LINK_EXPIRY_MARK)) / 1000
+        }
+        if load_time_ms.endswith(LINK_EXPIRY_MARK):
+            entry["link_expiry"] = True
+        return entry
+    
+    async def get(self, short_code: str) -> Optional[Dict[str, Any]]:
+        if not redis_service.is_available():
+            return None
+        
+        try:
+            key = self.bucket_key(short_code)
+            client = redis_service.client_for(key)
+            value = await client.hget(key, short_code)
+            if value:
+                entry = self.decode(value)
+                if entry is None:
+                    await client.hdel(key, short_code)
+                return entry
+        except Exception as e:
+            logger.error(f"Redis HGET error for code {short_code}: {e}")
+            return None
+        
+        if self.dual_read:
+            entry = await redis_service.get(f"{LEGACY_KEY_PREFIX}{short_code}")
+            if entry and entry.get("is_active"):
+                entry.setdefault("expires_at", time.time() + settings.cache_ttl)
+                await self.set(short_code, entry)
+                await redis_service.delete(f"{LEGACY_KEY_PREFIX}{short_code}")
+                return entry
+        return None
+    
+    async def set(self, short_code: str, entry: Dict[str, Any]) -> bool:
+        return await self.set_many({short_code: entry})
+    
+    async def set_many(self, entries: Dict[str, Dict[str, Any]]) -> bool:
+        if not redis_service.is_available() or not entries:
+            return False
+        
+        buckets: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for short_code, entry in entries.items():
+            buckets.setdefault(self.bucket_key(short_code), {})[short_code] = entry
+        
+        async def run(client, keys):
+            async with client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    for short_code, entry in buckets[key].items():
+                        if entry.get("is_active") and entry_ttl(entry) > 0:
+                            pipe.hset(key, short_code, self.encode(entry))
+                        else:
+                            pipe.hdel(key, short_code)
+                    # Only a new bucket gets a TTL; renewing it on every write would keep busy buckets forever
+                    pipe.expire(key, settings.cache_ttl, nx=True)
+                await pipe.execute()
+        
+        try:
+            # One pipeline per Redis node
+            await asyncio.gather(*(run(client, keys) for client, keys in redis_service.group_keys(list(buckets)).items()))
+            return True
+        except Exception as e:
+            logger.error(f"Redis HSET error for {len(entries)} codes: {e}")
+            return False
+    
+    async def check_server_config(self):
+        """Warn when the Redis nodes would convert buckets with ordinary URLs out of listpack encoding"""
+        for url, client in redis_service.nodes.items():
+            try:
+                config = await client.config_get("hash-max-listpack-value")
+            except Exception as e:
+                # Managed Redis often disables CONFIG
+                logger.info(f"Could not read hash-max-listpack-value from {url}: {e}")
+                continue
+            limit = int(config.get("hash-max-listpack-value", 0))
+            if limit < settings.cache_hash_max_value:
+                logger.warning(
+                    f"Redis {url} has hash-max-listpack-value {limit}; cache buckets holding longer "
+                    f"values lose their compact encoding. Set it to at least {settings.cache_hash_max_value}"
+                )
+    
+    async def delete(self, short_code: str) -> bool:
+        if not redis_service.is_available():
+            return False
+        
+        try:
+            key = self.bucket_key(short_code)
+            await redis_service.client_for(key).hdel(key, short_code)
+            # Also clear the legacy key in case it hasn't been migrated yet
+            await redis_service.delete(f"{LEGACY_KEY_PREFIX}{short_code}")
+            return True
+        except Exception as e:
+            logger.error(f"Redis HDEL error for code {short_code}: {e}")
+            return False
+    
+    async def delete_many(self, short_codes: List[str]) -> bool:
+        """Drop several codes, one pipeline per Redis node"""
+        if not redis_service.is_available() or not short_codes:
+            return False
+        
+        buckets: Dict[str, List[str]] = {}
+        for short_code in short_codes:
+            buckets.setdefault(self.bucket_key(short_code), []).append(short_code)
+        
+        async def run(client, keys):
+            async with client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hdel(key, *buckets[key])
+                await pipe.execute()
+        
+        try:
+            await asyncio.gather(*(run(client, keys) for client, keys in redis_service.group_keys(list(buckets)).items()))
+            # Also clear legacy keys that haven't been migrated yet
+            await redis_service.delete_many([f"{LEGACY_KEY_PREFIX}{short_code}" for short_code in short_codes])
+            return True
+        except Exception as e:
+            logger.error(f"Redis HDEL error for {len(short_codes)} codes: {e}")
+            return False
+    
+    async def migrate_legacy_keys(self, batch_size: int = 1000) -> int:
+        """Move every url:{code} JSON key into its bucket; returns the number moved"""
+        moved = 0
+        for client in list(redis_service.nodes.values()):
+            batch: List[str] = []
+            async for key in client.scan_iter(match=f"{LEGACY_KEY_PREFIX}*", count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    moved += await self._migrate_batch(client, batch)
+                    batch = []
+            if batch:
+                moved += await self._migrate_batch(client, batch)
+        return moved
+    
+    async def _migrate_batch(self, client, keys: List[str]) -> int:
+        entries = {}
+        for key, value in zip(keys, await client.mget(keys)):
+            if not value:
+                continue
+            entry = json.loads(value)
+            if entry.get("is_active"):
+                entry.setdefault("expires_at", time.time() + settings.cache_ttl)
+                entries[key[len(LEGACY_KEY_PREFIX):]] = entry
+        if entries:
+            await self.set_many(entries)
+        await client.delete(*keys)
+        return len(entries)
+
+def create_url_cache():
+    if settings.cache_layout == "hash":
+        return HashBucketURLCache(settings.cache_hash_buckets, settings.cache_dual_read)
+    if settings.cache_layout == "keys":
+        return KeyValueURLCache()
+    raise ValueError(f"Unknown cache layout: {settings.cache_layout}")
+
+# Create singleton instance
+url_cache = create_url_cache()
+
+if __name__ == "__main__":
+    # One-off migration: python -m app.services.url_cache
+    async def main():
+        store = HashBucketURLCache(settings.cache_hash_buckets)
+        moved = await store.migrate_legacy_keys()
+        logger.info(f"Migrated {moved} cache entries to hash buckets")
+        await redis_service.close()
+    
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+import zlib
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager, AsyncExitStack
+from typing import Optional, List, Dict, Iterable, AsyncIterator
+from sqlalchemy import text, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, async_sessionmaker
+from app.database import async_engine, partition_engines, PartitionSessionLocals
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# First key of the two-key advisory locks taken by lock_url_hashes
+URL_HASH_LOCK_NAMESPACE = 0x75726C68  # "urlh"
+
+class URLPartitions:
+    """Spreads urls rows over N databases by a hash of short_code.
+    
+    Every read or write of a single code goes to its owning partition; scans
+    (listing, export, warm-up) visit each partition and merge the results.
+    A custom code always hashes to the same partition, so short_code stays
+    globally unique. The partition count is fixed: changing it moves rows.
+    
+    The partial unique index on url_hash only covers one partition, so with
+    several of them creates of the same URL are serialized by lock_url_hashes
+    instead.
+    """
+    
+    def __init__(self, engines: List[AsyncEngine], sessionmakers: List[async_sessionmaker]):
+        self.engines = engines
+        self.sessionmakers = sessionmakers
+    
+    @property
+    def count(self) -> int:
+        return len(self.engines)
+    
+    def index_for(self, short_code: str) -> int:
+        if self.count == 1:
+            return 0
+        return zlib.crc32(short_code.encode()) % self.count
+    
+    def group(self, short_codes: Iterable[str]) -> Dict[int, List[str]]:
+        """Split codes by owning partition"""
+        groups: Dict[int, List[str]] = defaultdict(list)
+        for short_code in short_codes:
+            groups[self.index_for(short_code)].append(short_code)
+        return dict(groups)
+    
+    @asynccontextmanager
+    async def session(self, index: int, default: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+        """Session on partition index; reuses default when it is already bound there"""
+        if default is not None and default.bind is self.engines[index]:
+            yield default
+            return
+        async with self.sessionmakers[index]() as db:
+            yield db
+    
+    def session_for(self, short_code: str, default: Optional[AsyncSession] = None):
+        """Session on the partition that owns short_code"""
+        return self.session(self.index_for(short_code), default)
+    
+    @asynccontextmanager
+    async def lock_url_hashes(self, digests: Iterable[bytes]) -> AsyncIterator[None]:
+        """Hold transaction-scoped advisory locks for these URL hashes while the block runs.
+        
+        Hashes map onto url_hash_lock_stripes locks, each living on one
+        partition; they are taken partition by partition in ascending order
+        so concurrent callers can't deadlock. A no-op with a single partition,
+        where the unique index already rejects a second active row.
+        """
+        if self.count == 1:
+            yield
+            return
+        
+        stripes: Dict[int, set] = defaultdict(set)
+        for digest in digests:
+            stripe = int.from_bytes(digest[:4], "big") % settings.url_hash_lock_stripes
+            stripes[stripe % self.count].add(stripe)
+        
+        async with AsyncExitStack() as stack:
+            for index in sorted(stripes):
+                db = await stack.enter_async_context(self.sessionmakers[index]())
+                # unnest keeps the sorted array's order
+                await db.execute(
+                    text("SELECT pg_advisory_xact_lock(:namespace, stripe) FROM unnest(:stripes) AS stripe")
+                    .bindparams(bindparam("stripes", type_=ARRAY(Integer))),
+                    {"namespace": URL_HASH_LOCK_NAMESPACE, "stripes": sorted(stripes[index])}
+                )
+            # Leaving the sessions rolls their transactions back, releasing the locks
+            yield
+    
+    async def dispose(self):
+        for engine in self.engines:
+            if engine is not async_engine:
+                await engine.dispose()
+
+# Create singleton instance
+url_partitions = URLPartitions(partition_engines, PartitionSessionLocals)
@@ -1,138 +1,642 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import Optional, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, true, false, tuple_, or_, func, union_all, exists
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from pydantic import ValidationError
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
+import asyncio
+import csv
+import io
+import json
 import logging
+import math
+import random
+import time
 from app.models.url_model import URL
-from app.schemas.url_schema import URLCreate
-from app.utils.helpers import generate_short_code, validate_custom_code
-from app.services.redis_service import redis_service
+from app.schemas.url_schema import (
+    URLCreate, URLStats, URLPage, URLBatchItemResult, URLBatchResponse
+)
+from app.utils.helpers import validate_custom_code, url_hash, encode_cursor, decode_cursor, merge_sorted
+from app.services.url_cache import url_cache, build_cache_entry, cache_locally
+from app.services.local_cache import local_url_cache, negative_url_cache, cache_invalidation
+from app.services.bloom_filter import short_code_filter
+from app.services.click_counter import click_counter
+from app.services.code_allocator import code_allocator
+from app.services.single_flight import SingleFlight
+from app.services.replica_router import replica_router
+from app.services.url_partitions import url_partitions
+from app.database import AsyncSessionLocal
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Columns read for listing and export; plain rows avoid building ORM objects
+LISTING_COLUMNS = (URL.short_code, URL.original_url, URL.click_count, URL.created_at, URL.is_active, URL.expires_at)
+EXPORT_FIELDS = ("short_code", "original_url", "click_count", "created_at", "is_active")
+EXPORT_FORMATS = ("ndjson", "csv")
+
+# Unique indexes an insert into urls can violate
+SHORT_CODE_INDEX = "ix_urls_short_code"
+URL_HASH_INDEX = "uq_urls_active_url_hash"
+
+# Coalesces concurrent database loads of the same short code on this instance
+url_loads = SingleFlight()
+_refresh_tasks = set()
+
 class URLService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
     async def create_short_url(self, url_data: URLCreate) -> URL:
-        """Create a new short URL"""
+        """Create a new short URL, or return the active one for the same canonical URL.
+        
+        With several partitions the cross-partition lookup and the insert run
+        under the URL hash's advisory lock, so concurrent creates of one URL
+        can't each insert an active row on a different partition.
+        """
         original_url = str(url_data.original_url)
+        expires_at = url_data.expires_at
+        digest = url_hash(original_url, expires_at)
         
-        # Check if URL already exists and is active
-        existing_url = self.db.query(URL).filter(
-            URL.original_url == original_url,
-            URL.is_active == True
-        ).first()
-        
-        if existing_url:
-            logger.info(f"URL already exists: {existing_url.short_code}")
-            return existing_url
-        
-        # Handle custom code
-        if url_data.custom_code:
-            if not validate_custom_code(
-                url_data.custom_code, 
-                settings.min_custom_code_length, 
-                settings.max_custom_code_length
-            ):
-                raise ValueError("Invalid custom code format")
+        async with url_partitions.lock_url_hashes([digest]):
+            # Each partition only dedups its own rows; look across all of them first
+            if url_partitions.count > 1:
+                existing = await self._find_active_url(digest)
+                if existing:
+                    logger.info(f"URL already exists: {existing.short_code}")
+                    return existing
             
-            # Check if custom code already exists
-            if self.db.query(URL).filter(URL.short_code == url_data.custom_code).first():
-                raise ValueError("Custom code already exists")
+            # Handle custom code
+            if url_data.custom_code:
+                if not validate_custom_code(
+                    url_data.custom_code, 
+                    settings.min_custom_code_length, 
+                    settings.max_custom_code_length
+                ):
+                    raise ValueError("Invalid custom code format")
             
-            short_code = url_data.custom_code
-        else:
-            # Generate unique short code
-            short_code = self._generate_unique_short_code()
+                # The unique index on short_code rejects codes that already exist
+                short_code = url_data.custom_code
+                upserted = await self._upsert_url(original_url, short_code, expires_at)
+                if not upserted:
+                    raise ValueError("Custom code already exists")
+            else:
+                # Allocated codes are unique by construction; a conflict only happens
+                # against custom or legacy random codes, so just take the next ID
+                upserted = None
+                for _ in range(settings.max_code_allocation_attempts):
+                    short_code = await code_allocator.next_code()
+                    upserted = await self._upsert_url(original_url, short_code, expires_at)
+                    if upserted:
+                        break
+                    logger.warning(f"Allocated short code {short_code} is already taken")
+                if not upserted:
+                    raise RuntimeError("Could not allocate a unique short code")
         
-        # Create new URL entry
-        db_url = URL(
-            original_url=original_url,
-            short_code=short_code
-        )
+        db_url, inserted = upserted
+        if not inserted:
+            logger.info(f"URL already exists: {db_url.short_code}")
+            return db_url
         
-        self.db.add(db_url)
-        self.db.commit()
-        self.db.refresh(db_url)
-        
-        # Cache the mapping
+        # Reads of this code must not hit a replica that hasn't seen the insert
+        await replica_router.record_write([short_code])
+        # Drop any stale copies held by other instances, then cache the mapping
+        await cache_invalidation.publish(short_code)
         await self._cache_url_data(db_url)
         
         logger.info(f"Created short URL: {short_code} -> {original_url}")
         return db_url
     
+    async def create_short_urls_bulk(self, items: List[Dict[str, Any]]) -> URLBatchResponse:
+        """Create many short URLs with multi-row INSERT ... ON CONFLICT statements.
+        
+        Follows the same rules as create_short_url: an active mapping for the
+        same URL is reused, and custom codes must not already exist.
+        """
+        if len(items) > settings.max_batch_size:
+            raise ValueError(f"Batch exceeds the maximum of {settings.max_batch_size} URLs")
+        
+        results: List[Optional[URLBatchItemResult]] = [None] * len(items)
+        
+        # Validate every item on its own
+        valid: Dict[int, URLCreate] = {}
+        for index, item in enumerate(items):
+            try:
+                url_data = URLCreate.model_validate(item)
+            except ValidationError as e:
+                raw_url = item.get("original_url") if isinstance(item, dict) else None
+                results[index] = URLBatchItemResult(
+                    index=index,
+                    original_url=str(raw_url) if raw_url is not None else None,
+                    status="error",
+                    error=e.errors()[0]["msg"]
+                )
+                continue
+            if url_data.custom_code and not validate_custom_code(
+                url_data.custom_code,
+                settings.min_custom_code_length,
+                settings.max_custom_code_length
+            ):
+                results[index] = self._batch_result(index, str(url_data.original_url), error="Invalid custom code format")
+                continue
+            valid[index] = url_data
+        
+        # Reuse active mappings in one hash-index lookup per chunk
+        digests = {
+            index: url_hash(str(url_data.original_url), url_data.expires_at)
+            for index, url_data in valid.items()
+        }
+        # Held until every row is committed, so a concurrent create can't add the same URL elsewhere
+        async with url_partitions.lock_url_hashes(digests.values()):
+            existing = await self._find_active_codes(set(digests.values()))
+            
+            # URLs are grouped by canonical hash; the first occurrence decides the custom code
+            indices_by_hash: Dict[bytes, List[int]] = defaultdict(list)
+            first_seen: Dict[bytes, URLCreate] = {}
+            for index, url_data in valid.items():
+                digest = digests[index]
+                if digest in existing:
+                    results[index] = self._batch_result(index, str(url_data.original_url), existing[digest], "existing")
+                    continue
+                first_seen.setdefault(digest, url_data)
+                indices_by_hash[digest].append(index)
+            
+            codes_by_hash: Dict[bytes, str] = {}
+            created: Dict[bytes, Dict[str, Any]] = {}
+            errors: Dict[bytes, str] = {}
+            
+            async def insert_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+                """Insert rows; returns the ones that hit a taken short code"""
+                inserted = await self._insert_many(rows)
+                conflicts = []
+                for row in rows:
+                    if row["short_code"] in inserted:
+                        created[row["url_hash"]] = inserted[row["short_code"]]
+                        codes_by_hash[row["url_hash"]] = row["short_code"]
+                    else:
+                        conflicts.append(row)
+                # A conflict can also be the same URL created concurrently
+                raced = await self._find_active_codes({row["url_hash"] for row in conflicts})
+                codes_by_hash.update(raced)
+                return [row for row in conflicts if row["url_hash"] not in raced]
+            
+            # Custom codes: a conflict means the code is taken
+            rows = []
+            taken_in_batch = set()
+            for digest, url_data in first_seen.items():
+                if not url_data.custom_code:
+                    continue
+                if url_data.custom_code in taken_in_batch:
+                    errors[digest] = "Custom code already exists"
+                    continue
+                taken_in_batch.add(url_data.custom_code)
+                rows.append({
+                    "original_url": str(url_data.original_url),
+                    "url_hash": digest,
+                    "short_code": url_data.custom_code,
+                    "expires_at": url_data.expires_at
+                })
+            for row in await insert_rows(rows):
+                errors[row["url_hash"]] = "Custom code already exists"
+            
+            # Allocated codes: a conflict only happens against custom or legacy codes, so retry with new IDs
+            remaining = [digest for digest, url_data in first_seen.items() if not url_data.custom_code]
+            for _ in range(settings.max_code_allocation_attempts):
+                if not remaining:
+                    break
+                codes = await code_allocator.next_codes(len(remaining))
+                rows = [
+                    {
+                        "original_url": str(first_seen[digest].original_url),
+                        "url_hash": digest,
+                        "short_code": code,
+                        "expires_at": first_seen[digest].expires_at
+                    }
+                    for digest, code in zip(remaining, codes)
+                ]
+                remaining = [row["url_hash"] for row in await insert_rows(rows)]
+            for digest in remaining:
+                errors[digest] = "Could not allocate a unique short code"
+        
+        for digest, indices in indices_by_hash.items():
+            for position, index in enumerate(indices):
+                original_url = str(valid[index].original_url)
+                if digest in codes_by_hash:
+                    status = "created" if digest in created and position == 0 else "existing"
+                    results[index] = self._batch_result(index, original_url, codes_by_hash[digest], status)
+                else:
+                    results[index] = self._batch_result(index, original_url, error=errors[digest])
+        
+        # Fill caches with one pipeline per layer
+        new_codes = [row["short_code"] for row in created.values()]
+        await replica_router.record_write(new_codes)
+        await cache_invalidation.publish_many(new_codes)
+        entries = {
+            row["short_code"]: build_cache_entry(row["original_url"], 0, True, link_expires_at=row["expires_at"])
+            for row in created.values()
+        }
+        await url_cache.set_many(entries)
+        for short_code, entry in entries.items():
+            cache_locally(short_code, entry)
+        
+        logger.info(f"Bulk created {len(created)} short URLs from a batch of {len(items)}")
+        return URLBatchResponse(
+            created=sum(1 for r in results if r.status == "created"),
+            existing=sum(1 for r in results if r.status == "existing"),
+            failed=sum(1 for r in results if r.status == "error"),
+            results=results
+        )
+    
     async def get_original_url(self, short_code: str) -> Optional[str]:
         """Get original URL by short code and increment click count"""
-        # Try cache first
-        cached_data = await redis_service.get(f"url:{short_code}")
+        # Try in-process cache first
+        original_url = local_url_cache.get(short_code)
+        if original_url:
+            await self._increment_click_count(short_code)
+            return original_url
+        
+        # Reject codes that can't exist before touching Redis or the database
+        if not self._is_plausible_code(short_code) or negative_url_cache.get(short_code):
+            return None
+        
+        # Once built, the filter answers for codes that were never created without a Redis round trip
+        if not short_code_filter.might_exist(short_code):
+            negative_url_cache.set(short_code, True)
+            return None
+        
+        # Then the shared Redis cache
+        cached_data = await url_cache.get(short_code)
         if cached_data and cached_data.get("is_active"):
+            cache_locally(short_code, cached_data)
+            # Refresh hot entries shortly before they expire so they never all miss at once
+            if self._should_refresh_early(cached_data):
+                self._schedule_refresh(short_code)
             # Increment click count
             await self._increment_click_count(short_code)
             return cached_data["original_url"]
         
-        # Fallback to database
-        db_url = self.db.query(URL).filter(
-            URL.short_code == short_code,
-            URL.is_active == True
-        ).first()
+        # Fallback to database, one load per code per instance
+        loaded = await url_loads.do(short_code, lambda: self._load_and_cache(self.db, short_code))
+        if not loaded:
+            return None
+        
+        # Increment click count
+        await self._increment_click_count(short_code)
         
+        return loaded["original_url"]
+    
+    async def get_url_stats(self, short_code: str) -> Optional[URLStats]:
+        """Get URL statistics, including clicks not yet flushed to the database"""
+        async with url_partitions.session_for(short_code, self.db) as partition_db:
+            async with replica_router.read_session(partition_db, short_code) as db:
+                db_url = await db.scalar(select(URL).where(URL.short_code == short_code))
         if not db_url:
             return None
         
-        # Update cache
-        await self._cache_url_data(db_url)
+        pending = await click_counter.pending(short_code)
+        return self._to_stats(db_url, pending)
+    
+    async def list_urls(self, limit: int = 100, cursor: Optional[str] = None, skip: int = 0) -> URLPage:
+        """List URLs newest first, keyset-paginated on (created_at, id, partition) (for admin purposes).
         
-        # Increment click count
-        await self._increment_click_count(short_code)
+        skip is the deprecated offset form; it reads and discards that many
+        rows from every partition, so it can't be combined with a cursor.
+        """
+        if skip and cursor:
+            raise ValueError("skip is deprecated and can't be combined with cursor; follow next_cursor instead")
+        position = decode_cursor(cursor) if cursor else None
         
-        return db_url.original_url
+        # One extra row per partition tells whether another page exists
+        pages = await asyncio.gather(*(
+            self._list_partition(index, skip + limit + 1, position)
+            for index in range(url_partitions.count)
+        ))
+        rows = sorted(
+            ((row, index) for index, page in enumerate(pages) for row in page),
+            key=lambda tagged: (tagged[0].created_at, tagged[0].id, tagged[1]),
+            reverse=True
+        )[skip:]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last, last_index = rows[-1]
+            next_cursor = encode_cursor(last.created_at, last.id, last_index)
+        
+        rows = [row for row, _ in rows]
+        pending = await click_counter.pending_many([row.short_code for row in rows])
+        return URLPage(
+            items=[self._to_stats(row, pending[row.short_code]) for row in rows],
+            next_cursor=next_cursor
+        )
+    
+    async def _list_partition(self, index: int, limit: int, position: Optional[Tuple]) -> List[Any]:
+        query = select(*LISTING_COLUMNS, URL.id).order_by(URL.created_at.desc(), URL.id.desc())
+        if position:
+            created_at, row_id, cursor_index = position
+            # Rows at the cursor's exact (created_at, id) follow it only on lower partitions
+            if index < cursor_index:
+                query = query.where(tuple_(URL.created_at, URL.id) <= (created_at, row_id))
+            else:
+                query = query.where(tuple_(URL.created_at, URL.id) < (created_at, row_id))
+        
+        async with url_partitions.session(index, self.db) as partition_db:
+            async with replica_router.read_session(partition_db) as db:
+                return (await db.execute(query.limit(limit))).all()
+    
+    async def export_urls(self, export_format: str = "ndjson") -> AsyncIterator[str]:
+        """Stream every URL as NDJSON or CSV through a server-side cursor"""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        
+        if export_format == "csv":
+            yield self._csv_line(EXPORT_FIELDS)
+        
+        async with AsyncExitStack() as stack:
+            streams = []
+            for index in range(url_partitions.count):
+                partition_db = await stack.enter_async_context(url_partitions.session(index, self.db))
+                db = await stack.enter_async_context(replica_router.read_session(partition_db))
+                streams.append(await db.stream(
+                    select(*LISTING_COLUMNS, URL.id)
+                    .order_by(URL.created_at, URL.id)
+                    .execution_options(yield_per=settings.export_chunk_size)
+                ))
+            
+            # One ordered stream across partitions
+            rows = []
+            async for _, row in merge_sorted(streams, key=lambda row: (row.created_at, row.id)):
+                rows.append(row)
+                if len(rows) >= settings.export_chunk_size:
+                    yield await self._export_chunk(rows, export_format)
+                    rows = []
+            if rows:
+                yield await self._export_chunk(rows, export_format)
     
-    def get_url_stats(self, short_code: str) -> Optional[URL]:
-        """Get URL statistics"""
-        return self.db.query(URL).filter(URL.short_code == short_code).first()
+    async def _export_chunk(self, rows: List[Any], export_format: str) -> str:
+        pending = await click_counter.pending_many([row.short_code for row in rows])
+        lines = []
+        for row in rows:
+            values = (
+                row.short_code,
+                row.original_url,
+                row.click_count + pending[row.short_code],
+                row.created_at.isoformat() if row.created_at else None,
+                row.is_active
+            )
+            if export_format == "csv":
+                lines.append(self._csv_line(values))
+            else:
+                lines.append(json.dumps(dict(zip(EXPORT_FIELDS, values))) + "\n")
+        return "".join(lines)
     
-    def deactivate_url(self, short_code: str) -> bool:
+    async def deactivate_url(self, short_code: str) -> bool:
         """Deactivate a URL"""
-        db_url = self.db.query(URL).filter(URL.short_code == short_code).first()
-        if db_url:
+        async with url_partitions.session_for(short_code, self.db) as db:
+            db_url = await db.scalar(select(URL).where(URL.short_code == short_code))
+            if not db_url:
+                return False
             db_url.is_active = False
-            self.db.commit()
-            # Remove from cache
-            redis_service.delete(f"url:{short_code}")
-            logger.info(f"Deactivated URL: {short_code}")
-            return True
-        return False
-    
-    def _generate_unique_short_code(self) -> str:
-        """Generate a unique short code"""
-        max_attempts = 10
-        for _ in range(max_attempts):
-            short_code = generate_short_code(settings.default_short_code_length)
-            if not self.db.query(URL).filter(URL.short_code == short_code).first():
-                return short_code
-        
-        # If we can't find a unique code, increase length
-        return generate_short_code(settings.default_short_code_length + 2)
+            await db.commit()
+        
+        await replica_router.record_write([short_code])
+        # Remove from cache on every instance
+        await url_cache.delete(short_code)
+        await cache_invalidation.publish(short_code)
+        logger.info(f"Deactivated URL: {short_code}")
+        return True
+    
+    async def _upsert_url(
+        self,
+        original_url: str,
+        short_code: str,
+        expires_at: Optional[datetime] = None
+    ) -> Optional[Tuple[URL, bool]]:
+        """Insert a URL row, or fetch the active row with the same URL hash, in one statement.
+        
+        A duplicate create takes no row lock and writes no row version: the
+        insert does nothing on conflict and the same statement selects the
+        existing row. Returns (url, inserted), or None if the short code is
+        already taken; any other constraint violation is raised.
+        """
+        digest = url_hash(original_url, expires_at)
+        inserted = (
+            insert(URL)
+            .values(
+                original_url=original_url,
+                url_hash=digest,
+                short_code=short_code,
+                expires_at=expires_at
+            )
+            .on_conflict_do_nothing(index_elements=[URL.url_hash], index_where=URL.is_active)
+            .returning(*URL.__table__.c)
+            .cte("inserted_url")
+        )
+        existing = select(URL).where(URL.url_hash == digest, URL.is_active)
+        rows = union_all(
+            select(inserted, true().label("inserted")),
+            existing.add_columns(false().label("inserted")).where(~exists(select(inserted.c.id)))
+        ).subquery()
+        stmt = select(aliased(URL, rows), rows.c.inserted)
+        
+        async with url_partitions.session_for(short_code, self.db) as db:
+            for attempt in range(2):
+                try:
+                    result = (await db.execute(stmt)).first()
+                    if result is None:
+                        # The conflicting row committed after this statement's snapshot was
+                        # taken; a new statement gets a new snapshot and sees it
+                        result = (await db.execute(stmt)).one()
+                    await db.commit()
+                    break
+                except IntegrityError as e:
+                    await db.rollback()
+                    constraint = self._violated_constraint(e)
+                    if constraint == SHORT_CODE_INDEX:
+                        return None
+                    # ON CONFLICT covers the URL hash index, so this needs a row it couldn't
+                    # see yet; once more, the select half of the statement finds it
+                    if constraint != URL_HASH_INDEX or attempt:
+                        raise
+                    logger.warning(f"URL hash conflict inserting {short_code}; reading the existing row")
+        db_url, was_inserted = result
+        return db_url, was_inserted
+    
+    @staticmethod
+    def _violated_constraint(error: IntegrityError) -> Optional[str]:
+        """Name of the unique index behind an IntegrityError, if the driver reports it"""
+        # asyncpg's own exception is the cause of the DBAPI adapter's
+        return getattr(error.orig.__cause__, "constraint_name", None)
+    
+    async def _find_active_codes(self, digests: set) -> Dict[bytes, str]:
+        """Map URL hashes to the short code of their active row, searching every partition"""
+        digests = list(digests)
+        if not digests:
+            return {}
+        
+        async def search(index: int) -> Dict[bytes, str]:
+            found: Dict[bytes, str] = {}
+            async with url_partitions.session(index, self.db) as db:
+                for start in range(0, len(digests), settings.batch_insert_chunk_size):
+                    chunk = digests[start:start + settings.batch_insert_chunk_size]
+                    rows = await db.execute(
+                        select(URL.url_hash, URL.short_code).where(
+                            URL.url_hash.in_(chunk),
+                            URL.is_active == True
+                        )
+                    )
+                    for digest, short_code in rows:
+                        found[digest] = short_code
+            return found
+        
+        found: Dict[bytes, str] = {}
+        for partition_found in await asyncio.gather(*(search(index) for index in range(url_partitions.count))):
+            found.update(partition_found)
+        return found
+    
+    async def _find_active_url(self, digest: bytes) -> Optional[URL]:
+        """The active row for a URL hash on any partition"""
+        async def search(index: int) -> Optional[URL]:
+            async with url_partitions.session(index, self.db) as db:
+                return await db.scalar(select(URL).where(URL.url_hash == digest, URL.is_active == True))
+        
+        found = await asyncio.gather(*(search(index) for index in range(url_partitions.count)))
+        return next((url for url in found if url is not None), None)
+    
+    async def _insert_many(self, rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Multi-row insert skipping taken codes and URLs; returns inserted rows keyed by short code.
+        
+        Rows are committed per partition.
+        """
+        by_partition: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            by_partition[url_partitions.index_for(row["short_code"])].append(row)
+        
+        inserted: Dict[str, Dict[str, Any]] = {}
+        for index, partition_rows in by_partition.items():
+            async with url_partitions.session(index, self.db) as db:
+                for start in range(0, len(partition_rows), settings.batch_insert_chunk_size):
+                    chunk = partition_rows[start:start + settings.batch_insert_chunk_size]
+                    result = await db.execute(
+                        insert(URL)
+                        .values(chunk)
+                        .on_conflict_do_nothing()
+                        .returning(URL.id, URL.short_code, URL.original_url, URL.expires_at)
+                    )
+                    for row in result.mappings():
+                        inserted[row["short_code"]] = dict(row)
+                await db.commit()
+        return inserted
+    
+    @staticmethod
+    def _batch_result(
+        index: int,
+        original_url: str,
+        short_code: Optional[str] = None,
+        status: str = "error",
+        error: Optional[str] = None
+    ) -> URLBatchItemResult:
+        return URLBatchItemResult(
+            index=index,
+            original_url=original_url,
+            short_code=short_code,
+            short_url=f"{settings.base_url}/{short_code}" if short_code else None,
+            status=status,
+            error=error
+        )
     
     async def _cache_url_data(self, url: URL):
-        """Cache URL data in Redis"""
-        await redis_service.set(
-            f"url:{url.short_code}",
-            {
-                "original_url": url.original_url,
-                "click_count": url.click_count,
-                "is_active": url.is_active
-            }
+        """Cache URL data in Redis and the in-process cache"""
+        entry = build_cache_entry(
+            url.original_url, url.click_count, url.is_active, link_expires_at=url.expires_at
         )
+        cache_locally(url.short_code, entry)
+        await url_cache.set(url.short_code, entry)
     
-    async def _increment_click_count(self, short_code: str):
-        """Increment click count both in cache and database"""
-        # Increment in database
-        self.db.query(URL).filter(URL.short_code == short_code).update(
-            {URL.click_count: URL.click_count + 1}
+    @staticmethod
+    async def _load_and_cache(db: AsyncSession, short_code: str) -> Optional[Dict[str, Any]]:
+        """Load an active mapping from the database and write it to every cache layer.
+        
+        db may be None (the fast redirect path); a session is then opened for the load only.
+        """
+        started = time.monotonic()
+        async with url_partitions.session_for(short_code, db) as partition_db:
+            async with replica_router.read_session(partition_db, short_code) as read_db:
+                # Expired rows the reaper hasn't reached yet are already gone for redirects
+                row = (await read_db.execute(
+                    select(URL.original_url, URL.click_count, URL.is_active, URL.expires_at).where(
+                        URL.short_code == short_code,
+                        URL.is_active == True,
+                        or_(URL.expires_at.is_(None), URL.expires_at > func.now())
+                    )
+                )).first()
+        
+        if not row:
+            negative_url_cache.set(short_code, True)
+            return None
+        
+        entry = build_cache_entry(
+            row.original_url, row.click_count, row.is_active, time.monotonic() - started, row.expires_at
         )
-        self.db.commit()
+        cache_locally(short_code, entry)
+        await url_cache.set(short_code, entry)
+        return entry
+    
+    @staticmethod
+    def _should_refresh_early(cached_data: Dict[str, Any]) -> bool:
+        """XFetch: refresh with rising probability as expiry approaches, scaled by load cost.
+        
+        Entries that expire with their link are left alone; a reload would
+        return the same expiry, so near the end nearly every hit would load.
+        """
+        expires_at = cached_data.get("expires_at")
+        if expires_at is None or cached_data.get("link_expiry"):
+            return False
+        load_time = max(cached_data.get("load_time", 0.0), settings.cache_refresh_min_load_time)
+        return time.time() - load_time * settings.cache_refresh_beta * math.log(random.random()) >= expires_at
+    
+    @staticmethod
+    def _schedule_refresh(short_code: str):
+        if url_loads.in_flight(short_code):
+            return
         
-        # Increment in cache counter
-        await redis_service.increment(f"clicks:{short_code}")
+        async def refresh():
+            try:
+                async with AsyncSessionLocal() as db:
+                    await url_loads.do(short_code, lambda: URLService._load_and_cache(db, short_code))
+            except Exception as e:
+                logger.warning(f"Early cache refresh failed for {short_code}: {e}")
+        
+        # Keep a reference so the task isn't garbage collected mid-flight
+        task = asyncio.create_task(refresh())
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
+    
+    async def _increment_click_count(self, short_code: str):
+        """Record a click; the database is updated in batches by the click counter"""
+        await click_counter.record(short_code)
+    
+    @staticmethod
+    def _is_plausible_code(short_code: str) -> bool:
+        """Cheap shape check: generated and custom codes share this alphabet"""
+        return validate_custom_code(short_code, settings.min_custom_code_length, URL.short_code.type.length)
+    
+    @staticmethod
+    def _csv_line(values) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(values)
+        return buffer.getvalue()
+    
+    @staticmethod
+    def _to_stats(url, pending_clicks: int = 0) -> URLStats:
+        return URLStats(
+            short_code=url.short_code,
+            original_url=url.original_url,
+            click_count=url.click_count + pending_clicks,
+            created_at=url.created_at,
+            is_active=url.is_active,
+            expires_at=url.expires_at
+        )
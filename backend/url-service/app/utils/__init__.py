@@ -1 +1,4 @@
-from .helpers import generate_short_code, validate_url, validate_custom_code
+from .helpers import (
+    generate_short_code, validate_url, validate_custom_code, encode_short_code, decode_short_code, canonicalize_url, url_hash,
+    encode_cursor, decode_cursor
+)
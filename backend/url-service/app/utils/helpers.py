@@ -1,12 +1,120 @@
 import string
 import random
+import hashlib
+import base64
+from datetime import datetime, timezone
 import validators
-from typing import Optional
+import heapq
+from typing import Optional, Tuple, List, Any, AsyncIterator, Callable
+from urllib.parse import urlsplit, urlunsplit
+
+BASE62_ALPHABET = string.ascii_letters + string.digits
+FEISTEL_ROUNDS = 4
+DEFAULT_PORTS = {"http": 80, "https": 443}
 
 def generate_short_code(length: int = 6) -> str:
     """Generate a random short code using letters and digits"""
-    characters = string.ascii_letters + string.digits
-    return ''.join(random.choice(characters) for _ in range(length))
+    return ''.join(random.choice(BASE62_ALPHABET) for _ in range(length))
+
+def _feistel_round(value: int, round_index: int, half_bits: int, secret: str) -> int:
+    digest = hashlib.blake2b(
+        f"{round_index}:{value}".encode(),
+        key=secret.encode()[:64],
+        digest_size=8,
+    ).digest()
+    return int.from_bytes(digest, "big") & ((1 << half_bits) - 1)
+
+def _feistel(value: int, bits: int, secret: str, reverse: bool = False) -> int:
+    half_bits = bits // 2
+    mask = (1 << half_bits) - 1
+    left, right = value >> half_bits, value & mask
+    rounds = range(FEISTEL_ROUNDS - 1, -1, -1) if reverse else range(FEISTEL_ROUNDS)
+    for round_index in rounds:
+        if reverse:
+            left, right = right ^ _feistel_round(left, round_index, half_bits, secret), left
+        else:
+            left, right = right, left ^ _feistel_round(right, round_index, half_bits, secret)
+    return (left << half_bits) | right
+
+def _permute(value: int, domain: int, secret: str, reverse: bool = False) -> int:
+    """Keyed bijection on [0, domain), using cycle-walking over the next even bit width"""
+    bits = max(domain - 1, 1).bit_length()
+    bits += bits % 2
+    value = _feistel(value, bits, secret, reverse)
+    while value >= domain:
+        value = _feistel(value, bits, secret, reverse)
+    return value
+
+def encode_short_code(number: int, min_length: int, secret: str) -> str:
+    """Encode a non-negative integer ID as a non-sequential base62 short code.
+    
+    IDs are laid out by code length: the first 62**min_length IDs produce
+    codes of min_length characters, the next 62**(min_length + 1) produce
+    one character more, and so on. Within a length the ID is scrambled by a
+    keyed permutation, so distinct IDs always give distinct codes.
+    """
+    if number < 0:
+        raise ValueError("Short code IDs must be non-negative")
+    
+    length = min_length
+    while number >= len(BASE62_ALPHABET) ** length:
+        number -= len(BASE62_ALPHABET) ** length
+        length += 1
+    
+    value = _permute(number, len(BASE62_ALPHABET) ** length, secret)
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, len(BASE62_ALPHABET))
+        chars.append(BASE62_ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+def decode_short_code(code: str, min_length: int, secret: str) -> Optional[int]:
+    """Inverse of encode_short_code; None if the code could not have been generated"""
+    if len(code) < min_length or any(c not in BASE62_ALPHABET for c in code):
+        return None
+    
+    value = 0
+    for c in code:
+        value = value * len(BASE62_ALPHABET) + BASE62_ALPHABET.index(c)
+    
+    number = _permute(value, len(BASE62_ALPHABET) ** len(code), secret, reverse=True)
+    for length in range(min_length, len(code)):
+        number += len(BASE62_ALPHABET) ** length
+    return number
+
+def canonicalize_url(url: str) -> str:
+    """Normalize the parts of a URL that don't change where it points.
+    
+    Lowercases the scheme and host, drops default ports and a trailing dot on
+    the host, and uses "/" for an empty path. Path, query and fragment are
+    kept as-is since servers may treat them case- or order-sensitively.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    
+    netloc = host
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+    if parts.username is not None:
+        userinfo = parts.username
+        if parts.password is not None:
+            userinfo = f"{userinfo}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+    
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, parts.fragment))
+
+def url_hash(url: str, expires_at: Optional[datetime] = None) -> bytes:
+    """Fixed-width digest of the canonical URL, used for dedup lookups.
+    
+    Expiring links only dedup against links with the same expiry.
+    """
+    key = canonicalize_url(url)
+    if expires_at is not None:
+        key = f"{key}\n{expires_at.astimezone(timezone.utc).isoformat()}"
+    return hashlib.sha256(key.encode()).digest()
 
 def validate_url(url: str) -> bool:
     """Validate if URL is properly formatted"""
@@ -21,4 +129,56 @@ def validate_custom_code(code: str, min_length: int = 3, max_length: int = 20) -
         return False
     if len(code) < min_length or len(code) > max_length:
         return False
-    return all(c.isalnum() or c in '-_' for c in code)
\ No newline at end of file
+    return all(c.isalnum() or c in '-_' for c in code)
+
+def encode_cursor(created_at: datetime, row_id: int, partition: int = 0) -> str:
+    """Opaque keyset pagination cursor for a (created_at, id, partition) position"""
+    raw = f"{created_at.isoformat()}|{row_id}|{partition}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int, int]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id, *partition = raw.split("|")
+        return datetime.fromisoformat(created_at), int(row_id), int(partition[0]) if partition else 0
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+class _Descending:
+    __slots__ = ("value",)
+    
+    def __init__(self, value):
+        self.value = value
+    
+    def __lt__(self, other):
+        return other.value < self.value
+    
+    def __eq__(self, other):
+        return self.value == other.value
+
+async def merge_sorted(
+    streams: List[AsyncIterator[Any]],
+    key: Callable[[Any], Any],
+    reverse: bool = False
+) -> AsyncIterator[Tuple[int, Any]]:
+    """Lazily k-way merge async iterators already sorted by key.
+    
+    Yields (stream index, item); ties are broken by stream index.
+    """
+    heap = []
+    
+    async def push(index: int, stream: AsyncIterator[Any]):
+        try:
+            item = await stream.__anext__()
+        except StopAsyncIteration:
+            return
+        sort_key = _Descending(key(item)) if reverse else key(item)
+        heapq.heappush(heap, (sort_key, index, item))
+    
+    for index, stream in enumerate(streams):
+        await push(index, stream)
+    while heap:
+        _, index, item = heapq.heappop(heap)
+        yield index, item
+        await push(index, streams[index])
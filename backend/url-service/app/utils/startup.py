@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+class StartupTimer:
+    """Wall-clock seconds spent in each startup phase, in the order they ran"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, time.monotonic() - started)
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            **{f"{name}_ms": round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            "total_ms": round(self.total * 1000, 1),
+        }
+
+async def prewarm_engine(engine: AsyncEngine, connections: int) -> int:
+    """Open `connections` pooled connections at once and hand them back to the pool"""
+    connections = min(connections, engine.pool.size()) if hasattr(engine.pool, "size") else connections
+    results = await asyncio.gather(
+        *(engine.connect() for _ in range(connections)),
+        return_exceptions=True
+    )
+    opened = 0
+    for result in results:
+        if isinstance(result, Exception):
+            continue
+        await result.close()
+        opened += 1
+    if opened < connections:
+        logger.error(
+            f"Prewarmed {opened} of {connections} connections to "
+            f"{engine.url.render_as_string(hide_password=True)}"
+        )
+    return opened
+
+async def prewarm_engines(engines: List[Tuple[AsyncEngine, int]]) -> int:
+    """Prewarm several engines concurrently; engines listed twice are warmed once"""
+    unique: Dict[int, Tuple[AsyncEngine, int]] = {}
+    for engine, connections in engines:
+        if id(engine) not in unique or connections > unique[id(engine)][1]:
+            unique[id(engine)] = (engine, connections)
+    opened = await asyncio.gather(*(
+        prewarm_engine(engine, connections) for engine, connections in unique.values() if connections > 0
+    ))
+    return sum(opened)
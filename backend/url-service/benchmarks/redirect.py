@@ -0,0 +1,118 @@
+"""Benchmark GET /redirect/{code}: fast ASGI path vs. the regular FastAPI route.
+
+Calls app.main.app in-process (no sockets, no lifespan), so the numbers are
+the app's own per-request cost. Click counting and the Redis scenario use the
+Redis configured in the environment, e.g. with `make up` running:
+
+    cd backend/url-service
+    REDIS_URL=redis://localhost:6379/0 python -m benchmarks.redirect --requests 20000
+
+Scenarios:
+  local    hit in the in-process cache
+  redis    local cache cleared per request, hit in Redis
+  missing  code in the negative cache (404)
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+from app.main import app
+from app.config import settings
+from app.services.local_cache import local_url_cache, negative_url_cache
+from app.services.url_cache import url_cache, build_cache_entry
+
+SCENARIOS = ("local", "redis", "missing")
+DESTINATION = "https://example.com/some/landing/page?utm_source=bench"
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def redirect(short_code: str) -> int:
+    path = f"/redirect/{short_code}"
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"url-service"), (b"user-agent", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("url-service", 8001),
+    }
+    status = 0
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+async def seed(codes: List[str], scenario: str):
+    if scenario == "missing":
+        for code in codes:
+            local_url_cache.invalidate(code)
+            negative_url_cache.set(code, True, ttl=3600)
+        return
+    entries = {code: build_cache_entry(DESTINATION, 0, True) for code in codes}
+    if not await url_cache.set_many(entries):
+        raise SystemExit("Could not write to Redis; set REDIS_URL / REDIS_NODES")
+    for code in codes:
+        local_url_cache.set(code, DESTINATION, ttl=3600)
+
+async def run(codes: List[str], scenario: str, requests: int, concurrency: int) -> Dict[str, float]:
+    expected = 404 if scenario == "missing" else 307
+    latencies: List[float] = []
+
+    async def worker(offset: int):
+        for i in range(offset, requests, concurrency):
+            code = codes[i % len(codes)]
+            if scenario == "redis":
+                local_url_cache.invalidate(code)
+            started = time.perf_counter()
+            status = await redirect(code)
+            latencies.append(time.perf_counter() - started)
+            if status != expected:
+                raise SystemExit(f"{scenario}: expected {expected}, got {status}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_us": statistics.median(latencies) * 1e6,
+        "p99_us": latencies[int(len(latencies) * 0.99) - 1] * 1e6,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--codes", type=int, default=1000)
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append")
+    args = parser.parse_args()
+
+    codes = [f"bench{i:06d}" for i in range(args.codes)]
+    print(f"{'scenario':<10}{'path':<8}{'req/s':>10}{'p50 us':>10}{'p99 us':>10}")
+    for scenario in args.scenario or SCENARIOS:
+        await seed(codes, scenario)
+        results = {}
+        for path, enabled in (("route", False), ("fast", True)):
+            settings.fast_redirect_enabled = enabled
+            await run(codes, scenario, min(args.requests, 500), args.concurrency)  # warm-up
+            results[path] = await run(codes, scenario, args.requests, args.concurrency)
+            r = results[path]
+            print(f"{scenario:<10}{path:<8}{r['rps']:>10.0f}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}")
+        print(f"{scenario:<10}{'speedup':<8}{results['fast']['rps'] / results['route']['rps']:>9.2f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
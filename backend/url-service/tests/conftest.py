@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.database import Base
+from app.services.code_allocator import code_allocator
+from app.services.redis_service import redis_service
+from app.services.url_partitions import url_partitions
+
+# Comma-separated asyncpg URLs of scratch databases, used as URL partitions; their tables are dropped
+TEST_DATABASE_URLS = [url.strip() for url in os.getenv("TEST_DATABASE_URLS", "").split(",") if url.strip()]
+
+@pytest.fixture
+def run(monkeypatch):
+    """Run a test body in one event loop, with every Redis node backed by one fake server"""
+    server = fakeredis.FakeServer()
+    
+    def run(body):
+        async def main():
+            nodes = {url: fakeredis.aioredis.FakeRedis(server=server, decode_responses=True) for url in redis_service.nodes}
+            monkeypatch.setattr(redis_service, "nodes", nodes)
+            monkeypatch.setattr(redis_service, "client", next(iter(nodes.values())))
+            return await body(redis_service.client)
+        return asyncio.run(main())
+    
+    return run
+
+@pytest.fixture
+def partitions(monkeypatch):
+    """Empty urls tables on every TEST_DATABASE_URLS database, installed as the URL partitions"""
+    if not TEST_DATABASE_URLS:
+        pytest.skip("TEST_DATABASE_URLS is not set")
+    
+    # No pooling: each test runs its own event loop
+    engines = [create_async_engine(url, poolclass=NullPool) for url in TEST_DATABASE_URLS]
+    
+    async def reset():
+        for engine in engines:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+                await conn.run_sync(Base.metadata.create_all)
+    
+    asyncio.run(reset())
+    monkeypatch.setattr(url_partitions, "engines", engines)
+    monkeypatch.setattr(url_partitions, "sessionmakers", [
+        async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+        for engine in engines
+    ])
+    # Blocks come from the first partition's sequence
+    monkeypatch.setattr(sys.modules["app.services.code_allocator"], "async_engine", engines[0])
+    monkeypatch.setattr(code_allocator, "_next_id", None)
+    monkeypatch.setattr(code_allocator, "_block_end", 0)
+    monkeypatch.setattr(code_allocator, "_lock", asyncio.Lock())
+    return engines
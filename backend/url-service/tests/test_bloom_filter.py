@@ -0,0 +1,79 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.services.bloom_filter import BloomFilter, short_code_filter
+from app.services.url_cache import url_cache
+from app.services.local_cache import cache_invalidation, negative_url_cache
+from app.services.url_partitions import url_partitions
+from app.services.url_service import URLService
+
+@pytest.fixture
+def loaded_filter(monkeypatch):
+    """A built filter over a live invalidation channel, holding only "known1" """
+    bloom = BloomFilter(1000, 0.001)
+    bloom.add("known1")
+    monkeypatch.setattr(short_code_filter, "bloom", bloom)
+    monkeypatch.setattr(short_code_filter, "ready", True)
+    monkeypatch.setattr(cache_invalidation, "connected", True)
+    yield short_code_filter
+    negative_url_cache.clear()
+
+def test_rejected_code_skips_redis_and_is_negative_cached(loaded_filter, monkeypatch):
+    async def redis_get(short_code):
+        raise AssertionError("the filter should have answered before Redis")
+
+    monkeypatch.setattr(url_cache, "get", redis_get)
+
+    assert asyncio.run(URLService(None).get_original_url("unknown1")) is None
+    assert negative_url_cache.get("unknown1")
+
+def test_announced_code_clears_its_rejection(loaded_filter):
+    assert not loaded_filter.might_exist("fresh1")
+    negative_url_cache.set("fresh1", True)
+
+    cache_invalidation._dispatch("fresh1")
+
+    assert negative_url_cache.get("fresh1") is None
+    assert loaded_filter.might_exist("fresh1")
+
+def test_filter_admits_everything_while_channel_is_down(loaded_filter, monkeypatch):
+    monkeypatch.setattr(cache_invalidation, "connected", False)
+
+    assert loaded_filter.might_exist("unknown1")
+
+def test_build_reads_again_when_generation_moves(monkeypatch):
+    scans = []
+
+    class Session:
+        async def stream_scalars(self, statement):
+            scans.append(len(scans))
+            if len(scans) == 1:
+                # Another instance failed to announce a create while this scan was running
+                monkeypatch.setattr(cache_invalidation, "_generation", 2)
+                codes = ["first1"]
+            else:
+                codes = ["first1", "behind1"]
+
+            async def rows():
+                for code in codes:
+                    yield code
+            return rows()
+
+    @asynccontextmanager
+    async def session(index):
+        yield Session()
+
+    monkeypatch.setattr(url_partitions, "engines", [None])
+    monkeypatch.setattr(url_partitions, "session", session)
+    monkeypatch.setattr(cache_invalidation, "_generation", 1)
+    monkeypatch.setattr(cache_invalidation, "connected", True)
+    monkeypatch.setattr(short_code_filter, "bloom", BloomFilter(1000, 0.001))
+    monkeypatch.setattr(short_code_filter, "ready", False)
+
+    asyncio.run(short_code_filter.build())
+
+    assert len(scans) == 2
+    assert short_code_filter.ready
+    assert short_code_filter.might_exist("behind1")
@@ -0,0 +1,95 @@
+from sqlalchemy import select
+
+from app.config import settings
+from app.models.url_model import URL
+from app.schemas.url_schema import URLCreate
+from app.services.click_counter import ClickCounter, DELTA_KEY, DIRTY_SET_KEY, FLUSH_LOCK_KEY
+from app.services.url_partitions import url_partitions
+from app.services.url_service import URLService
+
+async def _click_count(short_code):
+    async with url_partitions.session_for(short_code) as db:
+        return await db.scalar(select(URL.click_count).where(URL.short_code == short_code))
+
+def test_failed_apply_marks_codes_dirty_again(run, monkeypatch):
+    counter = ClickCounter()
+
+    async def apply(deltas, on_commit=None):
+        return dict(deltas)
+
+    monkeypatch.setattr(counter, "_apply", apply)
+
+    async def body(redis):
+        await counter.record("abc1234", 3)
+        await counter.record("xyz7890")
+
+        assert await counter.flush() == 0
+        assert await redis.smembers(DIRTY_SET_KEY) == {"abc1234", "xyz7890"}
+        assert await redis.get(DELTA_KEY.format("abc1234")) == "3"
+        # The lock was released, so the next flush can pick the codes up
+        assert await redis.get(FLUSH_LOCK_KEY) is None
+    run(body)
+
+def test_settle_keeps_clicks_recorded_during_the_flush(run, partitions, monkeypatch):
+    counter = ClickCounter()
+    apply = counter._apply
+    short_code = None
+
+    async def apply_while_clicking(deltas, on_commit=None):
+        # A click lands between reading the deltas and settling them
+        await counter.record(short_code, 2)
+        return await apply(deltas, on_commit)
+
+    monkeypatch.setattr(counter, "_apply", apply_while_clicking)
+
+    async def body(redis):
+        nonlocal short_code
+        short_code = (await URLService(None).create_short_url(URLCreate(original_url="https://example.com/clicks"))).short_code
+        await counter.record(short_code, 3)
+
+        assert await counter.flush() == 1
+        assert await _click_count(short_code) == 3
+        assert await counter.pending(short_code) == 2
+
+        monkeypatch.setattr(counter, "_apply", apply)
+        await redis.sadd(DIRTY_SET_KEY, short_code)
+        assert await counter.flush() == 1
+        assert await _click_count(short_code) == 5
+        # Fully settled deltas don't linger
+        assert await redis.exists(DELTA_KEY.format(short_code)) == 0
+    run(body)
+
+def test_flush_skips_while_another_instance_holds_the_lock(run):
+    counter = ClickCounter()
+
+    async def body(redis):
+        await redis.set(FLUSH_LOCK_KEY, "other-instance")
+        await counter.record("abc1234")
+
+        assert await counter.flush() == 0
+        assert await redis.smembers(DIRTY_SET_KEY) == {"abc1234"}
+        assert await redis.get(FLUSH_LOCK_KEY) == "other-instance"
+    run(body)
+
+def test_lost_lock_stops_the_flush_and_is_left_to_its_new_holder(run, monkeypatch):
+    counter = ClickCounter()
+    applied = []
+
+    async def body(redis):
+        async def apply(deltas, on_commit=None):
+            applied.append(dict(deltas))
+            # The lock expires mid-flush and a second flusher takes it
+            await redis.set(FLUSH_LOCK_KEY, "other-instance")
+            return {}
+
+        monkeypatch.setattr(counter, "_apply", apply)
+        monkeypatch.setattr(settings, "click_flush_batch_size", 1)
+        await counter.record("abc1234")
+        await counter.record("xyz7890")
+
+        assert await counter.flush() == 1
+        assert len(applied) == 1
+        # The renew check stopped the second batch, and the release left the new holder's lock alone
+        assert len(await redis.smembers(DIRTY_SET_KEY)) == 1
+        assert await redis.get(FLUSH_LOCK_KEY) == "other-instance"
+    run(body)
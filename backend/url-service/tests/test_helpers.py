@@ -0,0 +1,44 @@
+import asyncio
+import base64
+from datetime import datetime, timezone
+
+import pytest
+
+from app.utils.helpers import decode_cursor, encode_cursor, merge_sorted
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+def _merge(streams, **kwargs):
+    async def collect():
+        return [pair async for pair in merge_sorted([_aiter(s) for s in streams], **kwargs)]
+    return asyncio.run(collect())
+
+def test_merge_sorted_ascending():
+    merged = _merge([[1, 4, 7], [2, 5], [], [3, 6, 8]], key=lambda x: x)
+    assert [item for _, item in merged] == [1, 2, 3, 4, 5, 6, 7, 8]
+
+def test_merge_sorted_descending():
+    merged = _merge([[9, 5, 1], [8, 4], [7, 6]], key=lambda x: x, reverse=True)
+    assert [item for _, item in merged] == [9, 8, 7, 6, 5, 4, 1]
+
+def test_merge_sorted_breaks_ties_by_stream_index():
+    merged = _merge([[(1, "a"), (2, "a")], [(1, "b"), (2, "b")]], key=lambda x: x[0])
+    assert merged == [(0, (1, "a")), (1, (1, "b")), (0, (2, "a")), (1, (2, "b"))]
+    merged = _merge([[(2, "a"), (1, "a")], [(2, "b"), (1, "b")]], key=lambda x: x[0], reverse=True)
+    assert [index for index, _ in merged] == [0, 1, 0, 1]
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 16, 12, 30, 5, 123456, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(created_at, 42, 3)) == (created_at, 42, 3)
+
+def test_cursor_without_partition_defaults_to_zero():
+    # Cursors issued before partitioning carried only (created_at, id)
+    created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    legacy = base64.urlsafe_b64encode(f"{created_at.isoformat()}|7".encode()).decode().rstrip("=")
+    assert decode_cursor(legacy) == (created_at, 7, 0)
+
+def test_malformed_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.api.deps import get_db
+from app.api.routes.url_routes import router
+from app.database import Base
+from app.models.url_model import URL
+from app.services.redis_service import redis_service
+from app.services.url_partitions import url_partitions
+from app.services.url_service import URLService
+
+PARTITIONS = 3
+ROWS_PER_PARTITION = 7
+CREATED_AT = datetime(2026, 10, 16, 12, 0, 0)
+
+async def _make_partitions():
+    engines, sessionmakers, expected = [], [], []
+    for index in range(PARTITIONS):
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        async with sessionmaker() as db:
+            for row_id in range(1, ROWS_PER_PARTITION + 1):
+                # Most rows share created_at, and every partition reuses the same ids
+                created_at = CREATED_AT if row_id > 2 else CREATED_AT - timedelta(seconds=row_id)
+                code = f"p{index}r{row_id}"
+                db.add(URL(id=row_id, original_url=f"https://example.com/{code}", short_code=code, created_at=created_at))
+                expected.append((created_at, row_id, index, code))
+            await db.commit()
+        engines.append(engine)
+        sessionmakers.append(sessionmaker)
+    expected.sort(reverse=True)
+    return engines, sessionmakers, [code for *_, code in expected]
+
+@pytest.fixture
+def partitions(monkeypatch):
+    engines, sessionmakers, expected = asyncio.run(_make_partitions())
+    monkeypatch.setattr(url_partitions, "engines", engines)
+    monkeypatch.setattr(url_partitions, "sessionmakers", sessionmakers)
+    # Pending clicks come from Redis; none here
+    monkeypatch.setattr(redis_service, "client", None)
+    return expected
+
+def _walk(limit):
+    async def walk():
+        service = URLService(None)
+        codes, cursor = [], None
+        # A cursor that repeats rows would never reach the end
+        for _ in range(PARTITIONS * ROWS_PER_PARTITION + 1):
+            page = await service.list_urls(limit=limit, cursor=cursor)
+            codes.extend(item.short_code for item in page.items)
+            if page.next_cursor is None:
+                return codes
+            cursor = page.next_cursor
+        return codes
+    return asyncio.run(walk())
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 5, 100])
+def test_cursor_pages_cover_every_partition_once(partitions, limit):
+    assert _walk(limit) == partitions
+
+def test_first_page_is_newest(partitions):
+    async def first():
+        return await URLService(None).list_urls(limit=3)
+    page = asyncio.run(first())
+    assert [item.short_code for item in page.items] == partitions[:3]
+    assert page.next_cursor is not None
+
+@pytest.fixture
+def client(partitions):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: None
+    return TestClient(app)
+
+def test_deprecated_skip_offsets_the_first_page(partitions, client):
+    response = client.get("/urls/", params={"skip": 4, "limit": 5})
+    assert response.status_code == 200
+    page = response.json()
+    assert [item["short_code"] for item in page["items"]] == partitions[4:9]
+
+    # Its next_cursor carries on from there
+    response = client.get("/urls/", params={"cursor": page["next_cursor"], "limit": 5})
+    assert [item["short_code"] for item in response.json()["items"]] == partitions[9:14]
+
+def test_skip_with_cursor_is_rejected(partitions, client):
+    cursor = client.get("/urls/", params={"limit": 2}).json()["next_cursor"]
+    response = client.get("/urls/", params={"skip": 2, "cursor": cursor})
+    assert response.status_code == 400
+    assert "next_cursor" in response.json()["detail"]
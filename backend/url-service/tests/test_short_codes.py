@@ -0,0 +1,52 @@
+import pytest
+
+from app.config import settings, DEFAULT_SHORT_CODE_SECRET
+from app.services.code_allocator import create_code_allocator
+from app.utils.helpers import BASE62_ALPHABET, decode_short_code, encode_short_code
+
+SECRET = "test-secret"
+
+def test_short_code_round_trip():
+    for number in [0, 1, 2, 61, 62, 1000, 62 ** 3 - 1]:
+        code = encode_short_code(number, 3, SECRET)
+        assert len(code) == 3
+        assert decode_short_code(code, 3, SECRET) == number
+
+def test_short_code_round_trip_past_min_length():
+    # IDs past 62**min_length move on to longer codes
+    for number in [62 ** 3, 62 ** 3 + 1, 62 ** 3 + 62 ** 4 - 1, 62 ** 3 + 62 ** 4]:
+        code = encode_short_code(number, 3, SECRET)
+        assert len(code) > 3
+        assert decode_short_code(code, 3, SECRET) == number
+
+def test_short_codes_are_distinct():
+    # A permutation: every two-character code is produced exactly once
+    codes = {encode_short_code(number, 2, SECRET) for number in range(62 ** 2)}
+    assert len(codes) == 62 ** 2
+    assert all(len(code) == 2 and set(code) <= set(BASE62_ALPHABET) for code in codes)
+
+def test_short_codes_depend_on_secret():
+    numbers = range(100)
+    ours = [encode_short_code(n, 6, SECRET) for n in numbers]
+    theirs = [encode_short_code(n, 6, "other-secret") for n in numbers]
+    assert ours != theirs
+
+def test_decode_rejects_impossible_codes():
+    assert decode_short_code("ab", 3, SECRET) is None
+    assert decode_short_code("ab-c", 3, SECRET) is None
+
+def test_encode_rejects_negative_ids():
+    with pytest.raises(ValueError):
+        encode_short_code(-1, 6, SECRET)
+
+def test_placeholder_secret_is_refused_outside_development(monkeypatch):
+    monkeypatch.setattr(settings, "short_code_secret", DEFAULT_SHORT_CODE_SECRET)
+    monkeypatch.setattr(settings, "environment", "production")
+    with pytest.raises(ValueError, match="SHORT_CODE_SECRET"):
+        create_code_allocator("postgres")
+
+    monkeypatch.setattr(settings, "short_code_secret", SECRET)
+    assert create_code_allocator("postgres")
+    monkeypatch.setattr(settings, "short_code_secret", DEFAULT_SHORT_CODE_SECRET)
+    monkeypatch.setattr(settings, "environment", "development")
+    assert create_code_allocator("postgres")
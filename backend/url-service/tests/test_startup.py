@@ -0,0 +1,20 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.utils.startup import prewarm_engines
+
+def test_prewarm_warms_each_engine_once_up_to_its_pool_size(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'prewarm.db'}", poolclass=AsyncAdaptedQueuePool, pool_size=2
+    )
+
+    async def body():
+        try:
+            # The same engine listed twice, as a primary that is also its own replica
+            return await prewarm_engines([(engine, 5), (engine, 3)]), engine.pool.checkedin()
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(body()) == (2, 2)
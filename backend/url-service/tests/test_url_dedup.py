@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+
+from app.models.url_model import URL
+from app.schemas.url_schema import URLCreate
+from app.services.url_partitions import url_partitions
+from app.services.url_service import URLService, SHORT_CODE_INDEX, URL_HASH_INDEX
+from app.utils.helpers import url_hash
+
+async def _active_rows(original_url):
+    rows = []
+    for index in range(url_partitions.count):
+        async with url_partitions.session(index) as db:
+            rows += (await db.execute(
+                select(URL.short_code).where(URL.original_url == original_url, URL.is_active)
+            )).scalars().all()
+    return rows
+
+def test_concurrent_creates_across_partitions_return_one_code(run, partitions):
+    async def body(redis):
+        for attempt in range(10):
+            original_url = f"https://example.com/race/{attempt}"
+            # Each create allocates its own code, so the inserts land on different partitions
+            created = await asyncio.gather(*(
+                URLService(None).create_short_url(URLCreate(original_url=original_url))
+                for _ in range(4)
+            ))
+            assert len({url.short_code for url in created}) == 1
+            assert await _active_rows(original_url) == [created[0].short_code]
+    run(body)
+
+def test_create_same_url_twice_returns_one_code(run, partitions):
+    async def body(redis):
+        first = await URLService(None).create_short_url(URLCreate(original_url="https://example.com/twice"))
+        # Same canonical URL: scheme and host case and the default port don't count
+        second = await URLService(None).create_short_url(URLCreate(original_url="HTTPS://Example.COM:443/twice"))
+        assert second.short_code == first.short_code
+        assert await _active_rows("https://example.com/twice") == [first.short_code]
+    run(body)
+
+def test_taken_custom_code_is_rejected(run, partitions):
+    async def body(redis):
+        await URLService(None).create_short_url(URLCreate(original_url="https://example.com/a", custom_code="taken1"))
+        with pytest.raises(ValueError, match="Custom code already exists"):
+            await URLService(None).create_short_url(URLCreate(original_url="https://example.com/b", custom_code="taken1"))
+    run(body)
+
+def test_upsert_reads_a_row_committed_behind_its_snapshot(run, partitions):
+    async def body(redis):
+        # Two codes on the same partition, so both inserts meet on one URL hash index
+        codes = [f"race{i}" for i in range(20)]
+        first, second = [c for c in codes if url_partitions.index_for(c) == url_partitions.index_for(codes[0])][:2]
+        original_url = "https://example.com/snapshot"
+
+        async with url_partitions.session_for(first) as db:
+            await db.execute(insert(URL).values(
+                original_url=original_url, url_hash=url_hash(original_url), short_code=first
+            ))
+            # The upsert blocks on this uncommitted row, then finds nothing in its snapshot
+            upsert = asyncio.create_task(URLService(None)._upsert_url(original_url, second))
+            await asyncio.sleep(0.3)
+            assert not upsert.done()
+            await db.commit()
+
+        db_url, inserted = await upsert
+        assert (db_url.short_code, inserted) == (first, False)
+    run(body)
+
+def test_violated_constraint_names_the_index(run, partitions):
+    async def body(redis):
+        original_url = "https://example.com/constraint"
+        row = dict(original_url=original_url, url_hash=url_hash(original_url), short_code="dup1")
+        async with url_partitions.session(0) as db:
+            await db.execute(insert(URL).values(**row))
+            await db.commit()
+            for duplicate, index in (
+                (dict(row, short_code="dup2"), URL_HASH_INDEX),
+                (dict(row, url_hash=url_hash("https://example.com/other")), SHORT_CODE_INDEX),
+            ):
+                with pytest.raises(IntegrityError) as error:
+                    await db.execute(insert(URL).values(**duplicate))
+                await db.rollback()
+                assert URLService._violated_constraint(error.value) == index
+    run(body)
+
+def test_batch_dedups_by_canonical_url(run, partitions):
+    async def body(redis):
+        existing = await URLService(None).create_short_url(URLCreate(original_url="https://example.com/old"))
+        response = await URLService(None).create_short_urls_bulk([
+            {"original_url": "https://example.com/new"},
+            {"original_url": "HTTPS://EXAMPLE.com/new"},
+            {"original_url": "https://example.com:443/old"},
+        ])
+        new, repeat, old = response.results
+        assert (new.status, repeat.status, old.status) == ("created", "existing", "existing")
+        assert repeat.short_code == new.short_code
+        assert old.short_code == existing.short_code
+        assert (response.created, response.existing, response.failed) == (1, 2, 0)
+        assert await _active_rows("https://example.com/new") == [new.short_code]
+    run(body)